@@ -0,0 +1,250 @@
+import math
+from bisect import bisect_left, bisect_right, insort
+
+import numpy as np
+
+from label_index import label_columns
+
+METRICS = ("left_angle", "right_angle", "asymmetry", "radius_ratio")
+METRIC_NAMES = {
+    "left_angle": "Left Norberg Angle",
+    "right_angle": "Right Norberg Angle",
+    "asymmetry": "Left-Right Asymmetry",
+    "radius_ratio": "Radius Ratio (L/R)"
+}
+RADIUS_RATIO_RANGE = (0.67, 1.5)
+FENCE_FACTOR = 3.0
+MIN_FENCE_COUNT = 20
+
+
+def image_metrics(labels):
+    metrics = {}
+    left_angle = labels.get("left_angle")
+    right_angle = labels.get("right_angle")
+    if left_angle is not None:
+        metrics["left_angle"] = float(left_angle)
+    if right_angle is not None:
+        metrics["right_angle"] = float(right_angle)
+    if left_angle is not None and right_angle is not None:
+        metrics["asymmetry"] = abs(float(left_angle) - float(right_angle))
+    
+    left_circle = labels.get("left_circle")
+    right_circle = labels.get("right_circle")
+    if left_circle and right_circle and right_circle["radius"] > 0:
+        metrics["radius_ratio"] = float(left_circle["radius"]) / float(right_circle["radius"])
+    return metrics
+
+
+def rule_flags(labels, metrics):
+    flags = []
+    ratio = metrics.get("radius_ratio")
+    if ratio is not None and not RADIUS_RATIO_RANGE[0] <= ratio <= RADIUS_RATIO_RANGE[1]:
+        flags.append(f"radius ratio {ratio:.2f}")
+    
+    left_circle = labels.get("left_circle")
+    right_circle = labels.get("right_circle")
+    if left_circle and right_circle:
+        distance = math.hypot(left_circle["center_x"] - right_circle["center_x"],
+                              left_circle["center_y"] - right_circle["center_y"])
+        if distance < left_circle["radius"] + right_circle["radius"]:
+            flags.append("femur circles overlap")
+    
+    for side in ("left", "right"):
+        if metrics.get(f"{side}_angle") == 0:
+            flags.append(f"{side} acetabulum point on circle center")
+    return flags
+
+
+class SortedSample:
+    def __init__(self):
+        self.entries = []
+        self.total = 0.0
+        self.total_sq = 0.0
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def add(self, value, file_name):
+        insort(self.entries, (value, file_name))
+        self.total += value
+        self.total_sq += value * value
+    
+    def remove(self, value, file_name):
+        index = bisect_left(self.entries, (value, file_name))
+        if index < len(self.entries) and self.entries[index] == (value, file_name):
+            del self.entries[index]
+            self.total -= value
+            self.total_sq -= value * value
+    
+    def load(self, values, file_names):
+        order = np.argsort(values, kind="stable")
+        sorted_values = values[order].tolist()
+        self.entries = [(value, file_names[i]) for value, i in zip(sorted_values, order.tolist())]
+        self.total = float(np.sum(values))
+        self.total_sq = float(np.sum(np.square(values)))
+    
+    def quantile(self, q):
+        count = len(self.entries)
+        if count == 0:
+            return None
+        position = q * (count - 1)
+        lower = int(position)
+        upper = min(lower + 1, count - 1)
+        fraction = position - lower
+        return self.entries[lower][0] * (1 - fraction) + self.entries[upper][0] * fraction
+    
+    def mean(self):
+        return self.total / len(self.entries) if self.entries else None
+    
+    def std(self):
+        count = len(self.entries)
+        if count < 2:
+            return None
+        variance = (self.total_sq - self.total * self.total / count) / (count - 1)
+        return math.sqrt(max(variance, 0.0))
+    
+    def below(self, value):
+        return self.entries[:bisect_left(self.entries, (value, ""))]
+    
+    def above(self, value):
+        return self.entries[bisect_right(self.entries, (value, "\uffff")):]
+
+
+class AngleStatistics:
+    def __init__(self):
+        self.clear()
+    
+    def clear(self):
+        self.samples = {metric: SortedSample() for metric in METRICS}
+        self.per_image = {}
+        self.flags = {}
+    
+    def remove(self, file_name):
+        metrics = self.per_image.pop(file_name, None)
+        if metrics:
+            for metric, value in metrics.items():
+                self.samples[metric].remove(value, file_name)
+        self.flags.pop(file_name, None)
+    
+    def update(self, file_name, labels):
+        self.remove(file_name)
+        if not labels:
+            return
+        
+        metrics = image_metrics(labels)
+        if metrics:
+            self.per_image[file_name] = metrics
+            for metric, value in metrics.items():
+                self.samples[metric].add(value, file_name)
+        
+        flags = rule_flags(labels, metrics)
+        if flags:
+            self.flags[file_name] = flags
+    
+    def rebuild(self, labels):
+        self.clear()
+        file_names, columns = label_columns(labels)
+        if not file_names:
+            return
+        
+        left_angle = columns["left_angle"]
+        right_angle = columns["right_angle"]
+        left_radius, right_radius = columns["left_radius"], columns["right_radius"]
+        left_cx, left_cy = columns["left_x"], columns["left_y"]
+        right_cx, right_cy = columns["right_x"], columns["right_y"]
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            radius_ratio = np.where(right_radius > 0, left_radius / right_radius, np.nan)
+        metric_columns = {
+            "left_angle": left_angle,
+            "right_angle": right_angle,
+            "asymmetry": np.abs(left_angle - right_angle),
+            "radius_ratio": radius_ratio
+        }
+        
+        for metric, values in metric_columns.items():
+            valid = np.nonzero(~np.isnan(values))[0]
+            valid_names = [file_names[i] for i in valid]
+            valid_values = values[valid].tolist()
+            self.samples[metric].load(values[valid], valid_names)
+            for file_name, value in zip(valid_names, valid_values):
+                metrics = self.per_image.get(file_name)
+                if metrics is None:
+                    metrics = self.per_image[file_name] = {}
+                metrics[metric] = value
+        
+        with np.errstate(invalid="ignore"):
+            bad_ratio = (radius_ratio < RADIUS_RATIO_RANGE[0]) | (radius_ratio > RADIUS_RATIO_RANGE[1])
+            overlap = np.hypot(left_cx - right_cx, left_cy - right_cy) < left_radius + right_radius
+            degenerate = (left_angle == 0) | (right_angle == 0)
+        
+        for i in np.nonzero(bad_ratio | overlap | degenerate)[0]:
+            file_name = file_names[i]
+            flags = rule_flags(labels[file_name], self.per_image.get(file_name, {}))
+            if flags:
+                self.flags[file_name] = flags
+    
+    def count(self, metric="left_angle"):
+        return len(self.samples[metric])
+    
+    def summary(self, metric):
+        sample = self.samples[metric]
+        return {
+            "count": len(sample),
+            "mean": sample.mean(),
+            "std": sample.std(),
+            "min": sample.quantile(0.0),
+            "p05": sample.quantile(0.05),
+            "p25": sample.quantile(0.25),
+            "median": sample.quantile(0.5),
+            "p75": sample.quantile(0.75),
+            "p95": sample.quantile(0.95),
+            "max": sample.quantile(1.0)
+        }
+    
+    def fences(self, metric, factor=FENCE_FACTOR):
+        sample = self.samples[metric]
+        if len(sample) < MIN_FENCE_COUNT:
+            return None
+        q1 = sample.quantile(0.25)
+        q3 = sample.quantile(0.75)
+        spread = q3 - q1
+        return q1 - factor * spread, q3 + factor * spread
+    
+    def outliers(self):
+        flagged = {file_name: list(flags) for file_name, flags in self.flags.items()}
+        for metric in METRICS:
+            limits = self.fences(metric)
+            if limits is None:
+                continue
+            for value, file_name in self.samples[metric].below(limits[0]) + self.samples[metric].above(limits[1]):
+                flagged.setdefault(file_name, []).append(f"{METRIC_NAMES[metric].lower()} {value:.2f}")
+        return flagged
+
+
+def format_value(value, digits=1):
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def format_statistics(statistics, max_outliers=10):
+    lines = []
+    for metric in METRICS:
+        summary = statistics.summary(metric)
+        digits = 2 if metric == "radius_ratio" else 1
+        lines.append(f"{METRIC_NAMES[metric]} (n={summary['count']}):")
+        lines.append(f"  mean {format_value(summary['mean'], digits)}  "
+                     f"sd {format_value(summary['std'], digits)}")
+        lines.append(f"  min {format_value(summary['min'], digits)}  "
+                     f"p25 {format_value(summary['p25'], digits)}  "
+                     f"median {format_value(summary['median'], digits)}  "
+                     f"p75 {format_value(summary['p75'], digits)}  "
+                     f"max {format_value(summary['max'], digits)}")
+    
+    outliers = statistics.outliers()
+    lines.append("")
+    lines.append(f"Flagged images: {len(outliers)}")
+    for file_name in sorted(outliers)[:max_outliers]:
+        lines.append(f"  {file_name}: {', '.join(outliers[file_name])}")
+    if len(outliers) > max_outliers:
+        lines.append(f"  ... and {len(outliers) - max_outliers} more")
+    return "\n".join(lines)
@@ -0,0 +1,248 @@
+from abc import ABC, abstractmethod
+
+
+class CanvasBackend(ABC):
+    @abstractmethod
+    def create_rectangle(self, x1, y1, x2, y2, **options):
+        pass
+    
+    @abstractmethod
+    def create_oval(self, x1, y1, x2, y2, **options):
+        pass
+    
+    @abstractmethod
+    def create_line(self, x1, y1, x2, y2, **options):
+        pass
+    
+    @abstractmethod
+    def create_text(self, x, y, **options):
+        pass
+    
+    @abstractmethod
+    def delete(self, *tags_or_ids):
+        pass
+    
+    def find_overlapping(self, x1, y1, x2, y2):
+        return ()
+    
+    def gettags(self, item):
+        return ()
+
+
+class TkCanvas(CanvasBackend):
+    def __init__(self, canvas):
+        self.canvas = canvas
+    
+    def create_rectangle(self, x1, y1, x2, y2, **options):
+        return self.canvas.create_rectangle(x1, y1, x2, y2, **options)
+    
+    def create_oval(self, x1, y1, x2, y2, **options):
+        return self.canvas.create_oval(x1, y1, x2, y2, **options)
+    
+    def create_line(self, x1, y1, x2, y2, **options):
+        return self.canvas.create_line(x1, y1, x2, y2, **options)
+    
+    def create_text(self, x, y, **options):
+        return self.canvas.create_text(x, y, **options)
+    
+    def delete(self, *tags_or_ids):
+        self.canvas.delete(*tags_or_ids)
+    
+    def find_overlapping(self, x1, y1, x2, y2):
+        return self.canvas.find_overlapping(x1, y1, x2, y2)
+    
+    def gettags(self, item):
+        return self.canvas.gettags(item)
+    
+    def __getattr__(self, name):
+        return getattr(self.canvas, name)
+
+
+class RecordingCanvas(CanvasBackend):
+    def __init__(self):
+        self.items = {}
+        self.next_id = 1
+        self.created = {}
+        self.deleted = {}
+        self.updated = {}
+    
+    def _count(self, counter, item_type):
+        counter[item_type] = counter.get(item_type, 0) + 1
+    
+    def _create(self, item_type, coords, options):
+        item = self.next_id
+        self.next_id += 1
+        
+        tags = options.get("tags", ())
+        if isinstance(tags, str):
+            tags = (tags,)
+        
+        self.items[item] = {
+            "type": item_type,
+            "coords": list(coords),
+            "options": options,
+            "tags": tuple(tags)
+        }
+        self._count(self.created, item_type)
+        return item
+    
+    def create_rectangle(self, x1, y1, x2, y2, **options):
+        return self._create("rectangle", (x1, y1, x2, y2), options)
+    
+    def create_oval(self, x1, y1, x2, y2, **options):
+        return self._create("oval", (x1, y1, x2, y2), options)
+    
+    def create_line(self, x1, y1, x2, y2, **options):
+        return self._create("line", (x1, y1, x2, y2), options)
+    
+    def create_text(self, x, y, **options):
+        return self._create("text", (x, y), options)
+    
+    def create_image(self, x, y, **options):
+        return self._create("image", (x, y), options)
+    
+    def find_withtag(self, tag_or_id):
+        if tag_or_id == "all":
+            return tuple(self.items)
+        if isinstance(tag_or_id, int):
+            return (tag_or_id,) if tag_or_id in self.items else ()
+        return tuple(item for item, data in self.items.items() if tag_or_id in data["tags"])
+    
+    def delete(self, *tags_or_ids):
+        for tag_or_id in tags_or_ids:
+            for item in self.find_withtag(tag_or_id):
+                self._count(self.deleted, self.items[item]["type"])
+                del self.items[item]
+    
+    def coords(self, tag_or_id, *coords):
+        items = self.find_withtag(tag_or_id)
+        if not coords:
+            return list(self.items[items[0]]["coords"]) if items else []
+        
+        for item in items:
+            self.items[item]["coords"] = list(coords)
+            self._count(self.updated, self.items[item]["type"])
+        return None
+    
+    def itemconfigure(self, tag_or_id, **options):
+        for item in self.find_withtag(tag_or_id):
+            self.items[item]["options"].update(options)
+            if "tags" in options:
+                tags = options["tags"]
+                self.items[item]["tags"] = (tags,) if isinstance(tags, str) else tuple(tags)
+            self._count(self.updated, self.items[item]["type"])
+    
+    def bbox_of(self, item):
+        coords = self.items[item]["coords"]
+        xs = coords[0::2]
+        ys = coords[1::2]
+        return min(xs), min(ys), max(xs), max(ys)
+    
+    def find_overlapping(self, x1, y1, x2, y2):
+        found = []
+        for item in self.items:
+            bx1, by1, bx2, by2 = self.bbox_of(item)
+            if bx1 <= x2 and bx2 >= x1 and by1 <= y2 and by2 >= y1:
+                found.append(item)
+        return tuple(found)
+    
+    def gettags(self, item):
+        data = self.items.get(item)
+        return data["tags"] if data else ()
+    
+    def live_count(self, item_type=None):
+        if item_type is None:
+            return len(self.items)
+        return sum(1 for data in self.items.values() if data["type"] == item_type)
+    
+    def totals(self):
+        return {
+            "created": sum(self.created.values()),
+            "deleted": sum(self.deleted.values()),
+            "updated": sum(self.updated.values()),
+            "live": len(self.items)
+        }
+    
+    def reset_counters(self):
+        self.created = {}
+        self.deleted = {}
+        self.updated = {}
+
+
+class HeadlessCanvas(RecordingCanvas):
+    def __init__(self, width=1200, height=700):
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.view_x = 0.0
+        self.view_y = 0.0
+        self.options = {}
+        self.bindings = {}
+    
+    def bind(self, sequence, func=None):
+        self.bindings[sequence] = func
+    
+    def configure(self, **options):
+        self.options.update(options)
+        self.clamp_view()
+    
+    def winfo_width(self):
+        return self.width
+    
+    def winfo_height(self):
+        return self.height
+    
+    def canvasx(self, x):
+        return self.view_x + x
+    
+    def canvasy(self, y):
+        return self.view_y + y
+    
+    def scroll_extent(self):
+        region = self.options.get("scrollregion", (0, 0, self.width, self.height))
+        return max(region[2] - region[0], 1), max(region[3] - region[1], 1)
+    
+    def clamp_view(self):
+        extent_x, extent_y = self.scroll_extent()
+        self.view_x = min(max(self.view_x, 0.0), max(extent_x - self.width, 0))
+        self.view_y = min(max(self.view_y, 0.0), max(extent_y - self.height, 0))
+    
+    def _scroll(self, axis, args):
+        extent = self.scroll_extent()[axis]
+        size = self.width if axis == 0 else self.height
+        current = self.view_x if axis == 0 else self.view_y
+        
+        if args and args[0] == "moveto":
+            current = float(args[1]) * extent
+        elif args and args[0] == "scroll":
+            step = size * 0.9 if args[2] == "pages" else 20
+            current += int(args[1]) * step
+        
+        if axis == 0:
+            self.view_x = current
+        else:
+            self.view_y = current
+        self.clamp_view()
+    
+    def xview(self, *args):
+        self._scroll(0, args)
+    
+    def yview(self, *args):
+        self._scroll(1, args)
+    
+    def xview_moveto(self, fraction):
+        self._scroll(0, ("moveto", fraction))
+    
+    def yview_moveto(self, fraction):
+        self._scroll(1, ("moveto", fraction))
+    
+    def tag_lower(self, tag_or_id):
+        pass
+    
+    def bbox(self, tag_or_id):
+        items = self.find_withtag(tag_or_id)
+        if not items:
+            return None
+        boxes = [self.bbox_of(item) for item in items]
+        return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                max(b[2] for b in boxes), max(b[3] for b in boxes))
@@ -0,0 +1,118 @@
+import sys
+import time
+import argparse
+
+from canvas_backend import RecordingCanvas
+from drawing import DrawingManager, LabelRenderer, EditManager
+
+
+def sample_labels():
+    return {
+        "rectangle": {"x1": 400.0, "y1": 300.0, "x2": 2600.0, "y2": 1600.0},
+        "left_keypoint": {"x": 950.0, "y": 850.0},
+        "right_keypoint": {"x": 2050.0, "y": 870.0},
+        "left_circle": {"center_x": 900.0, "center_y": 1000.0, "radius": 110.0},
+        "right_circle": {"center_x": 2100.0, "center_y": 1020.0, "radius": 100.0},
+        "left_angle": 101.5,
+        "right_angle": 99.2,
+        "left_femur_angle": 92.0,
+        "right_femur_angle": 94.0
+    }
+
+
+def summarize(name, canvas, steps, elapsed):
+    totals = canvas.totals()
+    return {
+        "name": name,
+        "steps": steps,
+        "ms_per_step": elapsed * 1000 / steps,
+        "created_per_step": totals["created"] / steps,
+        "deleted_per_step": totals["deleted"] / steps,
+        "updated_per_step": totals["updated"] / steps,
+        "live_items": totals["live"]
+    }
+
+
+def benchmark_move(steps, zoom_factor=1.0):
+    canvas = RecordingCanvas()
+    renderer = LabelRenderer(canvas, zoom_factor, True, True)
+    labels = sample_labels()
+    renderer.redraw_all(labels)
+    canvas.reset_counters()
+    
+    start = time.perf_counter()
+    for i in range(steps):
+        circle = labels["left_circle"]
+        circle["center_x"] += 1 if i % 2 == 0 else -1
+        renderer.redraw_all(labels)
+    elapsed = time.perf_counter() - start
+    return summarize("move", canvas, steps, elapsed)
+
+
+def benchmark_circle_resize(steps, zoom_factor=1.0):
+    canvas = RecordingCanvas()
+    renderer = LabelRenderer(canvas, zoom_factor, True, True)
+    edit_manager = EditManager(canvas, zoom_factor)
+    labels = sample_labels()
+    renderer.redraw_all(labels)
+    edit_manager.draw_circle_handles(labels["right_circle"])
+    canvas.reset_counters()
+    
+    start = time.perf_counter()
+    for i in range(steps):
+        circle = labels["right_circle"]
+        edit_manager.resize_circle(circle, circle["center_x"] + 100 + i % 20, circle["center_y"])
+        renderer.redraw_all(labels)
+        edit_manager.draw_circle_handles(circle)
+    elapsed = time.perf_counter() - start
+    return summarize("circle_resize", canvas, steps, elapsed)
+
+
+def benchmark_temp_circle(steps, zoom_factor=1.0):
+    canvas = RecordingCanvas()
+    drawing_manager = DrawingManager(canvas, zoom_factor, {})
+    drawing_manager.start_drawing(900.0, 1000.0, "left_circle")
+    
+    start = time.perf_counter()
+    for i in range(steps):
+        drawing_manager.draw_temp_circle(1000.0 + i % 50, 1000.0)
+    elapsed = time.perf_counter() - start
+    return summarize("temp_circle", canvas, steps, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless canvas redraw benchmark.")
+    parser.add_argument("--steps", type=int, default=2000, help="Number of simulated drag events")
+    parser.add_argument("--zoom", type=float, default=1.0, help="Zoom factor to render at")
+    parser.add_argument("--max-created-per-step", type=float, default=None,
+                        help="Fail if any scenario creates more items per step than this")
+    parser.add_argument("--max-live-items", type=int, default=None,
+                        help="Fail if any scenario ends with more live items than this")
+    args = parser.parse_args()
+    
+    results = [
+        benchmark_move(args.steps, args.zoom),
+        benchmark_circle_resize(args.steps, args.zoom),
+        benchmark_temp_circle(args.steps, args.zoom)
+    ]
+    
+    failed = False
+    for result in results:
+        print(f"{result['name']:>14}: {result['ms_per_step']:.3f} ms/step, "
+              f"created {result['created_per_step']:.1f}/step, "
+              f"deleted {result['deleted_per_step']:.1f}/step, "
+              f"updated {result['updated_per_step']:.1f}/step, "
+              f"live {result['live_items']}")
+        
+        if args.max_created_per_step is not None and result["created_per_step"] > args.max_created_per_step:
+            failed = True
+        if args.max_live_items is not None and result["live_items"] > args.max_live_items:
+            failed = True
+    
+    if failed:
+        print("Canvas item budget exceeded.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from image_loader import load_image
+
+DETECTION_SIZE = 512
+MIN_RADIUS_FRACTION = 0.025
+MAX_RADIUS_FRACTION = 0.09
+EDGE_FRACTION = 0.08
+MAX_EDGES = 40000
+
+
+def to_gray(image, loaded_image):
+    if loaded_image.high_bit_depth:
+        return loaded_image.tone_lut[np.asarray(image)].astype(np.float32)
+    if image.mode != "L":
+        image = image.convert("L")
+    return np.asarray(image, dtype=np.float32)
+
+
+def smooth(array):
+    padded = np.pad(array, 1, mode="edge")
+    rows = (padded[:-2, :] + 2 * padded[1:-1, :] + padded[2:, :]) / 4
+    return (rows[:, :-2] + 2 * rows[:, 1:-1] + rows[:, 2:]) / 4
+
+
+def sobel(array):
+    padded = np.pad(array, 1, mode="edge")
+    gx = ((padded[:-2, 2:] + 2 * padded[1:-1, 2:] + padded[2:, 2:]) -
+          (padded[:-2, :-2] + 2 * padded[1:-1, :-2] + padded[2:, :-2]))
+    gy = ((padded[2:, :-2] + 2 * padded[2:, 1:-1] + padded[2:, 2:]) -
+          (padded[:-2, :-2] + 2 * padded[:-2, 1:-1] + padded[:-2, 2:]))
+    return gx, gy
+
+
+def hough_circles(gray, radii, edge_fraction=EDGE_FRACTION, max_edges=MAX_EDGES):
+    gx, gy = sobel(smooth(gray))
+    magnitude = np.hypot(gx, gy)
+    height, width = gray.shape
+    
+    threshold = np.percentile(magnitude, 100 * (1 - edge_fraction))
+    ys, xs = np.nonzero(magnitude > threshold)
+    if len(xs) > max_edges:
+        strongest = np.argpartition(magnitude[ys, xs], -max_edges)[-max_edges:]
+        ys, xs = ys[strongest], xs[strongest]
+    
+    accumulator = np.zeros((len(radii), height, width), dtype=np.float32)
+    if len(xs) == 0:
+        return accumulator
+    
+    ux = gx[ys, xs] / magnitude[ys, xs]
+    uy = gy[ys, xs] / magnitude[ys, xs]
+    
+    for i, radius in enumerate(radii):
+        cx = np.rint(xs + radius * ux).astype(np.int64)
+        cy = np.rint(ys + radius * uy).astype(np.int64)
+        valid = (cx >= 0) & (cx < width) & (cy >= 0) & (cy < height)
+        votes = np.bincount(cy[valid] * width + cx[valid], minlength=height * width)
+        accumulator[i] = smooth(votes.reshape(height, width).astype(np.float32)) / radius
+    
+    return accumulator
+
+
+def best_circle(accumulator, radii, x_min, x_max, y_min, y_max):
+    region = accumulator[:, y_min:y_max, x_min:x_max]
+    if region.size == 0:
+        return None
+    
+    index = int(np.argmax(region))
+    r_index, y, x = np.unravel_index(index, region.shape)
+    score = float(region[r_index, y, x])
+    if score <= 0:
+        return None
+    
+    return {
+        "center_x": float(x + x_min),
+        "center_y": float(y + y_min),
+        "radius": float(radii[r_index]),
+        "score": score,
+    }
+
+
+def detect_femur_heads(image_path, roi=None, detection_size=DETECTION_SIZE):
+    loaded_image = load_image(image_path)
+    try:
+        width, height = loaded_image.width, loaded_image.height
+        box = (0, 0, width, height)
+        if roi:
+            box = (max(0, int(roi["x1"])), max(0, int(roi["y1"])),
+                   min(width, int(roi["x2"])), min(height, int(roi["y2"])))
+            if box[2] - box[0] < 16 or box[3] - box[1] < 16:
+                box = (0, 0, width, height)
+        
+        scale = min(1.0, detection_size / float(max(box[2] - box[0], box[3] - box[1])))
+        image = loaded_image.source.read_region(box, scale)
+        gray = to_gray(image, loaded_image)
+    finally:
+        loaded_image.source.close()
+    
+    height_s, width_s = gray.shape
+    short_side = min(width, height) * scale
+    r_min = max(3, int(short_side * MIN_RADIUS_FRACTION))
+    r_max = max(r_min + 1, int(short_side * MAX_RADIUS_FRACTION))
+    radii = np.arange(r_min, r_max + 1)
+    
+    accumulator = hough_circles(gray, radii)
+    half = width_s // 2
+    candidates = {
+        "left_circle": best_circle(accumulator, radii, 0, half, 0, height_s),
+        "right_circle": best_circle(accumulator, radii, half, width_s, 0, height_s),
+    }
+    
+    proposals = {}
+    for key, circle in candidates.items():
+        if circle is None:
+            continue
+        proposals[key] = {
+            "center_x": box[0] + circle["center_x"] / scale,
+            "center_y": box[1] + circle["center_y"] / scale,
+            "radius": circle["radius"] / scale,
+            "score": circle["score"],
+        }
+    return proposals
+
+
+class CircleProposalService:
+    def __init__(self, max_workers=1, max_entries=2048):
+        self.max_workers = max_workers
+        self.max_entries = max_entries
+        self.executor = None
+        self.cache = {}
+        self.pending = {}
+    
+    def key(self, image_path, roi=None):
+        try:
+            mtime = os.path.getmtime(image_path)
+        except OSError:
+            return None
+        roi_key = None
+        if roi:
+            roi_key = (round(roi["x1"]), round(roi["y1"]), round(roi["x2"]), round(roi["y2"]))
+        return (os.path.abspath(image_path), mtime, roi_key)
+    
+    def get(self, image_path, roi=None):
+        return self.cache.get(self.key(image_path, roi))
+    
+    def request(self, image_path, roi=None):
+        key = self.key(image_path, roi)
+        if key is None or key in self.cache or key in self.pending:
+            return
+        
+        if self.executor is None:
+            context = multiprocessing.get_context("spawn")
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        
+        self.pending[key] = self.executor.submit(detect_femur_heads, image_path, roi)
+    
+    def poll(self):
+        finished = []
+        for key, future in list(self.pending.items()):
+            if not future.done():
+                continue
+            del self.pending[key]
+            
+            try:
+                result = future.result()
+            except Exception:
+                result = {}
+            
+            if len(self.cache) >= self.max_entries:
+                self.cache.pop(next(iter(self.cache)))
+            self.cache[key] = result
+            finished.append(key[0])
+        return finished
+    
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,220 @@
+import os
+import math
+from collections import OrderedDict
+
+from drawing import LabelRenderer
+from image_loader import load_image
+from memory_budget import memory_budget, image_bytes, photo_bytes, PRIORITY_RECENT, PRIORITY_PINNED
+
+MAX_VIEW_ENTRIES = 8
+MIN_ZOOM = 0.02
+MAX_ZOOM = 8.0
+
+
+class DecodeCache:
+    def __init__(self, budget=memory_budget):
+        self.budget = budget
+        self.entries = {}
+    
+    def acquire(self, image_path, load=load_image):
+        key = os.path.abspath(image_path)
+        entry = self.entries.get(key)
+        if entry is None:
+            loaded_image = load(image_path)
+            entry = self.entries[key] = [loaded_image, 0]
+            self.budget.register(("decoded", key), loaded_image.memory_bytes(), "decoded", PRIORITY_PINNED)
+        entry[1] += 1
+        return entry[0]
+    
+    def release(self, image_path):
+        key = os.path.abspath(image_path)
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self.entries[key]
+            self.budget.unregister(("decoded", key))
+            entry[0].source.close()
+
+
+class ViewCache:
+    def __init__(self, max_entries=MAX_VIEW_ENTRIES, budget=memory_budget):
+        self.max_entries = max_entries
+        self.budget = budget
+        self.entries = OrderedDict()
+    
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.budget.touch(("comparison_view", key))
+        return entry
+    
+    def put(self, key, display_base, photo):
+        self.entries[key] = (display_base, photo)
+        while len(self.entries) > self.max_entries:
+            old_key, _ = self.entries.popitem(last=False)
+            self.budget.unregister(("comparison_view", old_key))
+        self.budget.register(("comparison_view", key), image_bytes(display_base) + photo_bytes(*display_base.size),
+                             "view", PRIORITY_RECENT, release=lambda: self.entries.pop(key, None))
+    
+    def clear(self):
+        for key in self.entries:
+            self.budget.unregister(("comparison_view", key))
+        self.entries.clear()
+
+
+class ComparisonPane:
+    def __init__(self, canvas, backend, image_path, labels, title):
+        self.canvas = canvas
+        self.backend = backend
+        self.image_path = image_path
+        self.labels = labels or {}
+        self.title = title
+        self.loaded_image = None
+        self.image_item = None
+        self.renderer = None
+        self.photo = None
+        self.view_box = None
+        self.view_key = None
+    
+    def visible_region(self, zoom_factor):
+        x1 = self.canvas.canvasx(0)
+        y1 = self.canvas.canvasy(0)
+        x2 = x1 + max(self.canvas.winfo_width(), 1)
+        y2 = y1 + max(self.canvas.winfo_height(), 1)
+        width = self.loaded_image.width * zoom_factor
+        height = self.loaded_image.height * zoom_factor
+        return (max(x1, 0), max(y1, 0), min(x2, width), min(y2, height))
+    
+    def view_fraction(self, zoom_factor):
+        width = max(self.loaded_image.width * zoom_factor, 1)
+        height = max(self.loaded_image.height * zoom_factor, 1)
+        return self.canvas.canvasx(0) / width, self.canvas.canvasy(0) / height
+    
+    def covers_visible(self, zoom_factor, window_key):
+        if self.view_box is None or self.view_key != (zoom_factor, window_key):
+            return False
+        vx1, vy1, vx2, vy2 = self.visible_region(zoom_factor)
+        bx1, by1, bx2, by2 = self.view_box
+        return bx1 <= vx1 and by1 <= vy1 and bx2 >= vx2 - 1 and by2 >= vy2 - 1
+
+
+class ComparisonView:
+    def __init__(self, panes, decode_cache, window_level, create_photo_image, view_cache=None,
+                 show_labels=True, show_label_text=True):
+        self.panes = panes
+        self.decode_cache = decode_cache
+        self.window_level = window_level
+        self.create_photo_image = create_photo_image
+        self.view_cache = view_cache if view_cache is not None else ViewCache()
+        self.show_labels = show_labels
+        self.show_label_text = show_label_text
+        self.zoom_factor = 1.0
+        self.renders = 0
+        self.view_hits = 0
+    
+    def open(self):
+        for pane in self.panes:
+            pane.loaded_image = self.decode_cache.acquire(pane.image_path)
+            pane.image_item = pane.canvas.create_image(0, 0, anchor="nw")
+            pane.renderer = LabelRenderer(pane.backend, self.zoom_factor, self.show_labels, self.show_label_text)
+        self.fit()
+    
+    def fit(self):
+        self.set_zoom(min(min(pane.canvas.winfo_width() / float(pane.loaded_image.width),
+                              pane.canvas.winfo_height() / float(pane.loaded_image.height))
+                          for pane in self.panes))
+    
+    def zoom(self, factor):
+        self.set_zoom(self.zoom_factor * factor)
+    
+    def set_zoom(self, zoom_factor):
+        lead = self.panes[0]
+        # Keep the point at the centre of the first pane under the centre of every pane
+        vx1, vy1, vx2, vy2 = lead.visible_region(self.zoom_factor)
+        centre = ((vx1 + vx2) / 2 / self.zoom_factor / lead.loaded_image.width,
+                  (vy1 + vy2) / 2 / self.zoom_factor / lead.loaded_image.height)
+        self.zoom_factor = min(max(zoom_factor, MIN_ZOOM), MAX_ZOOM)
+        
+        for pane in self.panes:
+            width = pane.loaded_image.width * self.zoom_factor
+            height = pane.loaded_image.height * self.zoom_factor
+            pane.canvas.configure(scrollregion=(0, 0, int(width), int(height)))
+            pane.canvas.xview_moveto(max(0.0, centre[0] - pane.canvas.winfo_width() / 2.0 / width))
+            pane.canvas.yview_moveto(max(0.0, centre[1] - pane.canvas.winfo_height() / 2.0 / height))
+        self.render()
+    
+    def scroll(self, axis, *args):
+        lead = self.panes[0]
+        if axis == "x":
+            lead.canvas.xview(*args)
+        else:
+            lead.canvas.yview(*args)
+        self.sync_to(lead)
+    
+    def sync_to(self, source):
+        fraction_x, fraction_y = source.view_fraction(self.zoom_factor)
+        for pane in self.panes:
+            if pane is not source:
+                pane.canvas.xview_moveto(fraction_x)
+                pane.canvas.yview_moveto(fraction_y)
+        self.render()
+    
+    def render(self):
+        window_key = self.window_level.key()
+        for pane in self.panes:
+            if not pane.covers_visible(self.zoom_factor, window_key):
+                self.render_pane(pane, window_key)
+    
+    def render_pane(self, pane, window_key):
+        zoom_factor = self.zoom_factor
+        loaded_image = pane.loaded_image
+        vx1, vy1, vx2, vy2 = pane.visible_region(zoom_factor)
+        margin_x = (vx2 - vx1) / 2
+        margin_y = (vy2 - vy1) / 2
+        box = (max(0, int((vx1 - margin_x) / zoom_factor)),
+               max(0, int((vy1 - margin_y) / zoom_factor)),
+               min(loaded_image.width, int(math.ceil((vx2 + margin_x) / zoom_factor))),
+               min(loaded_image.height, int(math.ceil((vy2 + margin_y) / zoom_factor))))
+        if box[2] <= box[0] or box[3] <= box[1]:
+            return
+        
+        # Synchronised panes on the same image ask for identical regions; render those once
+        key = (os.path.abspath(pane.image_path), box, zoom_factor, window_key)
+        cached = self.view_cache.get(key)
+        if cached is None:
+            display_base = loaded_image.source.read_region(box, zoom_factor)
+            cached = (display_base, self.create_photo_image(loaded_image.render(display_base, self.window_level)))
+            self.view_cache.put(key, *cached)
+            self.renders += 1
+        else:
+            self.view_hits += 1
+        display_base, pane.photo = cached
+        
+        pane.canvas.itemconfigure(pane.image_item, image=pane.photo)
+        pane.canvas.coords(pane.image_item, box[0] * zoom_factor, box[1] * zoom_factor)
+        pane.canvas.tag_lower(pane.image_item)
+        pane.view_box = (box[0] * zoom_factor, box[1] * zoom_factor,
+                         box[0] * zoom_factor + display_base.width, box[1] * zoom_factor + display_base.height)
+        pane.view_key = (zoom_factor, window_key)
+        
+        pane.renderer.zoom_factor = zoom_factor
+        pane.renderer.show_labels = self.show_labels
+        pane.renderer.show_label_text = self.show_label_text
+        pane.renderer.redraw_all(pane.labels)
+    
+    def toggle_labels(self):
+        self.show_labels = not self.show_labels
+        for pane in self.panes:
+            pane.renderer.show_labels = self.show_labels
+            pane.renderer.redraw_all(pane.labels)
+    
+    def close(self):
+        for pane in self.panes:
+            if pane.loaded_image is not None:
+                self.decode_cache.release(pane.image_path)
+                pane.loaded_image = None
+            pane.photo = None
+        self.view_cache.clear()
@@ -0,0 +1,68 @@
+class WindowLevel:
+    def __init__(self, window=256.0, level=128.0, gamma=1.0):
+        self.default_window = window
+        self.default_level = level
+        self.default_gamma = gamma
+        self.window = window
+        self.level = level
+        self.gamma = gamma
+        self.min_window = 1.0
+        self.max_window = 512.0
+        self.min_gamma = 0.1
+        self.max_gamma = 5.0
+        self._lut_cache = {}
+    
+    def reset(self):
+        self.window = self.default_window
+        self.level = self.default_level
+        self.gamma = self.default_gamma
+    
+    def is_identity(self):
+        return (self.window == self.default_window and
+                self.level == self.default_level and
+                self.gamma == self.default_gamma)
+    
+    def adjust(self, d_window, d_level):
+        self.window = min(max(self.window + d_window, self.min_window), self.max_window)
+        self.level = min(max(self.level + d_level, 0.0), 255.0)
+    
+    def set_gamma(self, gamma):
+        self.gamma = min(max(gamma, self.min_gamma), self.max_gamma)
+    
+    def key(self):
+        return (round(self.window, 1), round(self.level, 1), round(self.gamma, 2))
+    
+    def build_lut(self):
+        key = self.key()
+        lut = self._lut_cache.get(key)
+        if lut is not None:
+            return lut
+        
+        window, level, gamma = key
+        low = level - window / 2
+        inv_gamma = 1.0 / gamma
+        lut = []
+        for value in range(256):
+            t = (value - low) / window
+            t = min(1.0, max(0.0, t))
+            lut.append(int(round((t ** inv_gamma) * 255)))
+        
+        if len(self._lut_cache) > 64:
+            self._lut_cache.clear()
+        self._lut_cache[key] = lut
+        return lut
+    
+    def apply(self, image):
+        if self.is_identity():
+            return image
+        
+        if image.mode not in ("L", "RGB", "RGBA"):
+            image = image.convert("L")
+        
+        lut = self.build_lut()
+        if image.mode == "RGBA":
+            return image.point(lut * 3 + list(range(256)))
+        return image.point(lut * len(image.getbands()))
+    
+    def describe(self):
+        return f"W: {self.window:.0f}  L: {self.level:.0f}  γ: {self.gamma:.2f}"
@@ -181,6 +181,36 @@ class LabelRenderer:
                 tags=(f"{tag}_label", "annotation")
             )
     
+    def draw_suggestions(self, suggestions):
+        self.canvas.delete("suggestion")
+        
+        if not self.show_labels:
+            return
+        
+        for tag, label, color in (("left_circle", "L-Femur?", "#ff4500"),
+                                  ("right_circle", "R-Femur?", "#4169e1")):
+            if tag not in suggestions:
+                continue
+            
+            circle = suggestions[tag]
+            cx, cy = circle["center_x"] * self.zoom_factor, circle["center_y"] * self.zoom_factor
+            r = circle["radius"] * self.zoom_factor
+            
+            self.canvas.create_oval(
+                cx-r, cy-r, cx+r, cy+r, 
+                outline=color, width=2, dash=(2, 4),
+                tags=("suggestion",)
+            )
+            
+            if self.show_label_text:
+                self.canvas.create_text(
+                    cx, cy-r-15, 
+                    text=label, 
+                    fill=color, 
+                    font=("Segoe UI", 9),
+                    tags=("suggestion",)
+                )
+    
     def draw_angle_lines(self, labels, left_angle, right_angle, left_femur_angle, right_femur_angle):
         self.canvas.delete("angle_line")
         
@@ -0,0 +1,331 @@
+import os
+import copy
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from file_manager import load_images_from_folder
+from image_loader import load_image
+from circle_detection import to_gray
+
+HASH_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".norberg_olsen_cache", "image_hashes")
+HASH_VERSION = 1
+HASH_SIZE = 8
+DCT_SIZE = 32
+DECODE_SIZE = 256
+DUPLICATE_DISTANCE = 6
+X_KEYS = ("x1", "x2", "x", "center_x")
+Y_KEYS = ("y1", "y2", "y", "center_y")
+
+
+def dct_matrix(size):
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2.0 * size)) * np.sqrt(2.0 / size)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+DCT = dct_matrix(DCT_SIZE)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def perceptual_hash(gray):
+    small = Image.fromarray(np.asarray(gray, dtype=np.float32), mode="F")
+    small = np.asarray(small.resize((DCT_SIZE, DCT_SIZE), Image.Resampling.BOX), dtype=np.float64)
+    coefficients = (DCT @ small @ DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    # The DC term only carries overall brightness, which differs between exports of the same film
+    bits = coefficients > np.median(coefficients[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hash_image(image_path):
+    signature = file_signature(image_path)
+    loaded_image = load_image(image_path)
+    try:
+        width, height = loaded_image.width, loaded_image.height
+        scale = min(1.0, DECODE_SIZE / float(max(width, height)))
+        gray = to_gray(loaded_image.source.read_full(scale), loaded_image)
+    finally:
+        loaded_image.source.close()
+    return signature, perceptual_hash(gray), (width, height)
+
+
+def scale_labels(labels, sx, sy):
+    scaled = copy.deepcopy(labels)
+    if sx == 1 and sy == 1:
+        return scaled
+    for item in scaled.values():
+        if not isinstance(item, dict):
+            continue
+        for key in item:
+            if key in X_KEYS:
+                item[key] *= sx
+            elif key in Y_KEYS:
+                item[key] *= sy
+            elif key == "radius":
+                item[key] *= (sx + sy) / 2
+    return scaled
+
+
+class BKNode:
+    def __init__(self, value):
+        self.value = value
+        self.items = set()
+        self.children = {}
+
+
+class BKTree:
+    def __init__(self):
+        self.root = None
+    
+    def find(self, value, create=False):
+        if self.root is None:
+            if not create:
+                return None
+            self.root = BKNode(value)
+            return self.root
+        
+        node = self.root
+        while True:
+            distance = hamming(value, node.value)
+            if distance == 0:
+                return node
+            child = node.children.get(distance)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[distance] = BKNode(value)
+                return child
+            node = child
+    
+    def add(self, value, item):
+        self.find(value, create=True).items.add(item)
+    
+    def discard(self, value, item):
+        node = self.find(value)
+        if node is not None:
+            node.items.discard(item)
+    
+    def search(self, value, max_distance):
+        results = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node.value)
+            if distance <= max_distance:
+                results.extend((distance, item) for item in node.items)
+            # Triangle inequality: only subtrees at these edge distances can hold matches
+            for edge, child in node.children.items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return results
+
+
+def cache_path(folder_path):
+    key = hashlib.sha1(os.path.abspath(folder_path).encode("utf-8")).hexdigest()
+    return os.path.join(HASH_CACHE_DIR, key + ".npz")
+
+
+class DuplicateIndex:
+    def __init__(self, folder_path, max_distance=DUPLICATE_DISTANCE):
+        self.folder_path = folder_path
+        self.max_distance = max_distance
+        self.entries = {}
+        self.tree = BKTree()
+        self.dirty = False
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def load(self, image_files):
+        cached = {}
+        try:
+            with np.load(cache_path(self.folder_path), allow_pickle=False) as data:
+                if int(data["version"]) == HASH_VERSION:
+                    for name, signature, value, size in zip(data["names"].tolist(), data["signatures"].tolist(),
+                                                            data["hashes"].tolist(), data["sizes"].tolist()):
+                        cached[name] = (tuple(signature), value, tuple(size))
+        except (OSError, KeyError, ValueError):
+            pass
+        
+        missing = []
+        for image_path in image_files:
+            file_name = os.path.basename(image_path)
+            try:
+                signature = file_signature(image_path)
+            except OSError:
+                continue
+            entry = cached.get(file_name)
+            if entry is not None and entry[0] == signature:
+                self.add(file_name, *entry)
+            else:
+                missing.append(image_path)
+        self.dirty = len(self.entries) != len(cached)
+        return missing
+    
+    def add(self, file_name, signature, value, size):
+        old = self.entries.get(file_name)
+        if old is not None:
+            self.tree.discard(old[1], file_name)
+        self.entries[file_name] = (tuple(signature), value, tuple(size))
+        self.tree.add(value, file_name)
+        self.dirty = True
+    
+    def add_result(self, image_path, result):
+        if result is None or os.path.abspath(os.path.dirname(image_path)) != os.path.abspath(self.folder_path):
+            return False
+        self.add(os.path.basename(image_path), *result)
+        return True
+    
+    def matches(self, file_name):
+        entry = self.entries.get(file_name)
+        if entry is None:
+            return []
+        return sorted((distance, name) for distance, name in self.tree.search(entry[1], self.max_distance)
+                      if name != file_name)
+    
+    def original(self, file_name, labels):
+        if file_name in labels:
+            return None
+        names = [name for _, name in self.matches(file_name)]
+        labelled = [name for name in names if name in labels]
+        if labelled:
+            return labelled[0]
+        earlier = [name for name in names if name < file_name]
+        return min(earlier) if earlier else None
+    
+    def transfer_labels(self, source, target, labels):
+        source_size = self.entries[source][2]
+        target_size = self.entries[target][2]
+        return scale_labels(labels, target_size[0] / float(source_size[0]), target_size[1] / float(source_size[1]))
+    
+    def groups(self):
+        parents = {name: name for name in self.entries}
+        
+        def root(name):
+            while parents[name] != name:
+                parents[name] = parents[parents[name]]
+                name = parents[name]
+            return name
+        
+        for name in self.entries:
+            for _, other in self.matches(name):
+                a, b = root(name), root(other)
+                if a != b:
+                    parents[max(a, b)] = min(a, b)
+        
+        groups = {}
+        for name in sorted(self.entries):
+            groups.setdefault(root(name), []).append(name)
+        return [members for members in groups.values() if len(members) > 1]
+    
+    def save(self):
+        if not self.dirty:
+            return
+        names = sorted(self.entries)
+        target = cache_path(self.folder_path)
+        try:
+            os.makedirs(HASH_CACHE_DIR, exist_ok=True)
+            temp_path = target + ".tmp.npz"
+            np.savez(temp_path, version=HASH_VERSION, names=np.array(names, dtype=str),
+                     signatures=np.array([self.entries[name][0] for name in names], dtype=np.int64).reshape(-1, 2),
+                     hashes=np.array([self.entries[name][1] for name in names], dtype=np.uint64),
+                     sizes=np.array([self.entries[name][2] for name in names], dtype=np.int64).reshape(-1, 2))
+            os.replace(temp_path, target)
+            self.dirty = False
+        except OSError:
+            pass
+
+
+class HashService:
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.executor = None
+        self.pending = {}
+    
+    def submit(self, image_paths):
+        if self.executor is None:
+            context = multiprocessing.get_context("spawn")
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        
+        for image_path in image_paths:
+            if image_path not in self.pending:
+                self.pending[image_path] = self.executor.submit(hash_image, image_path)
+    
+    def poll(self):
+        finished = []
+        for image_path, future in list(self.pending.items()):
+            if not future.done():
+                continue
+            del self.pending[image_path]
+            
+            try:
+                result = future.result()
+            except Exception:
+                result = None
+            finished.append((image_path, result))
+        return finished
+    
+    def cancel(self):
+        for future in self.pending.values():
+            future.cancel()
+        self.pending = {}
+    
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.pending = {}
+
+
+def index_folder(folder_path, max_distance=DUPLICATE_DISTANCE, workers=None):
+    image_files = load_images_from_folder(folder_path)
+    index = DuplicateIndex(folder_path, max_distance)
+    missing = index.load(image_files)
+    failed = []
+    if missing:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [(path, executor.submit(hash_image, path)) for path in missing]
+            for image_path, future in futures:
+                try:
+                    index.add_result(image_path, future.result())
+                except Exception as e:
+                    failed.append((os.path.basename(image_path), str(e)))
+    index.save()
+    return index, len(missing) - len(failed), failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a folder's perceptual-hash index and list groups of "
+                                                 "near-duplicate images.")
+    parser.add_argument("folder", help="Folder of images")
+    parser.add_argument("--max-distance", type=int, default=DUPLICATE_DISTANCE,
+                        help="Largest Hamming distance between 64-bit hashes that counts as a duplicate")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    args = parser.parse_args()
+    
+    index, hashed, failed = index_folder(args.folder, args.max_distance, args.workers)
+    groups = index.groups()
+    print(f"Indexed {len(index)} images ({hashed} hashed, {len(index) - hashed} from cache); "
+          f"{len(groups)} groups of near-duplicates.")
+    for members in groups:
+        print("  " + ", ".join(members))
+    for file_name, error in failed:
+        print(f"Failed: {file_name}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import os
+import numpy as np
+
+from circle_detection import smooth, sobel, to_gray
+from memory_budget import memory_budget, PRIORITY_CACHE
+
+GRADIENT_SIZE = 2048
+RAY_COUNT = 72
+RADIUS_SEARCH = 0.2
+CENTER_SEARCH = 3
+KEYPOINT_SEARCH = 6
+
+
+class GradientField:
+    def __init__(self, gx, gy, scale):
+        self.gx = gx
+        self.gy = gy
+        self.scale = scale
+        self.magnitude = np.hypot(gx, gy)
+        self.height, self.width = gx.shape
+    
+    def nbytes(self):
+        return self.gx.nbytes + self.gy.nbytes + self.magnitude.nbytes
+    
+    def sample(self, xs, ys):
+        xi = np.clip(np.rint(xs).astype(np.int64), 0, self.width - 1)
+        yi = np.clip(np.rint(ys).astype(np.int64), 0, self.height - 1)
+        return self.gx[yi, xi], self.gy[yi, xi]
+
+
+class GradientCache:
+    def __init__(self, max_entries=4, budget=memory_budget):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.budget = budget
+    
+    def key(self, loaded_image):
+        try:
+            mtime = os.path.getmtime(loaded_image.path)
+        except OSError:
+            mtime = None
+        return (os.path.abspath(loaded_image.path), mtime)
+    
+    def get(self, loaded_image):
+        field = self.lookup(loaded_image)
+        if field is None:
+            field = compute_gradients(loaded_image)
+            self.store(self.key(loaded_image), field)
+        return field
+    
+    def lookup(self, loaded_image):
+        key = self.key(loaded_image)
+        field = self.entries.get(key)
+        if field is not None:
+            self.budget.touch(("gradients", key))
+        return field
+    
+    def store(self, key, field):
+        if key in self.entries:
+            return
+        if len(self.entries) >= self.max_entries:
+            self.discard(next(iter(self.entries)))
+        self.entries[key] = field
+        self.budget.register(("gradients", key), field.nbytes(), "gradients", PRIORITY_CACHE,
+                             lambda: self.entries.pop(key, None))
+    
+    def discard(self, key):
+        self.entries.pop(key, None)
+        self.budget.unregister(("gradients", key))
+
+
+def compute_gradients(loaded_image, gradient_size=GRADIENT_SIZE):
+    scale = min(1.0, gradient_size / float(max(loaded_image.width, loaded_image.height)))
+    image = loaded_image.source.read_full(scale)
+    gray = to_gray(image, loaded_image)
+    gx, gy = sobel(smooth(gray))
+    return GradientField(gx, gy, gray.shape[1] / float(loaded_image.width))
+
+
+def score_circles(field, cx, cy, offsets, radii, cos_a, sin_a):
+    ox, oy, rr, ca = np.meshgrid(offsets, offsets, radii, cos_a, indexing="ij")
+    sa = np.broadcast_to(sin_a, ca.shape)
+    xs = cx + ox + rr * ca
+    ys = cy + oy + rr * sa
+    
+    gx, gy = field.sample(xs, ys)
+    inward = -(gx * ca + gy * sa)
+    scores = np.clip(inward, 0, None).mean(axis=3)
+    
+    best = np.unravel_index(int(np.argmax(scores)), scores.shape)
+    return (cx + offsets[best[0]], cy + offsets[best[1]], radii[best[2]], scores[best])
+
+
+def snap_circle(circle, field, radius_search=RADIUS_SEARCH, center_search=CENTER_SEARCH,
+                ray_count=RAY_COUNT):
+    cx = circle["center_x"] * field.scale
+    cy = circle["center_y"] * field.scale
+    r = circle["radius"] * field.scale
+    if r < 3:
+        return circle
+    
+    angles = np.linspace(0, 2 * np.pi, ray_count, endpoint=False)
+    cos_a = np.cos(angles)
+    sin_a = np.sin(angles)
+    
+    radius_steps = max(3, int(r * radius_search))
+    offsets = np.arange(-center_search, center_search + 1) * 2
+    for _ in range(3):
+        radii = r + np.arange(-radius_steps, radius_steps + 1, 2)
+        radii = radii[radii >= 3]
+        new_cx, new_cy, r, score = score_circles(field, cx, cy, offsets, radii, cos_a, sin_a)
+        moved = max(abs(new_cx - cx), abs(new_cy - cy))
+        cx, cy = new_cx, new_cy
+        if moved < offsets[-1]:
+            break
+    
+    radii = r + np.arange(-1, 2)
+    radii = radii[radii >= 3]
+    offsets = np.arange(-1, 2)
+    cx, cy, r, score = score_circles(field, cx, cy, offsets, radii, cos_a, sin_a)
+    
+    if score <= 0:
+        return circle
+    
+    return {
+        "center_x": float(cx / field.scale),
+        "center_y": float(cy / field.scale),
+        "radius": float(r / field.scale)
+    }
+
+
+def snap_keypoint(keypoint, field, search=KEYPOINT_SEARCH):
+    x = keypoint["x"] * field.scale
+    y = keypoint["y"] * field.scale
+    
+    x1 = max(0, int(round(x)) - search)
+    y1 = max(0, int(round(y)) - search)
+    x2 = min(field.width, int(round(x)) + search + 1)
+    y2 = min(field.height, int(round(y)) + search + 1)
+    if x1 >= x2 or y1 >= y2:
+        return keypoint
+    
+    window = field.magnitude[y1:y2, x1:x2]
+    yy, xx = np.mgrid[y1:y2, x1:x2]
+    distance = np.hypot(xx - x, yy - y)
+    weighted = window * (1.0 - 0.5 * distance / (search * np.sqrt(2)))
+    
+    index = np.unravel_index(int(np.argmax(weighted)), weighted.shape)
+    if window[index] <= 0:
+        return keypoint
+    
+    return {
+        "x": float((x1 + index[1]) / field.scale),
+        "y": float((y1 + index[0]) / field.scale)
+    }
@@ -1,34 +1,119 @@
 import os
+import re
 import json
 import csv
+import time
 from tkinter import messagebox
 
-def load_labels(folder_path):
+from label_store import LazyLabels, open_labels, write_lazy_labels
+from label_binary import BINARY_EXTENSION, open_binary_labels, write_binary_labels
+
+LABELS_FILE_NAME = "norberg_olsen_labels.json"
+BINARY_LABELS_FILE_NAME = "norberg_olsen_labels" + BINARY_EXTENSION
+SHARD_PREFIX = "norberg_olsen_labels."
+SHARD_SUFFIX = ".jsonl"
+
+def labels_path(folder_path):
+    json_path = os.path.join(folder_path, LABELS_FILE_NAME)
+    binary_path = os.path.join(folder_path, BINARY_LABELS_FILE_NAME)
+    if not os.path.exists(json_path) and os.path.exists(binary_path):
+        return binary_path
+    return json_path
+
+def shard_path(folder_path, annotator):
+    safe_name = re.sub(r"[^A-Za-z0-9_-]+", "_", annotator)
+    return os.path.join(folder_path, f"{SHARD_PREFIX}{safe_name}{SHARD_SUFFIX}")
+
+def list_shards(folder_path):
+    shards = {}
+    for file_name in sorted(os.listdir(folder_path)):
+        if file_name.startswith(SHARD_PREFIX) and file_name.endswith(SHARD_SUFFIX):
+            annotator = file_name[len(SHARD_PREFIX):-len(SHARD_SUFFIX)]
+            shards[annotator] = os.path.join(folder_path, file_name)
+    return shards
+
+def iter_shard(path):
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # A torn final line from an interrupted append; later saves supersede it
+                continue
+
+def read_shard(path):
+    # Cleared images stay as None so they can also be removed from the base labels
+    labels = {}
+    if os.path.exists(path):
+        for entry in iter_shard(path):
+            labels[entry["image"]] = entry.get("labels") or None
+    return labels
+
+def append_shard(path, entries, annotator=None):
+    now = time.time()
+    with open(path, 'a') as f:
+        lines = [json.dumps({"image": image, "labels": labels or None, "time": now, "annotator": annotator})
+                 for image, labels in entries.items()]
+        f.write("".join(line + "\n" for line in lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+def read_labels(folder_path, annotator=None):
+    path = labels_path(folder_path)
+    
+    labels = {}
+    if path.endswith(BINARY_EXTENSION):
+        labels = open_binary_labels(path)
+    elif os.path.exists(path):
+        labels = open_labels(path)
+    
+    if annotator:
+        for image, image_labels in read_shard(shard_path(folder_path, annotator)).items():
+            if image_labels:
+                labels[image] = image_labels
+            else:
+                labels.pop(image, None)
+    return labels
+
+def load_labels(folder_path, annotator=None):
     if not folder_path:
         return {}
     
-    json_path = os.path.join(folder_path, "norberg_olsen_labels.json")
+    try:
+        return read_labels(folder_path, annotator)
+    except Exception as e:
+        messagebox.showerror("Error", f"Could not load labels: {str(e)}")
+        return {}
+
+def write_folder_labels(folder_path, labels, annotator=None, changed=None):
+    if annotator:
+        names = labels if changed is None else changed
+        append_shard(shard_path(folder_path, annotator),
+                     {name: labels.get(name) for name in names}, annotator)
+        return
+    
+    path = labels_path(folder_path)
+    if path.endswith(BINARY_EXTENSION):
+        write_binary_labels(path, labels)
+        return
     
-    if os.path.exists(json_path):
-        try:
-            with open(json_path, 'r') as f:
-                labels = json.load(f)
-            return labels
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not load labels: {str(e)}")
-            return {}
-    return {}
-
-def save_labels(folder_path, labels):
+    if isinstance(labels, LazyLabels):
+        write_lazy_labels(path, labels)
+        return
+    
+    with open(path, 'w') as f:
+        json.dump(labels, f, indent=4)
+
+def save_labels(folder_path, labels, annotator=None, changed=None):
     if not folder_path:
         messagebox.showwarning("No Folder", "Please open a folder first.")
         return False
     
-    json_path = os.path.join(folder_path, "norberg_olsen_labels.json")
-    
     try:
-        with open(json_path, 'w') as f:
-            json.dump(labels, f, indent=4)
+        write_folder_labels(folder_path, labels, annotator, changed)
         return True
     except Exception as e:
         messagebox.showerror("Error", f"Could not save labels: {str(e)}")
@@ -86,13 +171,15 @@ def load_images_from_folder(folder_path):
     image_files.sort()
     return image_files
 
-def save_session_info(folder_path, image_index):
+def save_session_info(folder_path, image_index, project_path=None):
     config_file = os.path.join(os.path.expanduser("~"), "norberg_olsen_config.json")
     
     config = {
         "last_folder": folder_path,
         "last_image_index": image_index
     }
+    if project_path:
+        config["last_project"] = project_path
     
     try:
         with open(config_file, 'w') as f:
@@ -0,0 +1,88 @@
+import tkinter as tk
+
+from canvas_backend import HeadlessCanvas
+from main import NorbergOlsenLabelingApp
+
+
+class HeadlessLabelingApp(NorbergOlsenLabelingApp):
+    def __init__(self, root=None, width=1200, height=700, annotator=None, label_service=False):
+        self.viewport_size = (width, height)
+        self.messages = []
+        super().__init__(root if root is not None else tk.Tcl(), annotator, label_service)
+    
+    def configure_root(self):
+        pass
+    
+    def create_style(self):
+        pass
+    
+    def create_context_menu(self):
+        self.context_menu = None
+    
+    def create_menu(self):
+        pass
+    
+    def create_toolbar(self):
+        pass
+    
+    def create_canvas(self):
+        self.canvas = HeadlessCanvas(*self.viewport_size)
+        self.canvas_backend = self.canvas
+        self.bind_canvas_events()
+    
+    def create_status_bar(self):
+        self.create_status_variables()
+    
+    def bind_shortcuts(self):
+        pass
+    
+    def check_last_session(self):
+        pass
+    
+    def remember_session(self):
+        pass
+    
+    def show_info(self, title, message):
+        self.messages.append(("info", title, message))
+    
+    def show_warning(self, title, message):
+        self.messages.append(("warning", title, message))
+    
+    def show_error(self, title, message):
+        self.messages.append(("error", title, message))
+    
+    def ask_float(self, title, prompt, initial_value):
+        self.messages.append(("question", title, prompt))
+        return initial_value
+    
+    def ask_yes_no(self, title, message):
+        self.messages.append(("question", title, message))
+        return True
+    
+    def show_context_menu(self, event):
+        pass
+    
+    def create_photo_image(self, image):
+        return image
+    
+    def create_comparison_window(self, titles):
+        canvases = []
+        for _ in titles:
+            canvas = HeadlessCanvas(self.viewport_size[0] // len(titles), self.viewport_size[1])
+            canvases.append((canvas, canvas))
+        return canvases
+    
+    def flush(self):
+        self.root.update()
+    
+    def close(self):
+        self.circle_proposals.shutdown()
+        self.hash_service.shutdown()
+        self.finish_background_work()
+        self.background.close()
+        self.prefetcher.discard()
+        self.close_label_service()
+        self.close_comparison()
+        if self.loaded_image is not None:
+            self.decode_cache.release(self.loaded_image.path)
+            self.loaded_image = None
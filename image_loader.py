@@ -0,0 +1,147 @@
+import os
+import numpy as np
+from PIL import Image
+
+from image_source import PILImageSource, MemmapImageSource, open_image_source
+from memory_budget import image_bytes, resident_bytes
+from pyramid_cache import open_cached_pyramid
+
+HIGH_BIT_DEPTH_MODES = ("I;16", "I;16L", "I;16B", "I;16N", "I", "F")
+
+
+class LoadedImage:
+    def __init__(self, path, source, data=None, tone_map=None):
+        self.path = path
+        self.source = source
+        self._data = data
+        self.tone_map = tone_map
+        self.tone_lut = None
+        
+        if tone_map is not None:
+            self.tone_lut = build_tone_lut(*tone_map)
+    
+    @property
+    def width(self):
+        return self.source.width
+    
+    @property
+    def height(self):
+        return self.source.height
+    
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self.source.as_array()
+        return self._data
+    
+    @property
+    def high_bit_depth(self):
+        return self.tone_lut is not None
+    
+    def memory_bytes(self):
+        size = resident_bytes(self._data)
+        if self.tone_lut is not None:
+            size += self.tone_lut.nbytes
+        if not isinstance(self.source, MemmapImageSource):
+            size += image_bytes(self.source.image)
+        return size
+    
+    def render(self, resized, window_level):
+        if not self.high_bit_depth:
+            return window_level.apply(resized)
+        
+        lut = self.tone_lut
+        if not window_level.is_identity():
+            lut = np.asarray(window_level.build_lut(), dtype=np.uint8)[lut]
+        
+        return Image.fromarray(lut[np.asarray(resized)])
+
+
+class ToneMapCache:
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.entries = {}
+    
+    def key(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    
+    def get(self, path):
+        key = self.key(path)
+        if key is None:
+            return None
+        return self.entries.get(key)
+    
+    def put(self, path, tone_map):
+        key = self.key(path)
+        if key is None:
+            return
+        if len(self.entries) >= self.max_entries:
+            self.entries.pop(next(iter(self.entries)))
+        self.entries[key] = tone_map
+
+
+tone_map_cache = ToneMapCache()
+
+
+def is_high_bit_depth(mode):
+    return mode in HIGH_BIT_DEPTH_MODES
+
+
+def to_uint16(data):
+    if data.dtype.kind == "u" and data.dtype.itemsize == 2:
+        return data.astype(np.uint16, copy=False)
+    
+    data = data.astype(np.float32, copy=False)
+    low = float(np.nanmin(data))
+    high = float(np.nanmax(data))
+    if high <= low:
+        return np.zeros(data.shape, dtype=np.uint16)
+    
+    scaled = (data - low) * (65535.0 / (high - low))
+    return np.nan_to_num(scaled).astype(np.uint16)
+
+
+def compute_tone_map(data, low_percentile=0.5, high_percentile=99.5, max_samples=1000000):
+    step = max(1, int(np.sqrt(data.size / max_samples)))
+    sample = data[::step, ::step]
+    low, high = np.percentile(sample, [low_percentile, high_percentile])
+    
+    low = int(low)
+    high = int(high)
+    if high <= low:
+        high = low + 1
+    return low, high
+
+
+def build_tone_lut(low, high):
+    values = np.arange(65536, dtype=np.float32)
+    scaled = (values - low) * (255.0 / (high - low))
+    return np.clip(scaled, 0, 255).astype(np.uint8)
+
+
+def load_image(path, use_cache=True):
+    if use_cache:
+        cached = open_cached_pyramid(path)
+        if cached is not None:
+            return LoadedImage(path, cached, tone_map=cached.tone_map)
+    
+    source = open_image_source(path)
+    
+    if not is_high_bit_depth(source.mode):
+        return LoadedImage(path, source)
+    
+    data = None
+    if source.mode != "I;16":
+        data = source.as_array()
+        source = PILImageSource(Image.fromarray(to_uint16(data)))
+    
+    tone_map = tone_map_cache.get(path)
+    if tone_map is None:
+        tone_map = compute_tone_map(source.sample())
+        tone_map_cache.put(path, tone_map)
+    
+    return LoadedImage(path, source, data=data, tone_map=tone_map)
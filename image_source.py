@@ -0,0 +1,230 @@
+import math
+from abc import ABC, abstractmethod
+import numpy as np
+from PIL import Image
+
+RAW_LAYOUTS = {
+    "L": ("u1", 1, "L"),
+    "I;16": ("<u2", 1, "I;16"),
+    "I;16L": ("<u2", 1, "I;16"),
+    "I;16B": (">u2", 1, "I;16"),
+    "RGB": ("u1", 3, "RGB"),
+    "BGR": ("u1", 3, "RGB"),
+    "RGBA": ("u1", 4, "RGBA"),
+}
+
+REDUCIBLE_MODES = ("L", "RGB", "RGBA")
+
+
+def region_size(box, scale):
+    x1, y1, x2, y2 = box
+    return (max(1, int(math.ceil((x2 - x1) * scale))),
+            max(1, int(math.ceil((y2 - y1) * scale))))
+
+
+def clamp_box(box, width, height):
+    x1, y1, x2, y2 = box
+    x1 = min(max(int(math.floor(x1)), 0), width)
+    y1 = min(max(int(math.floor(y1)), 0), height)
+    x2 = min(max(int(math.ceil(x2)), x1), width)
+    y2 = min(max(int(math.ceil(y2)), y1), height)
+    return x1, y1, x2, y2
+
+
+class ImageSource(ABC):
+    def __init__(self, width, height, mode, image=None):
+        self.image = image
+        self.width = width
+        self.height = height
+        self.mode = mode
+    
+    @property
+    def size(self):
+        return (self.width, self.height)
+    
+    @abstractmethod
+    def read_region(self, box, scale):
+        pass
+    
+    def read_full(self, scale):
+        return self.read_region((0, 0, self.width, self.height), scale)
+    
+    def fit_region(self, box, visible):
+        return box
+    
+    def sample(self, max_pixels=1000000):
+        scale = min(1.0, math.sqrt(max_pixels / float(self.width * self.height)))
+        return np.asarray(self.read_full(scale))
+    
+    @abstractmethod
+    def as_array(self):
+        pass
+    
+    def close(self):
+        pass
+
+
+class PILImageSource(ImageSource):
+    def __init__(self, image):
+        super().__init__(image.width, image.height, image.mode, image)
+    
+    def read_region(self, box, scale):
+        box = clamp_box(box, self.width, self.height)
+        size = region_size(box, scale)
+        
+        if scale == 1.0:
+            return self.image.crop(box)
+        
+        if self.image.mode in REDUCIBLE_MODES:
+            return self.image.resize(size, Image.Resampling.LANCZOS, box=box, reducing_gap=2.0)
+        return self.image.resize(size, Image.Resampling.LANCZOS, box=box)
+    
+    def as_array(self):
+        return np.asarray(self.image)
+    
+    def close(self):
+        self.image.close()
+
+
+class MemmapImageSource(ImageSource):
+    def __init__(self, path, width, height, tiles, image=None):
+        super().__init__(width, height, tiles[0]["mode"], image)
+        self.path = path
+        self.tiles = tiles
+        self._buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    
+    @classmethod
+    def from_image(cls, image, path):
+        tiles = []
+        for tile in image.tile:
+            codec_name, extents, offset, args = tile[0], tile[1], tile[2], tile[3]
+            if codec_name != "raw":
+                return None
+            
+            if isinstance(args, str):
+                args = (args, 0, 1)
+            rawmode = args[0]
+            stride = args[1] if len(args) > 1 else 0
+            orientation = args[2] if len(args) > 2 else 1
+            
+            if rawmode not in RAW_LAYOUTS:
+                return None
+            
+            dtype, channels, mode = RAW_LAYOUTS[rawmode]
+            x1, y1, x2, y2 = extents
+            row_bytes = (x2 - x1) * channels * np.dtype(dtype).itemsize
+            tiles.append({
+                "box": (x1, y1, x2, y2),
+                "offset": offset,
+                "dtype": dtype,
+                "channels": channels,
+                "mode": mode,
+                "stride": stride or row_bytes,
+                "orientation": orientation,
+                "reverse_channels": rawmode == "BGR",
+            })
+        
+        if not tiles or len(set(t["mode"] for t in tiles)) != 1:
+            return None
+        return cls(path, image.width, image.height, tiles, image)
+    
+    @classmethod
+    def from_raw(cls, path, width, height, mode="I;16", offset=0):
+        dtype, channels, out_mode = RAW_LAYOUTS[mode]
+        row_bytes = width * channels * np.dtype(dtype).itemsize
+        tiles = [{
+            "box": (0, 0, width, height),
+            "offset": offset,
+            "dtype": dtype,
+            "channels": channels,
+            "mode": out_mode,
+            "stride": row_bytes,
+            "orientation": 1,
+            "reverse_channels": False,
+        }]
+        return cls(path, width, height, tiles)
+    
+    def tile_array(self, tile):
+        x1, y1, x2, y2 = tile["box"]
+        rows = y2 - y1
+        cols = x2 - x1
+        itemsize = np.dtype(tile["dtype"]).itemsize
+        channels = tile["channels"]
+        
+        shape = (rows, cols, channels)
+        strides = (tile["stride"], channels * itemsize, itemsize)
+        offset = tile["offset"]
+        if tile["orientation"] < 0:
+            offset += (rows - 1) * tile["stride"]
+            strides = (-tile["stride"],) + strides[1:]
+        
+        array = np.ndarray(shape, dtype=tile["dtype"], buffer=self._buffer,
+                           offset=offset, strides=strides)
+        if tile["reverse_channels"]:
+            array = array[:, :, ::-1]
+        return array
+    
+    def read_region(self, box, scale):
+        box = clamp_box(box, self.width, self.height)
+        size = region_size(box, scale)
+        x1, y1, x2, y2 = box
+        
+        step = max(1, int(1.0 / (scale * 2))) if scale < 1.0 else 1
+        out_w = len(range(x1, x2, step))
+        out_h = len(range(y1, y2, step))
+        channels = self.tiles[0]["channels"]
+        dtype = np.dtype(self.tiles[0]["dtype"]).newbyteorder("=")
+        out = np.zeros((max(out_h, 1), max(out_w, 1), channels), dtype=dtype)
+        
+        for tile in self.tiles:
+            tx1, ty1, tx2, ty2 = tile["box"]
+            ix1, iy1 = max(x1, tx1), max(y1, ty1)
+            ix2, iy2 = min(x2, tx2, self.width), min(y2, ty2, self.height)
+            if ix1 >= ix2 or iy1 >= iy2:
+                continue
+            
+            sx1 = x1 + -(-(ix1 - x1) // step) * step
+            sy1 = y1 + -(-(iy1 - y1) // step) * step
+            if sx1 >= ix2 or sy1 >= iy2:
+                continue
+            
+            view = self.tile_array(tile)[sy1 - ty1:iy2 - ty1:step, sx1 - tx1:ix2 - tx1:step]
+            oy = (sy1 - y1) // step
+            ox = (sx1 - x1) // step
+            out[oy:oy + view.shape[0], ox:ox + view.shape[1]] = view
+        
+        if channels == 1:
+            out = out[:, :, 0]
+        region = Image.fromarray(out)
+        
+        if region.size != size:
+            if region.mode in REDUCIBLE_MODES:
+                region = region.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+            else:
+                region = region.resize(size, Image.Resampling.LANCZOS)
+        return region
+    
+    def as_array(self):
+        if len(self.tiles) == 1 and self.tiles[0]["box"] == (0, 0, self.width, self.height):
+            array = self.tile_array(self.tiles[0])
+            return array[:, :, 0] if array.shape[2] == 1 else array
+        return np.asarray(self.read_region((0, 0, self.width, self.height), 1.0))
+    
+    def close(self):
+        self._buffer = None
+        if self.image is not None:
+            self.image.close()
+
+
+def open_image_source(path):
+    image = Image.open(path)
+    
+    if getattr(image, "n_frames", 1) == 1:
+        try:
+            source = MemmapImageSource.from_image(image, path)
+        except (ValueError, TypeError, OSError):
+            source = None
+        if source is not None:
+            return source
+    
+    return PILImageSource(image)
@@ -0,0 +1,110 @@
+import os
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from file_manager import load_images_from_folder
+from image_loader import load_image
+from pyramid_cache import (CACHEABLE_MODES, cache_path, source_signature, is_cached, build_levels,
+                           write_pyramid)
+
+
+def ingest_image(image_path, force=False):
+    if not force and is_cached(image_path):
+        return "fresh"
+    
+    signature = source_signature(image_path)
+    loaded_image = load_image(image_path, use_cache=False)
+    try:
+        if loaded_image.source.mode not in CACHEABLE_MODES:
+            return "unsupported"
+        levels = build_levels(np.asarray(loaded_image.source.as_array()))
+        write_pyramid(cache_path(image_path), image_path, signature, loaded_image.source.mode,
+                      levels, loaded_image.tone_map)
+    finally:
+        loaded_image.source.close()
+    return "cached"
+
+
+class IngestService:
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.executor = None
+        self.pending = {}
+        self.results = {}
+    
+    def submit(self, image_paths, force=False):
+        if not self.pending:
+            self.results = {}
+        if self.executor is None:
+            context = multiprocessing.get_context("spawn")
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        
+        for image_path in image_paths:
+            if image_path not in self.pending:
+                self.pending[image_path] = self.executor.submit(ingest_image, image_path, force)
+    
+    def poll(self):
+        finished = []
+        for image_path, future in list(self.pending.items()):
+            if not future.done():
+                continue
+            del self.pending[image_path]
+            
+            try:
+                self.results[image_path] = future.result()
+            except Exception as e:
+                self.results[image_path] = f"failed: {e}"
+            finished.append(image_path)
+        return finished
+    
+    def progress(self):
+        return len(self.results), len(self.results) + len(self.pending)
+    
+    def failures(self):
+        return {path: result for path, result in self.results.items() if result.startswith("failed")}
+    
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+def ingest_folder(folder_path, workers=None, force=False):
+    image_paths = load_images_from_folder(folder_path)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [(path, executor.submit(ingest_image, path, force)) for path in image_paths]
+        for path, future in futures:
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                results[path] = f"failed: {e}"
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-convert a folder's images into the tiled pyramid cache "
+                                                 "that the labeling tool opens instead of the originals.")
+    parser.add_argument("folder", help="Folder of source images")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--force", action="store_true", help="Rebuild cache entries that are still up to date")
+    args = parser.parse_args()
+    
+    results = ingest_folder(args.folder, args.workers, args.force)
+    counts = {}
+    for result in results.values():
+        status = "failed" if result.startswith("failed") else result
+        counts[status] = counts.get(status, 0) + 1
+    
+    print(f"Cached {counts.get('cached', 0)} images, {counts.get('fresh', 0)} already up to date, "
+          f"{counts.get('unsupported', 0)} in unsupported modes.")
+    for path, result in results.items():
+        if result.startswith("failed"):
+            print(f"Failed: {os.path.basename(path)}: {result[len('failed: '):]}")
+
+
+if __name__ == "__main__":
+    main()
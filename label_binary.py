@@ -0,0 +1,313 @@
+import os
+import copy
+import json
+import mmap
+import zlib
+import struct
+import argparse
+
+import numpy as np
+
+from label_index import COLUMNS, label_row
+from label_store import StaleLabelIndex, LazyLabels, file_signature
+
+BINARY_EXTENSION = ".nolb"
+MAGIC = b"NOLB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHQQQQQQQ")
+HEADER_SIZE = 64
+
+FIELDS = (
+    ("rectangle", (("x1", "rect_x1"), ("y1", "rect_y1"), ("x2", "rect_x2"), ("y2", "rect_y2"))),
+    ("left_keypoint", (("x", "lk_x"), ("y", "lk_y"))),
+    ("right_keypoint", (("x", "rk_x"), ("y", "rk_y"))),
+    ("left_circle", (("center_x", "lc_x"), ("center_y", "lc_y"), ("radius", "lc_r"))),
+    ("right_circle", (("center_x", "rc_x"), ("center_y", "rc_y"), ("radius", "rc_r"))),
+    ("left_angle", None),
+    ("right_angle", None),
+    ("left_femur_angle", None),
+    ("right_femur_angle", None)
+)
+FIELD_PRESENT = {field: 1 << bit for bit, (field, _) in enumerate(FIELDS)}
+STORED_AS_JSON = 1 << 31
+VALUE_COLUMNS = tuple(column for field, members in FIELDS
+                      for column in ([field] if members is None else [column for _, column in members]))
+RECORD_DTYPE = np.dtype([("present", "<u4"), ("integers", "<u4")] +
+                        [(column, "<f8") for column in VALUE_COLUMNS])
+MAX_EXACT_INTEGER = 2 ** 53
+
+
+def field_slots():
+    slots = {}
+    position = 0
+    for field, members in FIELDS:
+        if members is None:
+            slots[field] = position
+            position += 1
+        else:
+            slots[field] = tuple((key, position + i) for i, (key, _) in enumerate(members))
+            position += len(members)
+    return slots
+
+
+FIELD_SLOTS = field_slots()
+
+
+def encode_entry(labels):
+    if type(labels) is not dict:
+        return None
+    
+    present = 0
+    integers = 0
+    values = [0.0] * len(VALUE_COLUMNS)
+    for field, item in labels.items():
+        slots = FIELD_SLOTS.get(field, False)
+        if slots is False:
+            return None
+        present |= FIELD_PRESENT[field]
+        
+        if type(slots) is int:
+            pairs = ((item, slots),)
+        elif type(item) is dict and len(item) == len(slots):
+            try:
+                pairs = [(item[key], slot) for key, slot in slots]
+            except KeyError:
+                return None
+        else:
+            return None
+        
+        for value, slot in pairs:
+            if type(value) is float:
+                values[slot] = value
+            elif type(value) is int and -MAX_EXACT_INTEGER <= value <= MAX_EXACT_INTEGER:
+                values[slot] = float(value)
+                integers |= 1 << slot
+            else:
+                return None
+    return (present, integers) + tuple(values)
+
+
+def decode_value(values, integers, slot):
+    if integers >> slot & 1:
+        return int(values[slot])
+    return values[slot]
+
+
+def decode_record(record):
+    present, integers = record[0], record[1]
+    values = record[2:]
+    labels = {}
+    for field, slots in FIELD_SLOTS.items():
+        if present & FIELD_PRESENT[field]:
+            if type(slots) is int:
+                labels[field] = decode_value(values, integers, slots)
+            else:
+                labels[field] = {key: decode_value(values, integers, slot) for key, slot in slots}
+    return labels
+
+
+def record_rows(records):
+    present = records["present"].astype(np.int64)
+    
+    def present_values(field, column):
+        return np.where(present & FIELD_PRESENT[field], records[column], np.nan)
+    
+    both_angles = FIELD_PRESENT["left_angle"] | FIELD_PRESENT["right_angle"]
+    mask = (present & 31) | np.where((present & both_angles) == both_angles, 32, 0)
+    columns = {
+        "mask": mask.astype(np.float64),
+        "left_angle": present_values("left_angle", "left_angle"),
+        "right_angle": present_values("right_angle", "right_angle"),
+        "left_x": present_values("left_circle", "lc_x"),
+        "left_y": present_values("left_circle", "lc_y"),
+        "left_radius": present_values("left_circle", "lc_r"),
+        "right_x": present_values("right_circle", "rc_x"),
+        "right_y": present_values("right_circle", "rc_y"),
+        "right_radius": present_values("right_circle", "rc_r")
+    }
+    return np.column_stack([columns[column] for column in COLUMNS]).reshape(-1, len(COLUMNS))
+
+
+class BinaryLabelFile:
+    def __init__(self, path):
+        self.path = path
+        self.signature = file_signature(path)
+        self.file = None
+        self.buffer = None
+        self.records = None
+        self.cached_crcs = None
+        self.open()
+        
+        self.names = self.read_names()
+        self.slots = {name: slot for slot, name in enumerate(self.names)}
+        self.extras = {}
+        if self.extras_size:
+            raw = self.buffer[self.extras_offset:self.extras_offset + self.extras_size]
+            self.extras = {int(slot): entry for slot, entry in json.loads(raw).items()}
+        
+        self.rows = record_rows(self.records)
+        for slot, entry in self.extras.items():
+            self.rows[slot] = label_row(entry)
+    
+    def open(self):
+        if self.buffer is not None:
+            return
+        if file_signature(self.path) != self.signature:
+            raise StaleLabelIndex(f"{self.path} changed since it was opened")
+        
+        self.file = open(self.path, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, record_size, count, self.records_offset, self.names_offset, self.blob_offset,
+         self.blob_size, self.extras_offset, self.extras_size) = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD_DTYPE.itemsize:
+            self.close()
+            raise ValueError(f"{self.path} is not a version {FORMAT_VERSION} binary label file")
+        self.records = np.frombuffer(self.buffer, dtype=RECORD_DTYPE, count=count, offset=self.records_offset)
+    
+    def read_names(self):
+        count = len(self.records)
+        offsets = np.frombuffer(self.buffer, dtype="<u8", count=count + 1, offset=self.names_offset).tolist()
+        blob = self.buffer[self.blob_offset:self.blob_offset + self.blob_size]
+        return [blob[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+    
+    def __len__(self):
+        return len(self.names)
+    
+    @property
+    def crcs(self):
+        if self.cached_crcs is None:
+            self.open()
+            size = RECORD_DTYPE.itemsize
+            view = memoryview(self.buffer)[self.records_offset:self.records_offset + size * len(self.names)]
+            crcs = [zlib.crc32(view[i:i + size]) for i in range(0, len(view), size)]
+            view.release()
+            for slot, entry in self.extras.items():
+                crcs[slot] = zlib.crc32(json.dumps(entry, sort_keys=True).encode("utf-8"), crcs[slot])
+            self.cached_crcs = np.array(crcs, dtype=np.uint32)
+        return self.cached_crcs
+    
+    def read_entry(self, slot):
+        if slot in self.extras:
+            return copy.deepcopy(self.extras[slot])
+        self.open()
+        return decode_record(self.records[slot].tolist())
+    
+    def close(self):
+        # Views handed out for analytics keep the map alive; it is released when they are collected
+        self.records = None
+        if self.buffer is not None:
+            try:
+                self.buffer.close()
+            except BufferError:
+                pass
+            self.buffer = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def open_binary_labels(path):
+    return LazyLabels(BinaryLabelFile(path))
+
+
+def write_binary_labels(path, labels):
+    names = list(labels)
+    records = np.zeros(len(names), dtype=RECORD_DTYPE)
+    extras = {}
+    
+    source = labels.source if isinstance(labels, LazyLabels) else None
+    copied = np.full(len(names), -1, dtype=np.int64)
+    if isinstance(source, BinaryLabelFile):
+        source.open()
+        for i, name in enumerate(names):
+            slot = labels.stored_slot(name)
+            if slot is not None:
+                copied[i] = slot
+                if slot in source.extras:
+                    extras[i] = source.extras[slot]
+        reuse = np.flatnonzero(copied >= 0)
+        records[reuse] = source.records[copied[reuse]]
+    
+    encoded = []
+    for i in np.flatnonzero(copied < 0).tolist():
+        entry = labels.get(names[i])
+        row = encode_entry(entry)
+        if row is None:
+            extras[i] = entry
+            row = (STORED_AS_JSON, 0) + (0.0,) * len(VALUE_COLUMNS)
+        encoded.append((i, row))
+    if encoded:
+        positions, rows = zip(*encoded)
+        records[list(positions)] = np.array(list(rows), dtype=RECORD_DTYPE)
+    
+    encoded_names = [name.encode("utf-8") for name in names]
+    offsets = np.zeros(len(names) + 1, dtype="<u8")
+    np.cumsum([len(name) for name in encoded_names], out=offsets[1:])
+    blob = b"".join(encoded_names)
+    extras_raw = json.dumps({str(slot): entry for slot, entry in extras.items()}).encode("utf-8") if extras else b""
+    
+    records_offset = HEADER_SIZE
+    names_offset = records_offset + records.nbytes
+    blob_offset = names_offset + offsets.nbytes
+    extras_offset = blob_offset + len(blob)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, RECORD_DTYPE.itemsize, len(names), records_offset,
+                         names_offset, blob_offset, len(blob), extras_offset, len(extras_raw))
+    
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+        f.write(records.tobytes())
+        f.write(offsets.tobytes())
+        f.write(blob)
+        f.write(extras_raw)
+    
+    if source is not None:
+        source.close()
+    os.replace(temp_path, path)
+    if isinstance(labels, LazyLabels):
+        labels.rebase(BinaryLabelFile(path))
+    return len(names)
+
+
+def read_label_file(path):
+    if path.endswith(BINARY_EXTENSION):
+        return open_binary_labels(path)
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_label_file(path, labels):
+    if path.endswith(BINARY_EXTENSION):
+        write_binary_labels(path, labels)
+        return
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(dict(labels.items()), f, indent=4)
+    os.replace(temp_path, path)
+
+
+def convert(source_path, target_path):
+    labels = read_label_file(source_path)
+    expected = dict(labels.items())
+    write_label_file(target_path, expected)
+    
+    converted = dict(read_label_file(target_path).items())
+    if json.dumps(converted, sort_keys=True) != json.dumps(expected, sort_keys=True):
+        raise ValueError(f"Round trip through {target_path} changed the labels")
+    return len(expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert labels between norberg_olsen_labels.json and the "
+                                                 f"compact binary {BINARY_EXTENSION} format.")
+    parser.add_argument("source", help=f"Label file to read (.json or {BINARY_EXTENSION})")
+    parser.add_argument("target", help="Label file to write; the format follows the extension")
+    args = parser.parse_args()
+    
+    count = convert(args.source, args.target)
+    print(f"Converted labels for {count} images: {args.source} -> {args.target} "
+          f"({os.path.getsize(args.source)} -> {os.path.getsize(args.target)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import os
+from bisect import bisect_left, insort
+
+import numpy as np
+
+FIELD_BITS = {
+    "rectangle": 1,
+    "left_keypoint": 2,
+    "right_keypoint": 4,
+    "left_circle": 8,
+    "right_circle": 16,
+    "calculated": 32
+}
+ALL_FIELDS = 63
+ANGLE_KEYS = ("left_angle", "right_angle", "min_angle")
+COLUMNS = ("mask", "left_angle", "right_angle",
+           "left_x", "left_y", "left_radius", "right_x", "right_y", "right_radius")
+
+
+def label_mask(labels):
+    mask = 0
+    for field, bit in FIELD_BITS.items():
+        if field in labels:
+            mask |= bit
+    if "left_angle" in labels and "right_angle" in labels:
+        mask |= FIELD_BITS["calculated"]
+    return mask
+
+
+def label_row(labels):
+    nan = float("nan")
+    left = labels.get("left_circle") or {}
+    right = labels.get("right_circle") or {}
+    left_angle = labels.get("left_angle")
+    right_angle = labels.get("right_angle")
+    return (label_mask(labels),
+            nan if left_angle is None else left_angle,
+            nan if right_angle is None else right_angle,
+            left.get("center_x", nan), left.get("center_y", nan), left.get("radius", nan),
+            right.get("center_x", nan), right.get("center_y", nan), right.get("radius", nan))
+
+
+def label_columns(labels):
+    if hasattr(labels, "label_columns"):
+        return labels.label_columns()
+    
+    names = list(labels)
+    rows = np.array([label_row(labels[name]) for name in names], dtype=np.float64).reshape(-1, len(COLUMNS))
+    return names, {column: rows[:, i] for i, column in enumerate(COLUMNS)}
+
+
+def label_angles(labels):
+    angles = {}
+    for key in ("left_angle", "right_angle"):
+        if labels.get(key) is not None:
+            angles[key] = float(labels[key])
+    if len(angles) == 2:
+        angles["min_angle"] = min(angles["left_angle"], angles["right_angle"])
+    return angles
+
+
+class MissingQuery:
+    def __init__(self, field):
+        self.field = field
+        self.bit = FIELD_BITS[field]
+    
+    def key(self):
+        return ("missing", self.field)
+    
+    def describe(self):
+        if self.field == "calculated":
+            return "not calculated"
+        return f"missing {self.field.replace('_', ' ')}"
+    
+    def evaluate(self, index):
+        return np.flatnonzero((index.masks & self.bit) == 0)
+    
+    def contains(self, index, position):
+        return not index.masks[position] & self.bit
+
+
+class IncompleteQuery:
+    def key(self):
+        return ("incomplete",)
+    
+    def describe(self):
+        return "incomplete"
+    
+    def evaluate(self, index):
+        return np.flatnonzero(index.masks != ALL_FIELDS)
+    
+    def contains(self, index, position):
+        return index.masks[position] != ALL_FIELDS
+
+
+class AngleBelowQuery:
+    def __init__(self, threshold, angle_key="min_angle"):
+        self.threshold = float(threshold)
+        self.angle_key = angle_key
+    
+    def key(self):
+        return ("angle_below", self.angle_key, self.threshold)
+    
+    def describe(self):
+        side = {"left_angle": "left ", "right_angle": "right "}.get(self.angle_key, "")
+        return f"{side}Norberg angle < {self.threshold:g}°"
+    
+    def evaluate(self, index):
+        entries = index.angles[self.angle_key]
+        end = bisect_left(entries, (self.threshold, -1))
+        return np.sort(np.fromiter((position for _, position in entries[:end]), dtype=np.int64, count=end))
+    
+    def contains(self, index, position):
+        value = index.image_angles.get(position, {}).get(self.angle_key)
+        return value is not None and value < self.threshold
+
+
+class LabelIndex:
+    def __init__(self):
+        self.clear()
+    
+    def clear(self):
+        self.positions = {}
+        self.masks = np.zeros(0, dtype=np.uint8)
+        self.angles = {key: [] for key in ANGLE_KEYS}
+        self.image_angles = {}
+        self.results = {}
+    
+    def rebuild(self, image_files, labels):
+        names = [os.path.basename(path) for path in image_files]
+        positions = {name: position for position, name in enumerate(names)}
+        
+        label_names, columns = label_columns(labels)
+        found = np.array([positions.get(name, -1) for name in label_names], dtype=np.int64)
+        valid = found >= 0
+        
+        masks = np.zeros(len(names), dtype=np.uint8)
+        left = np.full(len(names), np.nan)
+        right = np.full(len(names), np.nan)
+        masks[found[valid]] = columns["mask"][valid]
+        left[found[valid]] = columns["left_angle"][valid]
+        right[found[valid]] = columns["right_angle"][valid]
+        
+        self.load_arrays(names, masks, left, right)
+    
+    def load_arrays(self, names, masks, left, right):
+        self.clear()
+        self.positions = {name: position for position, name in enumerate(names)}
+        self.masks = np.asarray(masks, dtype=np.uint8).copy()
+        left = np.asarray(left, dtype=np.float64)
+        right = np.asarray(right, dtype=np.float64)
+        
+        both = ~np.isnan(left) & ~np.isnan(right)
+        columns = {
+            "left_angle": left,
+            "right_angle": right,
+            "min_angle": np.where(both, np.fmin(left, right), np.nan)
+        }
+        for key, values in columns.items():
+            valid = np.flatnonzero(~np.isnan(values))
+            order = valid[np.argsort(values[valid], kind="stable")]
+            sorted_values = values[order].tolist()
+            sorted_positions = order.tolist()
+            self.angles[key] = list(zip(sorted_values, sorted_positions))
+            for value, position in zip(sorted_values, sorted_positions):
+                self.image_angles.setdefault(position, {})[key] = value
+    
+    def angle_columns(self):
+        left = np.full(len(self.masks), np.nan)
+        right = np.full(len(self.masks), np.nan)
+        for value, position in self.angles["left_angle"]:
+            left[position] = value
+        for value, position in self.angles["right_angle"]:
+            right[position] = value
+        return left, right
+    
+    def update(self, file_name, labels):
+        position = self.positions.get(file_name)
+        if position is None:
+            return
+        
+        old_angles = self.image_angles.pop(position, {})
+        for key, value in old_angles.items():
+            entries = self.angles[key]
+            i = bisect_left(entries, (value, position))
+            if i < len(entries) and entries[i] == (value, position):
+                del entries[i]
+        
+        new_angles = label_angles(labels or {})
+        for key, value in new_angles.items():
+            insort(self.angles[key], (value, position))
+        if new_angles:
+            self.image_angles[position] = new_angles
+        self.masks[position] = label_mask(labels or {})
+        
+        for key, (query, matches) in list(self.results.items()):
+            self.results[key] = (query, self.patch(query, matches, position))
+    
+    def patch(self, query, matches, position):
+        i = int(np.searchsorted(matches, position))
+        present = i < len(matches) and matches[i] == position
+        wanted = bool(query.contains(self, position))
+        if wanted and not present:
+            return np.insert(matches, i, position)
+        if present and not wanted:
+            return np.delete(matches, i)
+        return matches
+    
+    def matches(self, query):
+        cached = self.results.get(query.key())
+        if cached is None:
+            cached = (query, query.evaluate(self))
+            self.results[query.key()] = cached
+        return cached[1]
+    
+    def count(self, query):
+        return len(self.matches(query))
+    
+    def next_match(self, query, position, step=1):
+        matches = self.matches(query)
+        if step > 0:
+            i = int(np.searchsorted(matches, position, side="right"))
+            return int(matches[i]) if i < len(matches) else None
+        i = int(np.searchsorted(matches, position, side="left")) - 1
+        return int(matches[i]) if i >= 0 else None
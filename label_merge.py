@@ -0,0 +1,261 @@
+import json
+import argparse
+from itertools import combinations
+
+import numpy as np
+
+from calculations import calculate_angle, calculate_joint_angle
+from file_manager import labels_path, list_shards, iter_shard, read_labels
+from label_binary import write_label_file
+
+KEYPOINT_TOLERANCE = 15.0
+IOU_THRESHOLD = 0.75
+GEOMETRY_FIELDS = ("rectangle", "left_keypoint", "right_keypoint", "left_circle", "right_circle")
+
+
+def collect_entries(folder_path):
+    entries = {}
+    times = {}
+    for annotator, path in list_shards(folder_path).items():
+        for entry in iter_shard(path):
+            image = entry["image"]
+            per_image = entries.setdefault(image, {})
+            # Clears keep their time so a newer clear wins the merge over older labels
+            times[(image, annotator)] = entry.get("time", 0)
+            if entry.get("labels"):
+                per_image[annotator] = entry["labels"]
+            else:
+                per_image.pop(annotator, None)
+    return {image: annotations for image, annotations in entries.items() if annotations}, times
+
+
+def geometry_arrays(annotations):
+    columns = {name: np.full(len(annotations), np.nan) for name in (
+        "rect_x1", "rect_y1", "rect_x2", "rect_y2",
+        "lk_x", "lk_y", "rk_x", "rk_y",
+        "lc_x", "lc_y", "lc_r", "rc_x", "rc_y", "rc_r")}
+    fields = {
+        "rectangle": (("rect_x1", "x1"), ("rect_y1", "y1"), ("rect_x2", "x2"), ("rect_y2", "y2")),
+        "left_keypoint": (("lk_x", "x"), ("lk_y", "y")),
+        "right_keypoint": (("rk_x", "x"), ("rk_y", "y")),
+        "left_circle": (("lc_x", "center_x"), ("lc_y", "center_y"), ("lc_r", "radius")),
+        "right_circle": (("rc_x", "center_x"), ("rc_y", "center_y"), ("rc_r", "radius"))
+    }
+    for i, labels in enumerate(annotations):
+        for field, mapping in fields.items():
+            item = labels.get(field)
+            if item:
+                for column, key in mapping:
+                    columns[column][i] = item[key]
+    return columns
+
+
+def norberg_angles(circle_x, circle_y, point_x, point_y):
+    dx = point_x - circle_x
+    dy = point_y - circle_y
+    length = np.hypot(dx, dy)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        angle = np.degrees(np.arccos(np.clip(-dy / length, -1.0, 1.0)))
+    angle = np.where(point_x < circle_x, 180 - angle, angle)
+    return np.where(length == 0, 0.0, angle)
+
+
+def circle_iou(x1, y1, r1, x2, y2, r2):
+    d = np.hypot(x2 - x1, y2 - y1)
+    area1 = np.pi * r1 * r1
+    area2 = np.pi * r2 * r2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a1 = r1 * r1 * np.arccos(np.clip((d * d + r1 * r1 - r2 * r2) / (2 * d * r1), -1, 1))
+        a2 = r2 * r2 * np.arccos(np.clip((d * d + r2 * r2 - r1 * r1) / (2 * d * r2), -1, 1))
+        a3 = 0.5 * np.sqrt(np.clip((-d + r1 + r2) * (d + r1 - r2) * (d - r1 + r2) * (d + r1 + r2), 0, None))
+    lens = a1 + a2 - a3
+    intersection = np.where(d >= r1 + r2, 0.0,
+                            np.where(d <= np.abs(r1 - r2), np.minimum(area1, area2), lens))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return intersection / (area1 + area2 - intersection)
+
+
+def rectangle_iou(a, b):
+    ax1, ax2 = np.minimum(a["rect_x1"], a["rect_x2"]), np.maximum(a["rect_x1"], a["rect_x2"])
+    ay1, ay2 = np.minimum(a["rect_y1"], a["rect_y2"]), np.maximum(a["rect_y1"], a["rect_y2"])
+    bx1, bx2 = np.minimum(b["rect_x1"], b["rect_x2"]), np.maximum(b["rect_x1"], b["rect_x2"])
+    by1, by2 = np.minimum(b["rect_y1"], b["rect_y2"]), np.maximum(b["rect_y1"], b["rect_y2"])
+    width = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    height = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    intersection = width * height
+    union = (ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - intersection
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return intersection / union
+
+
+def compare_pair(a, b):
+    metrics = {
+        "left_angle_delta": np.abs(norberg_angles(a["lc_x"], a["lc_y"], a["lk_x"], a["lk_y"]) -
+                                   norberg_angles(b["lc_x"], b["lc_y"], b["lk_x"], b["lk_y"])),
+        "right_angle_delta": np.abs(norberg_angles(a["rc_x"], a["rc_y"], a["rk_x"], a["rk_y"]) -
+                                    norberg_angles(b["rc_x"], b["rc_y"], b["rk_x"], b["rk_y"])),
+        "left_keypoint_distance": np.hypot(a["lk_x"] - b["lk_x"], a["lk_y"] - b["lk_y"]),
+        "right_keypoint_distance": np.hypot(a["rk_x"] - b["rk_x"], a["rk_y"] - b["rk_y"]),
+        "left_circle_iou": circle_iou(a["lc_x"], a["lc_y"], a["lc_r"], b["lc_x"], b["lc_y"], b["lc_r"]),
+        "right_circle_iou": circle_iou(a["rc_x"], a["rc_y"], a["rc_r"], b["rc_x"], b["rc_y"], b["rc_r"]),
+        "rectangle_iou": rectangle_iou(a, b)
+    }
+    return metrics
+
+
+def summarize(values):
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return None
+    return {
+        "count": int(len(values)),
+        "mean": float(np.mean(values)),
+        "median": float(np.median(values)),
+        "p95": float(np.percentile(values, 95))
+    }
+
+
+def pair_conflicts(images, metrics, missing, keypoint_tolerance, iou_threshold):
+    reasons = {}
+    with np.errstate(invalid="ignore"):
+        checks = [
+            (metrics["left_keypoint_distance"] > keypoint_tolerance, "left acetabulum point"),
+            (metrics["right_keypoint_distance"] > keypoint_tolerance, "right acetabulum point"),
+            (metrics["left_circle_iou"] < iou_threshold, "left femur circle"),
+            (metrics["right_circle_iou"] < iou_threshold, "right femur circle"),
+            (metrics["rectangle_iou"] < iou_threshold, "pelvis rectangle")
+        ]
+    for mask, reason in checks:
+        for i in np.flatnonzero(mask):
+            reasons.setdefault(images[i], []).append(reason)
+    for i, fields in missing.items():
+        reasons.setdefault(images[i], []).append("only one annotator labelled " + ", ".join(fields))
+    return reasons
+
+
+def with_angles(labels):
+    if not all(field in labels for field in GEOMETRY_FIELDS[1:]):
+        return labels
+    
+    labels = dict(labels)
+    left_keypoint, right_keypoint = labels["left_keypoint"], labels["right_keypoint"]
+    left_femur, right_femur = labels["left_circle"], labels["right_circle"]
+    labels["left_angle"] = calculate_angle(left_femur["center_x"], left_femur["center_y"],
+                                           left_keypoint["x"], left_keypoint["y"])
+    labels["right_angle"] = calculate_angle(right_femur["center_x"], right_femur["center_y"],
+                                            right_keypoint["x"], right_keypoint["y"])
+    labels["left_femur_angle"] = calculate_joint_angle(
+        left_keypoint["x"], left_keypoint["y"], left_femur["center_x"], left_femur["center_y"],
+        right_femur["center_x"], right_femur["center_y"])
+    labels["right_femur_angle"] = calculate_joint_angle(
+        right_keypoint["x"], right_keypoint["y"], right_femur["center_x"], right_femur["center_y"],
+        left_femur["center_x"], left_femur["center_y"])
+    return labels
+
+
+def merge_folder(folder_path, keypoint_tolerance=KEYPOINT_TOLERANCE, iou_threshold=IOU_THRESHOLD):
+    entries, times = collect_entries(folder_path)
+    
+    merged = {}
+    try:
+        merged.update(read_labels(folder_path))
+    except (OSError, ValueError):
+        pass
+    newest = {}
+    for (image, annotator), time in times.items():
+        if image not in newest or time > newest[image][0]:
+            newest[image] = (time, annotator)
+    for image, (_, annotator) in newest.items():
+        annotations = entries.get(image, {})
+        if annotator in annotations:
+            merged[image] = with_angles(annotations[annotator])
+        else:
+            merged.pop(image, None)
+    
+    annotators = sorted({annotator for annotations in entries.values() for annotator in annotations})
+    agreement = {}
+    conflicts = {}
+    for first, second in combinations(annotators, 2):
+        images = [image for image, annotations in entries.items()
+                  if first in annotations and second in annotations]
+        if not images:
+            continue
+        
+        a = geometry_arrays([entries[image][first] for image in images])
+        b = geometry_arrays([entries[image][second] for image in images])
+        metrics = compare_pair(a, b)
+        
+        missing = {}
+        for i, image in enumerate(images):
+            fields = [field for field in GEOMETRY_FIELDS
+                      if (field in entries[image][first]) != (field in entries[image][second])]
+            if fields:
+                missing[i] = fields
+        
+        pair = f"{first}/{second}"
+        agreement[pair] = {"images": len(images)}
+        agreement[pair].update({name: summarize(values) for name, values in metrics.items()})
+        for image, reasons in pair_conflicts(images, metrics, missing, keypoint_tolerance, iou_threshold).items():
+            conflicts.setdefault(image, {})[pair] = reasons
+    
+    report = {
+        "annotators": annotators,
+        "images": len(entries),
+        "multiply_annotated": sum(1 for annotations in entries.values() if len(annotations) > 1),
+        "agreement": agreement,
+        "conflicts": conflicts
+    }
+    return merged, report
+
+
+def format_report(report, max_conflicts=20):
+    lines = [f"Annotators: {', '.join(report['annotators']) or '-'}",
+             f"Images annotated: {report['images']} ({report['multiply_annotated']} by more than one annotator)"]
+    for pair, stats in report["agreement"].items():
+        lines.append("")
+        lines.append(f"{pair} ({stats['images']} shared images):")
+        for name in ("left_angle_delta", "right_angle_delta", "left_circle_iou", "right_circle_iou",
+                     "rectangle_iou", "left_keypoint_distance", "right_keypoint_distance"):
+            summary = stats.get(name)
+            if summary:
+                lines.append(f"  {name.replace('_', ' ')}: mean {summary['mean']:.2f}  "
+                             f"median {summary['median']:.2f}  p95 {summary['p95']:.2f}")
+    
+    conflicts = report["conflicts"]
+    lines.append("")
+    lines.append(f"Conflicting images: {len(conflicts)}")
+    for image in sorted(conflicts)[:max_conflicts]:
+        for pair, reasons in conflicts[image].items():
+            lines.append(f"  {image} ({pair}): {', '.join(reasons)}")
+    if len(conflicts) > max_conflicts:
+        lines.append(f"  ... and {len(conflicts) - max_conflicts} more")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge per-annotator label shards and report agreement.")
+    parser.add_argument("folder", help="Folder containing norberg_olsen_labels.<annotator>.jsonl shards")
+    parser.add_argument("--out", help="Write merged labels here (default: print the report only)")
+    parser.add_argument("--write", action="store_true", help="Write merged labels to the folder's labels file")
+    parser.add_argument("--report", metavar="PATH", help="Also write the report as JSON")
+    parser.add_argument("--tolerance", type=float, default=KEYPOINT_TOLERANCE,
+                        help="Acetabulum point distance in pixels counted as a conflict")
+    parser.add_argument("--iou", type=float, default=IOU_THRESHOLD,
+                        help="Circle/rectangle IoU below which annotations conflict")
+    args = parser.parse_args()
+    
+    merged, report = merge_folder(args.folder, args.tolerance, args.iou)
+    print(format_report(report))
+    
+    out_path = labels_path(args.folder) if args.write else args.out
+    if out_path:
+        write_label_file(out_path, merged)
+        print(f"\nMerged labels for {len(merged)} images written to {out_path}")
+    
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
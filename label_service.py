@@ -0,0 +1,481 @@
+import os
+import sys
+import json
+import time
+import errno
+import socket
+import signal
+import hashlib
+import argparse
+import tempfile
+import selectors
+import subprocess
+
+from file_manager import labels_path, read_labels, iter_shard, append_shard
+from label_binary import BINARY_EXTENSION, write_label_file
+from label_store import LazyLabels, write_lazy_labels
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SERVICE_DIR = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(),
+                           f"norberg_olsen-{os.getuid() if hasattr(os, 'getuid') else 'user'}")
+JOURNAL_NAME = "norberg_olsen_labels.journal"
+LOCK_NAME = "norberg_olsen_labels.lock"
+COMMIT_INTERVAL = 0.05
+MAX_BATCH = 512
+CHECKPOINT_ENTRIES = 2000
+IDLE_TIMEOUT = 600.0
+START_TIMEOUT = 10.0
+
+
+class LabelServiceError(Exception):
+    pass
+
+
+def socket_path(folder_path):
+    key = hashlib.sha1(os.path.abspath(folder_path).encode("utf-8")).hexdigest()[:20]
+    return os.path.join(SERVICE_DIR, key + ".sock")
+
+
+def journal_path(folder_path):
+    return os.path.join(folder_path, JOURNAL_NAME)
+
+
+def lock_path(folder_path):
+    return os.path.join(folder_path, LOCK_NAME)
+
+
+def service_running(folder_path):
+    if fcntl is None:
+        return False
+    try:
+        lock_file = open(lock_path(folder_path), 'a')
+    except OSError:
+        return False
+    with lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return False
+
+
+def encode(message):
+    return (json.dumps(message) + "\n").encode("utf-8")
+
+
+def write_store(folder_path, labels):
+    path = labels_path(folder_path)
+    if isinstance(labels, LazyLabels) and not path.endswith(BINARY_EXTENSION):
+        write_lazy_labels(path, labels)
+    else:
+        write_label_file(path, labels)
+
+
+class ClientConnection:
+    def __init__(self, sock, client_id):
+        self.sock = sock
+        self.client_id = client_id
+        self.inbox = b""
+        self.outbox = b""
+        self.subscribed = False
+
+
+class LabelService:
+    def __init__(self, folder_path, path=None, commit_interval=COMMIT_INTERVAL,
+                 checkpoint_entries=CHECKPOINT_ENTRIES, idle_timeout=IDLE_TIMEOUT):
+        self.folder_path = os.path.abspath(folder_path)
+        self.path = path or socket_path(folder_path)
+        self.commit_interval = commit_interval
+        self.checkpoint_entries = checkpoint_entries
+        self.idle_timeout = idle_timeout
+        self.selector = selectors.DefaultSelector()
+        self.listener = None
+        self.lock_file = None
+        self.clients = {}
+        self.next_client = 1
+        self.pending = []
+        self.pending_since = None
+        self.journal_entries = 0
+        self.version = 0
+        self.commits = 0
+        self.running = False
+        self.labels = None
+    
+    def recover_journal(self):
+        # Writes acknowledged before a crash live only in the journal until the next checkpoint
+        path = journal_path(self.folder_path)
+        if not os.path.exists(path):
+            return
+        for entry in iter_shard(path):
+            if entry.get("labels"):
+                self.labels[entry["image"]] = entry["labels"]
+            else:
+                self.labels.pop(entry["image"], None)
+            self.journal_entries += 1
+        if self.journal_entries:
+            self.checkpoint()
+    
+    def acquire(self):
+        # The lock lives next to the journal so that services on other hosts sharing the folder see it too
+        if fcntl is not None:
+            self.lock_file = open(lock_path(self.folder_path), 'a')
+            try:
+                fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self.lock_file.close()
+                self.lock_file = None
+                raise LabelServiceError(f"A label service is already running for {self.folder_path}, "
+                                        f"possibly on another host")
+        
+        # Only the lock holder may read the store and replay or truncate the journal
+        self.labels = read_labels(self.folder_path)
+        self.recover_journal()
+        
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self.listener.listen(64)
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ)
+    
+    def serve_forever(self):
+        try:
+            self.acquire()
+            self.running = True
+            idle_since = time.monotonic()
+            while self.running:
+                timeout = 1.0
+                if self.pending:
+                    timeout = max(0.0, self.pending_since + self.commit_interval - time.monotonic())
+                
+                for key, events in self.selector.select(timeout):
+                    if key.fileobj is self.listener:
+                        self.accept()
+                        continue
+                    client = key.data
+                    if events & selectors.EVENT_READ:
+                        self.read(client)
+                    if events & selectors.EVENT_WRITE and client.sock.fileno() != -1:
+                        self.flush_outbox(client)
+                
+                if self.pending and (len(self.pending) >= MAX_BATCH or
+                                     time.monotonic() - self.pending_since >= self.commit_interval):
+                    self.commit()
+                
+                if self.clients:
+                    idle_since = time.monotonic()
+                elif self.idle_timeout and time.monotonic() - idle_since > self.idle_timeout:
+                    self.running = False
+        finally:
+            self.close()
+    
+    def accept(self):
+        try:
+            sock, _ = self.listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        client = ClientConnection(sock, self.next_client)
+        self.next_client += 1
+        self.clients[sock] = client
+        self.selector.register(sock, selectors.EVENT_READ, client)
+    
+    def disconnect(self, client):
+        if self.clients.pop(client.sock, None) is None:
+            return
+        self.selector.unregister(client.sock)
+        client.sock.close()
+        # Writes from a client that went away are still committed, just not acknowledged
+        self.pending = [(None if owner is client else owner, request_id, entries)
+                        for owner, request_id, entries in self.pending]
+    
+    def read(self, client):
+        try:
+            data = client.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.disconnect(client)
+            return
+        
+        client.inbox += data
+        while b"\n" in client.inbox:
+            line, client.inbox = client.inbox.split(b"\n", 1)
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+                self.handle(client, message)
+            except (ValueError, KeyError, TypeError) as e:
+                self.send(client, {"id": None, "ok": False, "error": f"Bad request: {e}"})
+    
+    def send(self, client, message):
+        if client.sock.fileno() == -1:
+            return
+        client.outbox += encode(message)
+        self.flush_outbox(client)
+    
+    def flush_outbox(self, client):
+        try:
+            sent = client.sock.send(client.outbox)
+            client.outbox = client.outbox[sent:]
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            self.disconnect(client)
+            return
+        self.selector.modify(client.sock, selectors.EVENT_READ | (selectors.EVENT_WRITE if client.outbox else 0),
+                             client)
+    
+    def handle(self, client, message):
+        op = message["op"]
+        request_id = message.get("id")
+        if op == "get":
+            names = message.get("names")
+            if names is None:
+                labels = dict(self.labels.items())
+            else:
+                labels = {name: self.labels.get(name) for name in names}
+            self.send(client, {"id": request_id, "ok": True, "labels": labels, "version": self.version})
+        elif op == "put":
+            entries = message["entries"]
+            # The write becomes visible, and is acknowledged, once the group commit has journalled it
+            if not self.pending:
+                self.pending_since = time.monotonic()
+            self.pending.append((client, request_id, entries))
+        elif op == "subscribe":
+            client.subscribed = True
+            self.send(client, {"id": request_id, "ok": True, "version": self.version})
+        elif op == "checkpoint":
+            self.commit()
+            self.checkpoint()
+            self.send(client, {"id": request_id, "ok": True, "version": self.version})
+        elif op == "status":
+            self.send(client, {"id": request_id, "ok": True, "version": self.version, "clients": len(self.clients),
+                               "labels": len(self.labels), "commits": self.commits,
+                               "journal_entries": self.journal_entries, "folder": self.folder_path})
+        elif op == "shutdown":
+            self.running = False
+            self.send(client, {"id": request_id, "ok": True})
+        else:
+            self.send(client, {"id": request_id, "ok": False, "error": f"Unknown operation: {op}"})
+    
+    def commit(self):
+        if not self.pending:
+            return
+        
+        batch = self.pending
+        self.pending = []
+        self.pending_since = None
+        merged = {}
+        writers = {}
+        for client, _, entries in batch:
+            for name, labels in entries.items():
+                merged[name] = labels or None
+                writers[name] = client
+        
+        try:
+            append_shard(journal_path(self.folder_path), merged)
+        except OSError as e:
+            for client, request_id, _ in batch:
+                if client is not None:
+                    self.send(client, {"id": request_id, "ok": False, "error": f"Could not write labels: {e}"})
+            return
+        
+        for name, labels in merged.items():
+            if labels:
+                self.labels[name] = labels
+            else:
+                self.labels.pop(name, None)
+        self.version += 1
+        self.commits += 1
+        self.journal_entries += len(merged)
+        for client, request_id, _ in batch:
+            if client is not None:
+                self.send(client, {"id": request_id, "ok": True, "version": self.version})
+        
+        for client in list(self.clients.values()):
+            if not client.subscribed:
+                continue
+            changes = {name: labels for name, labels in merged.items() if writers[name] is not client}
+            if changes:
+                self.send(client, {"event": "changed", "version": self.version, "entries": changes})
+        
+        if self.journal_entries >= self.checkpoint_entries:
+            self.checkpoint()
+    
+    def checkpoint(self):
+        write_store(self.folder_path, self.labels)
+        # The label file now holds every journalled write
+        with open(journal_path(self.folder_path), 'w'):
+            pass
+        self.journal_entries = 0
+    
+    def close(self):
+        self.commit()
+        if self.journal_entries:
+            self.checkpoint()
+        for client in list(self.clients.values()):
+            self.disconnect(client)
+        if self.listener is not None:
+            self.selector.unregister(self.listener)
+            self.listener.close()
+            self.listener = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+
+class LabelServiceClient:
+    def __init__(self, path, timeout=START_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.buffer = b""
+        self.events = []
+        self.next_id = 1
+    
+    def read_messages(self, block):
+        self.sock.settimeout(self.timeout if block else 0.0)
+        try:
+            data = self.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return []
+        except socket.timeout:
+            raise LabelServiceError("The label service did not answer in time")
+        if not data:
+            raise LabelServiceError("The label service closed the connection")
+        
+        self.buffer += data
+        messages = []
+        while b"\n" in self.buffer:
+            line, self.buffer = self.buffer.split(b"\n", 1)
+            messages.append(json.loads(line))
+        return messages
+    
+    def request(self, op, **arguments):
+        request_id = self.next_id
+        self.next_id += 1
+        self.sock.settimeout(self.timeout)
+        self.sock.sendall(encode(dict(arguments, op=op, id=request_id)))
+        
+        while True:
+            for message in self.read_messages(block=True):
+                if "event" in message:
+                    self.events.append(message)
+                elif message.get("id") == request_id:
+                    if not message.get("ok"):
+                        raise LabelServiceError(message.get("error", "Request failed"))
+                    return message
+    
+    def get(self, names=None):
+        return self.request("get", names=names)["labels"]
+    
+    def put(self, entries):
+        return self.request("put", entries=entries)["version"]
+    
+    def subscribe(self):
+        return self.request("subscribe")["version"]
+    
+    def status(self):
+        return self.request("status")
+    
+    def checkpoint(self):
+        return self.request("checkpoint")["version"]
+    
+    def shutdown(self):
+        return self.request("shutdown")
+    
+    def poll(self):
+        while True:
+            messages = self.read_messages(block=False)
+            if not messages:
+                break
+            self.events.extend(message for message in messages if "event" in message)
+        events = self.events
+        self.events = []
+        return events
+    
+    def close(self):
+        self.sock.close()
+
+
+def connect(folder_path, start=False, timeout=START_TIMEOUT):
+    if not hasattr(socket, "AF_UNIX"):
+        raise LabelServiceError("The label service needs Unix domain sockets, which this platform lacks")
+    
+    path = socket_path(folder_path)
+    try:
+        return LabelServiceClient(path)
+    except OSError as e:
+        if not start or e.errno not in (errno.ENOENT, errno.ECONNREFUSED):
+            raise LabelServiceError(f"Could not reach the label service: {e}")
+    
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), folder_path], start_new_session=True,
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return LabelServiceClient(path)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise LabelServiceError(f"The label service for {folder_path} did not start")
+            time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a folder's labels to several labeling tool instances and "
+                                                 "batch clients over a Unix domain socket, with group-committed "
+                                                 "writes and change notifications.")
+    parser.add_argument("folder", help="Folder whose label store the service owns")
+    parser.add_argument("--status", action="store_true", help="Print the running service's status and exit")
+    parser.add_argument("--stop", action="store_true", help="Checkpoint and stop the running service")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                        help="Exit after this many seconds without clients (0 keeps running)")
+    parser.add_argument("--commit-interval", type=float, default=COMMIT_INTERVAL,
+                        help="Seconds to gather writes into one journal commit")
+    args = parser.parse_args()
+    
+    if args.status or args.stop:
+        client = connect(args.folder)
+        if args.stop:
+            client.shutdown()
+            print(f"Stopped the label service for {args.folder}")
+        else:
+            status = client.status()
+            print(f"{status['folder']}: {status['labels']} labelled images, {status['clients']} clients, "
+                  f"version {status['version']}, {status['commits']} commits, "
+                  f"{status['journal_entries']} journal entries since the last checkpoint")
+        client.close()
+        return
+    
+    service = LabelService(args.folder, commit_interval=args.commit_interval, idle_timeout=args.idle_timeout)
+    signal.signal(signal.SIGTERM, lambda signum, frame: setattr(service, "running", False))
+    try:
+        service.serve_forever()
+    except LabelServiceError as e:
+        print(e)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
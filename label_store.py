@@ -0,0 +1,368 @@
+import os
+import re
+import copy
+import json
+import mmap
+import zlib
+import hashlib
+
+import numpy as np
+
+from label_index import COLUMNS, label_row
+
+LAZY_THRESHOLD = 16 * 1024 * 1024
+INDEX_VERSION = 1
+INDEX_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".norberg_olsen_cache", "label_offsets")
+
+ENTRY_PATTERN = re.compile(rb'^    "((?:[^"\\\r\n]|\\.)*)": ', re.M)
+INDENTED_START = re.compile(rb'\{\s*\n    "')
+WHITESPACE = re.compile(r'\s*')
+
+
+class StaleLabelIndex(ValueError):
+    pass
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class LabelFileIndex:
+    def __init__(self, path, signature, names, starts, ends, crcs, rows):
+        self.path = path
+        self.signature = tuple(signature)
+        self.names = names
+        self.starts = starts
+        self.ends = ends
+        self.crcs = crcs
+        self.rows = rows
+        self.slots = {name: slot for slot, name in enumerate(names)}
+        self.file = None
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def read_raw(self, slot):
+        if self.file is None:
+            self.file = open(self.path, 'rb')
+            if file_signature(self.path) != self.signature:
+                self.close()
+                raise StaleLabelIndex(f"{self.path} changed since it was indexed")
+        
+        start = int(self.starts[slot])
+        self.file.seek(start)
+        raw = self.file.read(int(self.ends[slot]) - start)
+        if zlib.crc32(raw) != int(self.crcs[slot]):
+            raise StaleLabelIndex(f"{self.path} changed since it was indexed")
+        return raw
+    
+    def read_entry(self, slot):
+        return json.loads(self.read_raw(slot))
+    
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def cache_path(path):
+    key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+    return os.path.join(INDEX_CACHE_DIR, key + ".npz")
+
+
+def load_cached_index(path, signature):
+    try:
+        with np.load(cache_path(path), allow_pickle=False) as data:
+            if int(data["version"]) != INDEX_VERSION or tuple(data["signature"].tolist()) != signature:
+                return None
+            return LabelFileIndex(path, signature, data["names"].tolist(), data["starts"],
+                                  data["ends"], data["crcs"], data["rows"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def save_cached_index(index):
+    target = cache_path(index.path)
+    try:
+        os.makedirs(INDEX_CACHE_DIR, exist_ok=True)
+        temp_path = target + ".tmp.npz"
+        np.savez(temp_path, version=INDEX_VERSION, signature=np.array(index.signature, dtype=np.int64),
+                 names=np.array(index.names, dtype=str), starts=index.starts, ends=index.ends,
+                 crcs=index.crcs, rows=index.rows)
+        os.replace(temp_path, target)
+    except OSError:
+        pass
+
+
+def scan_indented(buffer):
+    entries = []
+    close = buffer.rfind(b"}")
+    previous = None
+    for match in ENTRY_PATTERN.finditer(buffer):
+        if previous is not None:
+            entries.append((previous[0], previous[1], match.start()))
+        previous = (match.group(1), match.end())
+    if previous is not None:
+        entries.append((previous[0], previous[1], close))
+    
+    for key, start, limit in entries:
+        raw = buffer[start:limit].rstrip()
+        if raw.endswith(b","):
+            raw = raw[:-1].rstrip()
+        yield json.loads(b'"' + key + b'"'), start, start + len(raw), raw
+
+
+def scan_generic(buffer):
+    text = buffer[:].decode("utf-8")
+    ascii_only = len(text) == len(buffer)
+    decoder = json.JSONDecoder()
+    char_position, byte_position = 0, 0
+    
+    def byte_offset(index):
+        nonlocal char_position, byte_position
+        if ascii_only:
+            return index
+        byte_position += len(text[char_position:index].encode("utf-8"))
+        char_position = index
+        return byte_position
+    
+    index = WHITESPACE.match(text, 0).end()
+    if text[index:index + 1] != "{":
+        raise ValueError("Label file is not a JSON object")
+    index = WHITESPACE.match(text, index + 1).end()
+    
+    while text[index:index + 1] != "}":
+        key, index = decoder.raw_decode(text, index)
+        index = WHITESPACE.match(text, index).end()
+        if text[index:index + 1] != ":":
+            raise ValueError(f"Expected ':' after key {key!r}")
+        index = WHITESPACE.match(text, index + 1).end()
+        
+        _, end = decoder.raw_decode(text, index)
+        start_byte = byte_offset(index)
+        end_byte = byte_offset(end)
+        yield key, start_byte, end_byte, buffer[start_byte:end_byte]
+        
+        index = WHITESPACE.match(text, end).end()
+        if text[index:index + 1] == ",":
+            index = WHITESPACE.match(text, index + 1).end()
+
+
+def build_index(path):
+    signature = file_signature(path)
+    names, starts, ends, crcs, rows = [], [], [], [], []
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            scan = scan_indented if INDENTED_START.match(buffer, 0, 64) else scan_generic
+            for name, start, end, raw in scan(buffer):
+                names.append(name)
+                starts.append(start)
+                ends.append(end)
+                crcs.append(zlib.crc32(raw))
+                rows.append(label_row(json.loads(raw) or {}))
+    
+    return LabelFileIndex(path, signature, names, np.array(starts, dtype=np.int64),
+                          np.array(ends, dtype=np.int64), np.array(crcs, dtype=np.uint32),
+                          np.array(rows, dtype=np.float64).reshape(-1, len(COLUMNS)))
+
+
+def index_label_file(path):
+    index = load_cached_index(path, file_signature(path))
+    if index is None:
+        index = build_index(path)
+        save_cached_index(index)
+    return index
+
+
+class LazyLabels(dict):
+    def __init__(self, source):
+        super().__init__()
+        self.source = source
+        self.removed = set()
+    
+    def __repr__(self):
+        return f"<LazyLabels {len(self)} images from {self.source.path}>"
+    
+    def slot(self, name):
+        if name in self.removed:
+            return None
+        return self.source.slots.get(name)
+    
+    def __getitem__(self, name):
+        if dict.__contains__(self, name):
+            return dict.__getitem__(self, name)
+        slot = self.slot(name)
+        if slot is None:
+            raise KeyError(name)
+        entry = self.source.read_entry(slot)
+        dict.__setitem__(self, name, entry)
+        return entry
+    
+    def stored_slot(self, name):
+        if dict.__contains__(self, name):
+            return None
+        return self.slot(name)
+    
+    def peek(self, name):
+        if dict.__contains__(self, name):
+            return dict.__getitem__(self, name)
+        slot = self.slot(name)
+        if slot is None:
+            raise KeyError(name)
+        return self.source.read_entry(slot)
+    
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+    
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or self.slot(name) is not None
+    
+    def __setitem__(self, name, value):
+        dict.__setitem__(self, name, value)
+        self.removed.discard(name)
+    
+    def __delitem__(self, name):
+        found = False
+        if dict.__contains__(self, name):
+            dict.__delitem__(self, name)
+            found = True
+        if self.slot(name) is not None:
+            self.removed.add(name)
+            found = True
+        if not found:
+            raise KeyError(name)
+    
+    def pop(self, name, *default):
+        try:
+            value = self.peek(name)
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self[name]
+        return value
+    
+    def __iter__(self):
+        for name in self.source.names:
+            if name not in self.removed:
+                yield name
+        for name in dict.keys(self):
+            if name not in self.source.slots:
+                yield name
+    
+    def __len__(self):
+        extra = sum(1 for name in dict.keys(self) if name not in self.source.slots)
+        return len(self.source.names) - len(self.removed) + extra
+    
+    def keys(self):
+        return list(self)
+    
+    def items(self):
+        for name in self:
+            yield name, self.peek(name)
+    
+    def values(self):
+        for name in self:
+            yield self.peek(name)
+    
+    def update(self, other=(), **kwargs):
+        pairs = other.items() if hasattr(other, "items") else other
+        for name, value in pairs:
+            self[name] = value
+        for name, value in kwargs.items():
+            self[name] = value
+    
+    def copy(self):
+        duplicate = LazyLabels(self.source)
+        dict.update(duplicate, {name: dict.__getitem__(self, name) for name in dict.keys(self)})
+        duplicate.removed = set(self.removed)
+        return duplicate
+    
+    def rebase(self, source):
+        self.source = source
+        self.removed = {name for name in self.removed if name in source.slots}
+    
+    def label_columns(self):
+        keep = np.ones(len(self.source.names), dtype=bool)
+        overrides = list(dict.keys(self))
+        for name in list(self.removed) + overrides:
+            slot = self.source.slots.get(name)
+            if slot is not None:
+                keep[slot] = False
+        
+        kept = np.flatnonzero(keep)
+        names = [self.source.names[i] for i in kept.tolist()] + overrides
+        extra = np.array([label_row(dict.__getitem__(self, name)) for name in overrides],
+                         dtype=np.float64).reshape(-1, len(COLUMNS))
+        rows = np.vstack([self.source.rows[kept], extra])
+        return names, {column: rows[:, i] for i, column in enumerate(COLUMNS)}
+    
+    def changed_names(self, other):
+        changed = set()
+        old_source, new_source = self.source, other.source
+        for name, slot in new_source.slots.items():
+            old_slot = old_source.slots.get(name)
+            if old_slot is None or old_source.crcs[old_slot] != new_source.crcs[slot]:
+                changed.add(name)
+        changed.update(name for name in old_source.slots if name not in new_source.slots)
+        
+        touched = set(dict.keys(self)) | set(dict.keys(other)) | self.removed | other.removed
+        for name in touched - changed:
+            if self.get(name) != other.get(name):
+                changed.add(name)
+        return sorted(changed)
+
+
+def open_labels(path):
+    if os.path.getsize(path) < LAZY_THRESHOLD:
+        with open(path, 'r') as f:
+            return json.load(f)
+    return LazyLabels(index_label_file(path))
+
+
+def write_lazy_labels(path, labels):
+    source = labels.source
+    temp_path = path + ".tmp"
+    names, starts, ends, crcs, rows = [], [], [], [], []
+    with open(temp_path, 'wb') as f:
+        f.write(b"{")
+        for count, name in enumerate(labels):
+            if dict.__contains__(labels, name):
+                entry = dict.__getitem__(labels, name)
+                raw = json.dumps(entry, indent=4).replace("\n", "\n    ").encode("utf-8")
+                row = label_row(entry)
+            else:
+                slot = source.slots[name]
+                raw = source.read_raw(slot)
+                row = source.rows[slot]
+            
+            f.write((",\n    " if count else "\n    ").encode("utf-8"))
+            f.write((json.dumps(name) + ": ").encode("utf-8"))
+            starts.append(f.tell())
+            f.write(raw)
+            ends.append(f.tell())
+            names.append(name)
+            crcs.append(zlib.crc32(raw))
+            rows.append(row)
+        f.write(b"\n}" if names else b"}")
+    
+    os.replace(temp_path, path)
+    index = LabelFileIndex(path, file_signature(path), names, np.array(starts, dtype=np.int64),
+                           np.array(ends, dtype=np.int64), np.array(crcs, dtype=np.uint32),
+                           np.array(rows, dtype=np.float64).reshape(-1, len(COLUMNS)))
+    save_cached_index(index)
+    source.close()
+    labels.rebase(index)
+    return index
+
+
+def snapshot_labels(labels, deep_copies=()):
+    snapshot = labels.copy() if isinstance(labels, LazyLabels) else dict(labels)
+    for name in deep_copies:
+        if name in labels:
+            snapshot[name] = copy.deepcopy(labels[name])
+    return snapshot
@@ -0,0 +1,64 @@
+import os
+
+
+def path_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class LabelFileWatcher:
+    def __init__(self, paths=()):
+        self.watch(paths)
+    
+    def watch(self, paths):
+        self.paths = list(paths)
+        self.signatures = [path_signature(path) for path in self.paths]
+    
+    def changed(self):
+        return [path_signature(path) for path in self.paths] != self.signatures
+    
+    def acknowledge(self):
+        self.signatures = [path_signature(path) for path in self.paths]
+
+
+def diff_labels(old_labels, new_labels):
+    if hasattr(old_labels, "changed_names") and hasattr(new_labels, "source"):
+        return old_labels.changed_names(new_labels)
+    
+    changed = []
+    for name, entry in new_labels.items():
+        if old_labels.get(name) != entry:
+            changed.append(name)
+    for name in old_labels:
+        if name not in new_labels:
+            changed.append(name)
+    return changed
+
+
+class ReloadResult:
+    def __init__(self):
+        self.applied = []
+        self.conflicts = []
+    
+    def __bool__(self):
+        return bool(self.applied or self.conflicts)
+
+
+def apply_external_changes(labels, disk_labels, new_labels, dirty):
+    result = ReloadResult()
+    for name in diff_labels(disk_labels, new_labels):
+        incoming = new_labels.get(name)
+        if name in dirty:
+            if labels.get(name) != incoming:
+                result.conflicts.append(name)
+            continue
+        
+        if incoming:
+            labels[name] = incoming
+        else:
+            labels.pop(name, None)
+        result.applied.append(name)
+    return result
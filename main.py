@@ -1,23 +1,45 @@
 import os
+import copy
+import argparse
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk
+from tkinter import ttk, filedialog, messagebox, simpledialog
+from PIL import ImageTk
 import math
 
 from calculations import calculate_angle, calculate_joint_angle
-from file_manager import (load_labels, save_labels, export_to_csv, 
-                          load_images_from_folder, save_session_info, load_session_info)
+from file_manager import (load_labels, read_labels, save_labels, export_to_csv, labels_path, shard_path,
+                          list_shards, read_shard, load_images_from_folder, save_session_info, load_session_info)
 from drawing import DrawingManager, LabelRenderer, EditManager
+from canvas_backend import TkCanvas
+from session_trace import SessionRecorder
+from display_adjustments import WindowLevel
+from image_loader import load_image
+from circle_detection import CircleProposalService
+from edge_snap import GradientCache, compute_gradients, snap_circle, snap_keypoint
+from angle_stats import AngleStatistics, format_statistics
+from label_index import LabelIndex, MissingQuery, IncompleteQuery, AngleBelowQuery
+from project import Project, PROJECT_EXTENSION
+from label_merge import merge_folder, format_report
+from label_watcher import LabelFileWatcher, apply_external_changes
+from label_service import LabelServiceError, service_running, connect as connect_label_service
+from throughput_log import ThroughputLog, FLUSH_INTERVAL_MS, default_log_path
+from comparison import DecodeCache, ComparisonPane, ComparisonView
+from pipeline import (BackgroundWorker, ImagePrefetcher, next_step, can_write_in_background, write_snapshot,
+                      POLL_INTERVAL_MS)
+from label_store import snapshot_labels
+from ingest import IngestService
+from duplicate_index import DuplicateIndex, HashService
+from roi_cache import RoiCache, RoiImageSource, roi_box
+from memory_budget import (memory_budget, image_bytes, photo_bytes, MB, DEFAULT_LIMIT_MB, PRIORITY_RECENT,
+                           PRIORITY_PINNED)
 
 
 class NorbergOlsenLabelingApp:
-    def __init__(self, root):
+    def __init__(self, root, annotator=None, label_service=False):
         self.root = root
-        self.root.title("Norberg-Olsen Labeling Tool")
-        self.root.geometry("1280x800")
-        
-        self.style = ttk.Style()
-        self.style.theme_use('clam')
+        self.annotator = annotator or None
+        self.use_label_service = label_service
+        self.label_client = None
         
         self.bg_color = "#f5f5f7"
         self.accent_color = "#0078d7"
@@ -27,37 +49,36 @@ class NorbergOlsenLabelingApp:
         self.toolbar_bg = "#e8e8e8"
         self.status_bar_bg = "#e0e0e0"
         
-        self.style.configure('TButton', 
-                            font=('Segoe UI', 9), 
-                            background=self.bg_color, 
-                            foreground=self.text_color,
-                            padding=4)
-        
-        self.style.configure('TLabel', 
-                            font=('Segoe UI', 9), 
-                            background=self.bg_color, 
-                            foreground=self.text_color)
-        
-        self.style.configure('TFrame', background=self.bg_color)
-        self.style.configure('Canvas.TFrame', background=self.canvas_bg)
-        self.style.configure('Toolbar.TFrame', background=self.toolbar_bg)
-        self.style.configure('StatusBar.TFrame', background=self.status_bar_bg)
-        
-        self.style.configure('Tool.TButton', 
-                            padding=6,
-                            font=('Segoe UI', 9, 'bold'))
-        
-        self.style.map('TButton',
-                       foreground=[('active', '#ffffff')],
-                       background=[('active', self.accent_color)])
+        self.configure_root()
+        self.create_style()
         
         self.current_folder = None
         self.image_files = []
         self.current_image_index = -1
         self.current_image = None
         self.pil_image = None
+        self.loaded_image = None
+        self.decode_cache = DecodeCache()
+        self.comparison = None
+        self.comparison_window = None
+        self.display_base = None
         self.tk_image = None
+        self.view_box = None
+        self.view_key = None
+        self.previous_view = None
+        self.roi_cache = RoiCache()
+        self.overview_state = None
+        self.render_pending = False
         self.labels = {}
+        self.angle_stats = AngleStatistics()
+        self.label_index = LabelIndex()
+        self.image_filter = None
+        self.dirty_labels = set()
+        self.disk_labels = {}
+        self.label_conflicts = {}
+        self.label_watcher = LabelFileWatcher()
+        self.polling_label_files = False
+        self.project = None
         self.current_labels = {}
         self.drawing_mode = None
         self.tooltips = {}
@@ -78,36 +99,59 @@ class NorbergOlsenLabelingApp:
         self.show_labels = True
         self.show_label_text = True
         
-        self.last_folder_path = None
+        self.window_level = WindowLevel()
+        self.wl_last_x = 0
+        self.wl_last_y = 0
+        self.wl_update_pending = False
+        
+        self.circle_proposals = CircleProposalService()
+        self.circle_suggestions = {}
+        self.suggest_circles = tk.BooleanVar(self.root, value=True)
+        self.polling_proposals = False
+        
+        self.gradient_cache = GradientCache()
+        self.pending_gradients = set()
+        self.ingest_service = IngestService()
+        self.polling_ingest = False
+        self.duplicate_index = None
+        self.hash_service = HashService()
+        self.polling_hashes = False
+        self.duplicate_mode = tk.StringVar(self.root, value="show")
+        self.snap_to_edges = tk.BooleanVar(self.root, value=False)
+        self.pipeline_mode = tk.BooleanVar(self.root, value=False)
+        self.background = BackgroundWorker("pipeline")
+        self.prefetcher = ImagePrefetcher(self.background)
+        self.polling_background = False
+        self.filter_name = tk.StringVar(self.root, value="all")
+        self.active_filter_name = "all"
         
-        self.context_menu = tk.Menu(root, tearoff=0, bg=self.bg_color, fg=self.text_color,
-                                   activebackground=self.accent_color, activeforeground='white',
-                                   font=('Segoe UI', 9))
-        self.context_menu.add_command(label="Move", command=self.start_move_mode)
-        self.context_menu.add_command(label="Edit", command=self.start_edit_mode)
-        self.context_menu.add_separator()
-        self.context_menu.add_command(label="Delete", command=self.delete_selected)
+        self.last_folder_path = None
+        self.session_recorder = None
+        self.trace_suppressed = 0
+        self.throughput_log = None
+        self.mouse_handlers = {}
         
+        self.create_context_menu()
         self.create_menu()
         self.create_toolbar()
         self.create_canvas()
         self.create_status_bar()
+        memory_budget.on_change = self.update_memory_status
         
         self.drawing_manager = None
         self.label_renderer = None
         self.edit_manager = None
         
-        self.root.bind("<Left>", lambda e: self.prev_image())
-        self.root.bind("<Right>", lambda e: self.next_image())
-        self.root.bind("<Escape>", lambda e: self.cancel_drawing())
-        self.root.bind("<Delete>", lambda e: self.delete_selected())
-        self.root.bind("<Control-s>", lambda e: self.save_labels_handler())
-        self.root.bind("<Control-o>", lambda e: self.open_folder())
-        self.root.bind("<Control-z>", lambda e: self.clear_labels())
+        self.bind_shortcuts()
         
-        self.canvas.bind("<MouseWheel>", self.zoom)
-        self.canvas.bind("<Button-4>", self.zoom)
-        self.canvas.bind("<Button-5>", self.zoom)
+        self.check_last_session()
+    
+    def configure_root(self):
+        title = "Norberg-Olsen Labeling Tool"
+        if self.annotator:
+            title += f" - {self.annotator}"
+        self.root.title(title)
+        self.root.geometry("1280x800")
         
         self.root.configure(bg=self.bg_color)
         
@@ -115,8 +159,55 @@ class NorbergOlsenLabelingApp:
         self.root.rowconfigure(0, weight=0)
         self.root.rowconfigure(1, weight=1)
         self.root.rowconfigure(2, weight=0)
+    
+    def create_style(self):
+        self.style = ttk.Style()
+        self.style.theme_use('clam')
         
-        self.check_last_session()
+        self.style.configure('TButton', 
+                            font=('Segoe UI', 9), 
+                            background=self.bg_color, 
+                            foreground=self.text_color,
+                            padding=4)
+        
+        self.style.configure('TLabel', 
+                            font=('Segoe UI', 9), 
+                            background=self.bg_color, 
+                            foreground=self.text_color)
+        
+        self.style.configure('TFrame', background=self.bg_color)
+        self.style.configure('Canvas.TFrame', background=self.canvas_bg)
+        self.style.configure('Toolbar.TFrame', background=self.toolbar_bg)
+        self.style.configure('StatusBar.TFrame', background=self.status_bar_bg)
+        
+        self.style.configure('Tool.TButton', 
+                            padding=6,
+                            font=('Segoe UI', 9, 'bold'))
+        
+        self.style.map('TButton',
+                       foreground=[('active', '#ffffff')],
+                       background=[('active', self.accent_color)])
+    
+    def create_context_menu(self):
+        self.context_menu = tk.Menu(self.root, tearoff=0, bg=self.bg_color, fg=self.text_color,
+                                   activebackground=self.accent_color, activeforeground='white',
+                                   font=('Segoe UI', 9))
+        self.context_menu.add_command(label="Move", command=self.start_move_mode)
+        self.context_menu.add_command(label="Edit", command=self.start_edit_mode)
+        self.context_menu.add_separator()
+        self.context_menu.add_command(label="Delete", command=self.delete_selected)
+    
+    def bind_shortcuts(self):
+        self.root.bind("<Left>", lambda e: self.prev_image())
+        self.root.bind("<Right>", lambda e: self.next_image())
+        self.root.bind("<Escape>", lambda e: self.cancel_drawing())
+        self.root.bind("<Delete>", lambda e: self.delete_selected())
+        self.root.bind("<Control-s>", lambda e: self.save_labels_handler())
+        self.root.bind("<Control-o>", lambda e: self.open_folder())
+        self.root.bind("<Control-z>", lambda e: self.clear_labels())
+        self.root.bind("<a>", lambda e: self.accept_circle_suggestions())
+        self.root.bind("<d>", lambda e: self.toggle_pelvis_detail())
+        self.root.bind("<p>", lambda e: self.toggle_pipeline_mode())
     
     def create_tooltip(self, widget, text):
         tooltip = tk.Label(self.root, text=text, bg="#ffffaa", fg="#000000",
@@ -137,13 +228,58 @@ class NorbergOlsenLabelingApp:
         
         self.tooltips[widget] = tooltip
     
+    def remember_session(self):
+        project_path = None
+        if self.project is not None:
+            project_path = self.project.path
+            self.project.last_folder = self.current_folder
+            self.project.last_image_index = self.current_image_index
+        save_session_info(self.current_folder, self.current_image_index, project_path)
+    
+    def start_recording(self, trace_path):
+        self.stop_recording()
+        self.session_recorder = SessionRecorder(trace_path)
+        self.session_recorder.write_header(self.current_folder, self.current_image_index, self.zoom_factor,
+                                           self.pipeline_mode.get())
+    
+    def stop_recording(self):
+        if self.session_recorder is not None:
+            self.session_recorder.close()
+            self.session_recorder = None
+    
+    def start_throughput_log(self, log_path):
+        self.stop_throughput_log()
+        self.throughput_log = ThroughputLog(log_path, self.annotator)
+        if self.image_files and self.current_image_index >= 0:
+            self.throughput_log.open_image(self.current_folder, self.current_file_name())
+        self.root.after(FLUSH_INTERVAL_MS, self.flush_throughput_log)
+    
+    def flush_throughput_log(self):
+        if self.throughput_log is not None:
+            self.throughput_log.flush()
+            self.root.after(FLUSH_INTERVAL_MS, self.flush_throughput_log)
+    
+    def stop_throughput_log(self):
+        if self.throughput_log is not None:
+            self.throughput_log.close()
+            self.throughput_log = None
+    
+    def step_event(self, event, step=""):
+        if self.throughput_log is not None:
+            self.throughput_log.record(event, step)
+    
     def check_last_session(self):
         config = load_session_info()
         
-        if config and "last_folder" in config and os.path.exists(config["last_folder"]):
+        if config and config.get("last_project") and os.path.exists(config["last_project"]):
+            self.open_project_file(config["last_project"])
+        elif config and "last_folder" in config and os.path.exists(config["last_folder"]):
             self.current_folder = config["last_folder"]
             self.image_files = load_images_from_folder(self.current_folder)
-            self.labels = load_labels(self.current_folder)
+            self.labels = self.read_folder_labels(self.current_folder)
+            self.reset_label_tracking()
+            self.angle_stats.rebuild(self.labels)
+            self.label_index.rebuild(self.image_files, self.labels)
             
             if self.image_files:
                 if "last_image_index" in config and 0 <= config["last_image_index"] < len(self.image_files):
@@ -166,7 +302,14 @@ class NorbergOlsenLabelingApp:
         file_menu.add_command(label="Open Folder (Ctrl+O)", command=self.open_folder)
         file_menu.add_command(label="Save Labels (Ctrl+S)", command=self.save_labels_handler)
         file_menu.add_separator()
+        file_menu.add_command(label="New Project...", command=self.new_project)
+        file_menu.add_command(label="Open Project...", command=self.open_project)
+        file_menu.add_command(label="Add Folders to Project...", command=self.add_folders_to_project)
+        file_menu.add_command(label="Refresh Project Index", command=self.refresh_project)
+        file_menu.add_command(label="Close Project", command=self.close_project)
+        file_menu.add_separator()
         file_menu.add_command(label="Export to CSV", command=self.export_to_csv_handler)
+        file_menu.add_command(label="Build Viewing Cache for Folder", command=self.build_viewing_cache)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.root.quit)
         
@@ -180,13 +323,57 @@ class NorbergOlsenLabelingApp:
         view_menu.add_command(label="Zoom In", command=self.zoom_in)
         view_menu.add_command(label="Zoom Out", command=self.zoom_out)
         view_menu.add_command(label="Reset Zoom", command=self.reset_zoom)
+        view_menu.add_command(label="Pelvis Detail / Overview (D)", command=self.toggle_pelvis_detail)
+        view_menu.add_separator()
+        view_menu.add_command(label="Increase Gamma", command=self.increase_gamma)
+        view_menu.add_command(label="Decrease Gamma", command=self.decrease_gamma)
+        view_menu.add_command(label="Reset Window/Level", command=self.reset_window_level)
+        view_menu.add_separator()
+        view_menu.add_command(label="Compare Images...", command=self.compare_images)
+        view_menu.add_command(label="Compare Annotators", command=self.compare_annotators)
         
         tools_menu = tk.Menu(menubar, tearoff=0, bg=self.bg_color, fg=self.text_color,
                             activebackground=self.accent_color, activeforeground='white',
                             font=('Segoe UI', 9))
         menubar.add_cascade(label="Tools", menu=tools_menu)
         tools_menu.add_command(label="Calculate Angles", command=self.calculate_hip_angles)
+        tools_menu.add_checkbutton(label="Pipeline Mode (P)", variable=self.pipeline_mode,
+                                   command=self.apply_pipeline_mode)
         tools_menu.add_command(label="Clear All Labels (Ctrl+Z)", command=self.clear_labels)
+        tools_menu.add_command(label="Dataset Statistics", command=self.show_dataset_statistics)
+        tools_menu.add_command(label="Annotator Agreement", command=self.show_annotator_agreement)
+        tools_menu.add_separator()
+        tools_menu.add_checkbutton(label="Suggest Femur Circles", variable=self.suggest_circles,
+                                   command=self.request_circle_proposals)
+        tools_menu.add_command(label="Accept Circle Suggestions (A)", command=self.accept_circle_suggestions)
+        tools_menu.add_checkbutton(label="Snap to Edges", variable=self.snap_to_edges,
+                                   command=self.prewarm_gradients)
+        tools_menu.add_separator()
+        for label, value in (("Show Duplicates", "show"),
+                             ("Skip Unlabelled Duplicates", "skip"),
+                             ("Link Labels from Duplicates", "link")):
+            tools_menu.add_radiobutton(label=label, value=value, variable=self.duplicate_mode,
+                                       command=self.apply_duplicate_mode)
+        tools_menu.add_command(label="List Duplicate Images", command=self.show_duplicates)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="Memory Budget...", command=self.set_memory_budget)
+        
+        filter_menu = tk.Menu(menubar, tearoff=0, bg=self.bg_color, fg=self.text_color,
+                             activebackground=self.accent_color, activeforeground='white',
+                             font=('Segoe UI', 9))
+        menubar.add_cascade(label="Filter", menu=filter_menu)
+        for label, value in (("All Images", "all"),
+                             ("Incomplete Labels", "incomplete"),
+                             ("Not Calculated", "calculated"),
+                             ("Missing Pelvis Rectangle", "rectangle"),
+                             ("Missing Left Acetabulum Point", "left_keypoint"),
+                             ("Missing Right Acetabulum Point", "right_keypoint"),
+                             ("Missing Left Femur Circle", "left_circle"),
+                             ("Missing Right Femur Circle", "right_circle"),
+                             ("Norberg Angle < 105°", "angle_below"),
+                             ("Norberg Angle Below...", "angle_below_custom")):
+            filter_menu.add_radiobutton(label=label, value=value, variable=self.filter_name,
+                                        command=self.apply_filter_choice)
         
         help_menu = tk.Menu(menubar, tearoff=0, bg=self.bg_color, fg=self.text_color,
                            activebackground=self.accent_color, activeforeground='white',
@@ -289,38 +476,107 @@ class NorbergOlsenLabelingApp:
         self.canvas = tk.Canvas(canvas_frame, bg=self.canvas_bg, 
                                highlightthickness=1, highlightbackground=self.accent_color)
         self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.canvas_backend = TkCanvas(self.canvas)
         
-        h_scrollbar = ttk.Scrollbar(canvas_frame, orient=tk.HORIZONTAL, command=self.canvas.xview)
+        h_scrollbar = ttk.Scrollbar(canvas_frame, orient=tk.HORIZONTAL, command=self.scroll_x)
         h_scrollbar.grid(row=1, column=0, sticky="ew")
         
-        v_scrollbar = ttk.Scrollbar(canvas_frame, orient=tk.VERTICAL, command=self.canvas.yview)
+        v_scrollbar = ttk.Scrollbar(canvas_frame, orient=tk.VERTICAL, command=self.scroll_y)
         v_scrollbar.grid(row=0, column=1, sticky="ns")
         
         self.canvas.configure(xscrollcommand=h_scrollbar.set, yscrollcommand=v_scrollbar.set)
         
-        self.canvas.bind("<Button-1>", self.on_canvas_click)
-        self.canvas.bind("<B1-Motion>", self.on_canvas_drag)
-        self.canvas.bind("<ButtonRelease-1>", self.on_canvas_release)
+        self.bind_canvas_events()
+    
+    def bind_canvas_events(self):
+        self.canvas.bind("<Button-1>", lambda e: self.handle_mouse("click", e))
+        self.canvas.bind("<B1-Motion>", lambda e: self.handle_mouse("drag", e))
+        self.canvas.bind("<ButtonRelease-1>", lambda e: self.handle_mouse("release", e))
         self.canvas.bind("<Button-3>", self.on_right_click)
+        self.canvas.bind("<Configure>", self.schedule_render_view)
+        
+        self.canvas.bind("<MouseWheel>", self.zoom)
+        self.canvas.bind("<Button-4>", self.zoom)
+        self.canvas.bind("<Button-5>", self.zoom)
+        
+        self.canvas.bind("<Control-Button-1>", self.start_window_level)
+        self.canvas.bind("<Control-B1-Motion>", self.do_window_level)
+        self.canvas.bind("<Control-ButtonRelease-1>", self.stop_window_level)
+        
+        self.bind_canvas_mouse(self.on_canvas_click, self.on_canvas_drag, self.on_canvas_release)
+    
+    def bind_canvas_mouse(self, press, motion, release):
+        self.mouse_handlers = {"click": press, "drag": motion, "release": release}
+    
+    def handle_mouse(self, kind, event):
+        self.trace(kind, x=self.canvas.canvasx(event.x), y=self.canvas.canvasy(event.y))
+        self.mouse_handlers[kind](event)
+    
+    def trace(self, event_type, **data):
+        if self.session_recorder is not None and not self.trace_suppressed:
+            self.session_recorder.record(event_type, image_index=self.current_image_index, **data)
+    
+    def untraced(self, function, *args):
+        # Follow-up actions the app takes by itself are replayed from the input that caused them
+        self.trace_suppressed += 1
+        try:
+            return function(*args)
+        finally:
+            self.trace_suppressed -= 1
     
     def create_status_bar(self):
         status_frame = ttk.Frame(self.root, style='StatusBar.TFrame', padding=(5, 3))
         status_frame.grid(row=2, column=0, sticky="ew")
         
-        self.status_text = tk.StringVar(value="Ready. Open a folder to begin.")
+        self.create_status_variables()
+        
         status_label = ttk.Label(status_frame, textvariable=self.status_text, 
                                 style='TLabel', font=('Segoe UI', 9))
         status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
-        self.zoom_text = tk.StringVar(value="Zoom: 100%")
+        memory_label = ttk.Label(status_frame, textvariable=self.memory_text, 
+                                style='TLabel', font=('Segoe UI', 9))
+        memory_label.pack(side=tk.RIGHT, padx=(10, 0))
+        
         zoom_label = ttk.Label(status_frame, textvariable=self.zoom_text, 
                               style='TLabel', font=('Segoe UI', 9))
         zoom_label.pack(side=tk.RIGHT, padx=(10, 0))
+        
+        window_level_label = ttk.Label(status_frame, textvariable=self.window_level_text, 
+                                      style='TLabel', font=('Segoe UI', 9))
+        window_level_label.pack(side=tk.RIGHT, padx=(10, 0))
+    
+    def create_status_variables(self):
+        self.status_text = tk.StringVar(self.root, value="Ready. Open a folder to begin.")
+        self.zoom_text = tk.StringVar(self.root, value="Zoom: 100%")
+        self.window_level_text = tk.StringVar(self.root, value=self.window_level.describe())
+        self.memory_text = tk.StringVar(self.root, value=memory_budget.describe())
+    
+    def show_info(self, title, message):
+        messagebox.showinfo(title, message)
+    
+    def show_warning(self, title, message):
+        messagebox.showwarning(title, message)
+    
+    def show_error(self, title, message):
+        messagebox.showerror(title, message)
+    
+    def ask_float(self, title, prompt, initial_value):
+        return simpledialog.askfloat(title, prompt, initialvalue=initial_value, parent=self.root)
+    
+    def ask_yes_no(self, title, message):
+        return messagebox.askyesno(title, message)
+    
+    def show_context_menu(self, event):
+        self.context_menu.post(event.x_root, event.y_root)
+    
+    def create_photo_image(self, image):
+        return ImageTk.PhotoImage(image)
     
     def initialize_managers(self):
-        self.drawing_manager = DrawingManager(self.canvas, self.zoom_factor, self.current_labels)
-        self.label_renderer = LabelRenderer(self.canvas, self.zoom_factor, self.show_labels, self.show_label_text)
-        self.edit_manager = EditManager(self.canvas, self.zoom_factor)
+        self.drawing_manager = DrawingManager(self.canvas_backend, self.zoom_factor, self.current_labels)
+        self.label_renderer = LabelRenderer(self.canvas_backend, self.zoom_factor, self.show_labels, self.show_label_text)
+        self.edit_manager = EditManager(self.canvas_backend, self.zoom_factor)
     
     def open_folder(self):
         initial_dir = self.last_folder_path if self.last_folder_path else os.path.expanduser("~")
@@ -329,16 +585,313 @@ class NorbergOlsenLabelingApp:
                                               initialdir=initial_dir)
         
         if folder_path:
-            self.current_folder = folder_path
-            self.last_folder_path = folder_path
-            self.image_files = load_images_from_folder(folder_path)
-            self.labels = load_labels(folder_path)
-            
-            if self.image_files:
-                self.current_image_index = 0
-                self.display_image()
+            self.load_folder(folder_path)
+    
+    def load_folder(self, folder_path, image_index=0, keep_filter=False):
+        self.trace("open_folder", method="load_folder", folder=folder_path)
+        if not self.confirm_leave_folder():
+            return
+        
+        self.current_folder = folder_path
+        self.last_folder_path = folder_path
+        self.image_files = load_images_from_folder(folder_path)
+        self.labels = self.read_folder_labels(folder_path)
+        self.reset_label_tracking()
+        self.angle_stats.rebuild(self.labels)
+        self.label_index.rebuild(self.image_files, self.labels)
+        self.start_duplicate_index()
+        if not keep_filter:
+            self.clear_filter()
+        
+        if self.project is not None:
+            self.project.update_folder(folder_path, self.image_files, self.label_index)
+        
+        if self.image_files:
+            if image_index < 0:
+                image_index = len(self.image_files) + image_index
+            self.current_image_index = min(max(image_index, 0), len(self.image_files) - 1)
+            self.display_image()
+        else:
+            self.current_image_index = -1
+            self.show_warning("No Images", "No image files found in the selected folder.")
+    
+    def confirm_leave_folder(self):
+        if not self.dirty_labels or not self.current_folder:
+            return True
+        
+        if self.ask_yes_no("Unsaved Labels",
+                           f"Save the label changes in {os.path.basename(self.current_folder)} before leaving it?"):
+            return self.write_labels()
+        return True
+    
+    def read_folder_labels(self, folder_path):
+        self.finish_background_work()
+        self.close_label_service()
+        if self.use_label_service:
+            try:
+                self.label_client = connect_label_service(folder_path, start=True)
+                # Subscribe before reading so no change slips in between
+                self.label_client.subscribe()
+                return self.label_client.get()
+            except (LabelServiceError, OSError) as e:
+                self.close_label_service()
+                self.show_warning("Label Service", f"Could not use the label service: {str(e)}\n\n"
+                                                   "Labels are read from and saved to disk directly.")
+        return load_labels(folder_path, self.annotator)
+    
+    def close_label_service(self):
+        if self.label_client is not None:
+            self.label_client.close()
+            self.label_client = None
+    
+    def lose_label_service(self, error):
+        self.close_label_service()
+        self.label_watcher.watch(self.watched_label_files())
+        self.status_text.set(f"Lost the label service ({error}); labels are saved to disk once it has stopped")
+    
+    def send_service_labels(self):
+        if not self.dirty_labels:
+            return True
+        try:
+            self.label_client.put({name: self.labels.get(name) for name in self.dirty_labels})
+        except (LabelServiceError, OSError) as e:
+            self.lose_label_service(e)
+            return self.save_labels_directly()
+        return True
+    
+    def save_labels_directly(self):
+        if self.use_label_service and service_running(self.current_folder):
+            # The service still owns the label file; writing it here would race its next checkpoint
+            self.show_error("Label Service", "The connection to the label service was lost, but the service "
+                                             "is still running for this folder.\n\nThe label changes are kept "
+                                             "unsaved; save again once it has stopped.")
+            return False
+        return save_labels(self.current_folder, self.labels, self.annotator, self.dirty_labels)
+    
+    def sync_external_labels(self):
+        if self.label_client is not None:
+            self.apply_service_changes()
+        elif self.label_watcher.changed():
+            self.reload_external_labels()
+    
+    def write_labels(self):
+        self.finish_background_work()
+        self.sync_external_labels()
+        if self.label_conflicts:
+            self.resolve_label_conflicts()
+        
+        if self.label_client is not None:
+            if not self.send_service_labels():
+                return False
+        elif not self.save_labels_directly():
+            return False
+        
+        self.disk_labels = snapshot_labels(self.labels, self.dirty_labels)
+        self.dirty_labels = set()
+        self.label_watcher.acknowledge()
+        if self.project is not None:
+            self.project.update_folder(self.current_folder, self.image_files, self.label_index)
+            self.save_project()
+        return True
+    
+    def watched_label_files(self):
+        if self.label_client is not None:
+            # The service owns the files; its checkpoints would otherwise look like outside edits
+            return []
+        paths = [labels_path(self.current_folder)]
+        if self.annotator:
+            paths.append(shard_path(self.current_folder, self.annotator))
+        return paths
+    
+    def reset_label_tracking(self):
+        self.dirty_labels = set()
+        self.disk_labels = snapshot_labels(self.labels)
+        self.label_conflicts = {}
+        self.label_watcher.watch(self.watched_label_files())
+        
+        if not self.polling_label_files:
+            self.polling_label_files = True
+            self.root.after(1000, self.poll_label_files)
+    
+    def poll_label_files(self):
+        if self.current_folder:
+            self.sync_external_labels()
+        self.root.after(1000, self.poll_label_files)
+    
+    def reload_external_labels(self):
+        try:
+            new_labels = read_labels(self.current_folder, self.annotator)
+        except (OSError, ValueError):
+            # Most likely caught mid-write by the other process; try again on the next poll
+            return
+        self.label_watcher.acknowledge()
+        
+        result = apply_external_changes(self.labels, self.disk_labels, new_labels, self.dirty_labels)
+        if hasattr(self.labels, "rebase") and hasattr(new_labels, "source"):
+            self.labels.rebase(new_labels.source)
+        self.disk_labels = new_labels
+        self.show_external_changes(result, new_labels, "on disk")
+    
+    def apply_service_changes(self):
+        try:
+            events = self.label_client.poll()
+        except (LabelServiceError, OSError) as e:
+            self.lose_label_service(e)
+            return
+        
+        new_labels = {}
+        for event in events:
+            new_labels.update(event["entries"])
+        if not new_labels:
+            return
+        
+        old_labels = {name: self.disk_labels.get(name) for name in new_labels if self.disk_labels.get(name)}
+        result = apply_external_changes(self.labels, old_labels,
+                                        {name: entry for name, entry in new_labels.items() if entry},
+                                        self.dirty_labels)
+        for name, entry in new_labels.items():
+            if entry:
+                self.disk_labels[name] = entry
             else:
-                messagebox.showwarning("No Images", "No image files found in the selected folder.")
+                self.disk_labels.pop(name, None)
+        self.show_external_changes(result, new_labels, "by another client")
+    
+    def show_external_changes(self, result, new_labels, origin):
+        for name in result.applied:
+            self.refresh_label_entry(name)
+        for name in result.conflicts:
+            self.label_conflicts[name] = new_labels.get(name)
+        if not result:
+            return
+        
+        if self.project is not None:
+            self.project.update_folder(self.current_folder, self.image_files, self.label_index)
+        
+        message = f"Reloaded {len(result.applied)} labels changed {origin}"
+        if self.label_conflicts:
+            message += f"; {len(self.label_conflicts)} conflict with your unsaved edits"
+        self.status_text.set(message)
+    
+    def refresh_label_entry(self, file_name):
+        entry = self.labels.get(file_name)
+        self.angle_stats.update(file_name, entry)
+        self.label_index.update(file_name, entry)
+        
+        if self.image_files and os.path.basename(self.image_files[self.current_image_index]) == file_name:
+            self.current_labels = copy.deepcopy(entry) if entry else {}
+            if self.drawing_manager:
+                self.drawing_manager.current_labels = self.current_labels
+            self.redraw_labels()
+    
+    def resolve_label_conflicts(self):
+        names = sorted(self.label_conflicts)
+        listing = "\n".join(names[:10]) + (f"\n... and {len(names) - 10} more" if len(names) > 10 else "")
+        keep_mine = self.ask_yes_no(
+            "Label Conflicts",
+            f"{len(names)} images were changed on disk after you edited them:\n\n{listing}\n\n"
+            "Yes: keep your versions and overwrite the changes on disk.\n"
+            "No: discard your edits for these images and keep the versions on disk."
+        )
+        if not keep_mine:
+            for name in names:
+                if self.label_conflicts[name]:
+                    self.labels[name] = self.label_conflicts[name]
+                else:
+                    self.labels.pop(name, None)
+                self.dirty_labels.discard(name)
+                self.refresh_label_entry(name)
+        
+        self.label_conflicts = {}
+    
+    def new_project(self):
+        project_path = filedialog.asksaveasfilename(
+            title="Create Project",
+            defaultextension=PROJECT_EXTENSION,
+            filetypes=[("Labeling projects", f"*{PROJECT_EXTENSION}"), ("All files", "*.*")]
+        )
+        if not project_path or not self.confirm_leave_folder():
+            return
+        
+        self.project = Project(project_path, self.annotator)
+        self.save_project()
+        self.add_folders_to_project()
+    
+    def open_project(self):
+        project_path = filedialog.askopenfilename(
+            title="Open Project",
+            filetypes=[("Labeling projects", f"*{PROJECT_EXTENSION}"), ("All files", "*.*")]
+        )
+        if project_path:
+            self.open_project_file(project_path)
+    
+    def open_project_file(self, project_path):
+        self.trace("open_project", method="open_project_file", args=[project_path])
+        try:
+            project = Project.load(project_path, self.annotator)
+        except (OSError, ValueError) as e:
+            self.show_error("Error", f"Could not open project: {str(e)}")
+            return
+        
+        if not self.confirm_leave_folder():
+            return
+        self.dirty_labels = set()
+        self.project = project
+        
+        folder_path = project.last_folder
+        image_index = project.last_image_index
+        if project.folder_position(folder_path) is None or not os.path.isdir(folder_path):
+            folder = project.first_folder()
+            folder_path = folder.path if folder else None
+            image_index = 0
+        
+        if folder_path:
+            self.load_folder(folder_path, image_index)
+            self.remember_session()
+        else:
+            self.status_text.set(f"Project {os.path.basename(project_path)} has no folders yet")
+    
+    def add_folders_to_project(self):
+        if self.project is None:
+            self.show_warning("No Project", "Create or open a project first.")
+            return
+        
+        initial_dir = self.last_folder_path if self.last_folder_path else os.path.expanduser("~")
+        folder_path = filedialog.askdirectory(title="Add Folder (and Subfolders) to Project",
+                                              initialdir=initial_dir)
+        if not folder_path:
+            return
+        
+        self.status_text.set(f"Scanning {folder_path}...")
+        self.root.update_idletasks()
+        added = self.project.add_tree(folder_path)
+        self.save_project()
+        self.status_text.set(f"Added {added} folders to the project "
+                             f"({len(self.project.folders)} folders, {self.project.image_count()} images)")
+        
+        if self.current_folder is None and self.project.folders:
+            self.load_folder(self.project.folders[0].path)
+    
+    def refresh_project(self):
+        if self.project is None:
+            return
+        refreshed = self.project.refresh_stale()
+        self.save_project()
+        self.status_text.set(f"Project index refreshed ({refreshed} folders changed)")
+    
+    def close_project(self):
+        if self.project is None:
+            return
+        self.remember_session()
+        self.save_project()
+        self.project = None
+        self.remember_session()
+        self.status_text.set("Project closed")
+    
+    def save_project(self):
+        try:
+            self.project.save()
+        except OSError as e:
+            self.show_error("Error", f"Could not save project: {str(e)}")
     
     def display_image(self):
         if not self.image_files or self.current_image_index < 0:
@@ -347,28 +900,201 @@ class NorbergOlsenLabelingApp:
         image_path = self.image_files[self.current_image_index]
         
         try:
-            self.pil_image = Image.open(image_path)
-            
-            img_width = int(self.pil_image.width * self.zoom_factor)
-            img_height = int(self.pil_image.height * self.zoom_factor)
+            if self.loaded_image is not None:
+                self.decode_cache.release(self.loaded_image.path)
+                self.loaded_image = None
             
-            resized_image = self.pil_image.resize((img_width, img_height), Image.Resampling.LANCZOS)
-            self.tk_image = ImageTk.PhotoImage(resized_image)
+            # Comparison panes showing this image share the decode instead of repeating it
+            self.loaded_image = self.decode_cache.acquire(
+                image_path, lambda path: self.take_prefetched(path) or load_image(path))
+            self.pil_image = self.loaded_image.source.image
             
             self.canvas.delete("all")
-            self.current_image = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.tk_image)
-            
-            self.canvas.configure(scrollregion=self.canvas.bbox(tk.ALL))
+            self.current_image = self.canvas.create_image(0, 0, anchor=tk.NW)
+            self.view_box = None
+            self.drop_previous_view()
+            self.overview_state = None
+            self.update_scrollregion()
             
             file_name = os.path.basename(image_path)
-            self.status_text.set(f"Image: {file_name} ({self.current_image_index + 1}/{len(self.image_files)})")
+            status = f"Image: {file_name} ({self.current_image_index + 1}/{len(self.image_files)})"
+            if self.project is not None:
+                position = self.project.folder_position(self.current_folder)
+                if position is not None:
+                    status += f" - Folder {position + 1}/{len(self.project.folders)}"
+            if self.image_filter is not None:
+                status += f" - Filter: {self.image_filter.describe()} ({self.label_index.count(self.image_filter)} images)"
+            self.status_text.set(status)
             
             self.load_current_labels()
+            self.update_pelvis_roi()
+            self.link_duplicate_labels()
+            self.show_duplicate_status()
             self.initialize_managers()
+            self.render_view()
+            self.circle_suggestions = {}
             self.redraw_labels()
+            if self.throughput_log is not None:
+                self.throughput_log.open_image(self.current_folder, file_name)
+            self.request_circle_proposals()
+            if self.pipeline_mode.get():
+                self.enter_next_step()
+                self.prefetch_next_image()
+            self.root.after(150, self.prewarm_gradients)
             
         except Exception as e:
-            messagebox.showerror("Error", f"Could not load image: {str(e)}")
+            self.show_error("Error", f"Could not load image: {str(e)}")
+    
+    def update_scrollregion(self):
+        width = int(self.loaded_image.width * self.zoom_factor)
+        height = int(self.loaded_image.height * self.zoom_factor)
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+    
+    def visible_region(self):
+        x1 = self.canvas.canvasx(0)
+        y1 = self.canvas.canvasy(0)
+        x2 = x1 + max(self.canvas.winfo_width(), 1)
+        y2 = y1 + max(self.canvas.winfo_height(), 1)
+        
+        width = self.loaded_image.width * self.zoom_factor
+        height = self.loaded_image.height * self.zoom_factor
+        return (max(x1, 0), max(y1, 0), min(x2, width), min(y2, height))
+    
+    def render_view(self):
+        if self.loaded_image is None or self.current_image is None:
+            return
+        
+        vx1, vy1, vx2, vy2 = self.visible_region()
+        margin_x = (vx2 - vx1) / 2
+        margin_y = (vy2 - vy1) / 2
+        
+        x1 = max(0, int((vx1 - margin_x) / self.zoom_factor))
+        y1 = max(0, int((vy1 - margin_y) / self.zoom_factor))
+        x2 = min(self.loaded_image.width, int(math.ceil((vx2 + margin_x) / self.zoom_factor)))
+        y2 = min(self.loaded_image.height, int(math.ceil((vy2 + margin_y) / self.zoom_factor)))
+        visible = (vx1 / self.zoom_factor, vy1 / self.zoom_factor, vx2 / self.zoom_factor, vy2 / self.zoom_factor)
+        x1, y1, x2, y2 = self.loaded_image.source.fit_region((x1, y1, x2, y2), visible)
+        
+        if x2 <= x1 or y2 <= y1:
+            return
+        
+        if self.restore_previous_view():
+            return
+        self.stash_view()
+        self.display_base = self.loaded_image.source.read_region((x1, y1, x2, y2), self.zoom_factor)
+        self.tk_image = self.create_photo_image(self.loaded_image.render(self.display_base, self.window_level))
+        memory_budget.register("display_base", image_bytes(self.display_base), "view", PRIORITY_PINNED)
+        memory_budget.register("photo_image", photo_bytes(*self.display_base.size), "photo", PRIORITY_PINNED)
+        
+        self.canvas.itemconfigure(self.current_image, image=self.tk_image)
+        self.canvas.coords(self.current_image, x1 * self.zoom_factor, y1 * self.zoom_factor)
+        self.canvas.tag_lower(self.current_image)
+        
+        self.view_box = (x1 * self.zoom_factor, y1 * self.zoom_factor,
+                         x1 * self.zoom_factor + self.display_base.width,
+                         y1 * self.zoom_factor + self.display_base.height)
+        self.view_key = (self.zoom_factor, self.window_level.key())
+    
+    def view_covers_visible(self, view_box=None):
+        view_box = view_box or self.view_box
+        if view_box is None:
+            return False
+        
+        vx1, vy1, vx2, vy2 = self.visible_region()
+        bx1, by1, bx2, by2 = view_box
+        return bx1 <= vx1 and by1 <= vy1 and bx2 >= vx2 - 1 and by2 >= vy2 - 1
+    
+    def stash_view(self):
+        if self.view_box is None or self.tk_image is None:
+            return
+        self.previous_view = (self.view_key, self.view_box, self.display_base, self.tk_image)
+        memory_budget.register("previous_view", image_bytes(self.display_base) + photo_bytes(*self.display_base.size),
+                               "view", PRIORITY_RECENT, release=self.release_previous_view)
+    
+    def release_previous_view(self):
+        self.previous_view = None
+    
+    def drop_previous_view(self):
+        self.previous_view = None
+        memory_budget.unregister("previous_view")
+    
+    def restore_previous_view(self):
+        # Flipping between overview and pelvis detail swaps in the other view's finished render
+        previous = self.previous_view
+        if (previous is None or previous[0] != (self.zoom_factor, self.window_level.key()) or
+                not self.view_covers_visible(previous[1])):
+            return False
+        
+        self.stash_view()
+        self.view_key, self.view_box, self.display_base, self.tk_image = previous
+        memory_budget.register("display_base", image_bytes(self.display_base), "view", PRIORITY_PINNED)
+        memory_budget.register("photo_image", photo_bytes(*self.display_base.size), "photo", PRIORITY_PINNED)
+        self.canvas.itemconfigure(self.current_image, image=self.tk_image)
+        self.canvas.coords(self.current_image, self.view_box[0], self.view_box[1])
+        self.canvas.tag_lower(self.current_image)
+        return True
+    
+    def update_pelvis_roi(self):
+        if self.loaded_image is None or self.current_image_index < 0:
+            return
+        
+        source = self.loaded_image.source
+        base = source.base if isinstance(source, RoiImageSource) else source
+        rectangle = self.current_labels.get("rectangle")
+        roi = None
+        if rectangle is not None:
+            roi = self.roi_cache.build(self.image_files[self.current_image_index], base, rectangle)
+        
+        if roi is None:
+            self.loaded_image.source = base
+        elif base is source or source.roi is not roi:
+            self.loaded_image.source = RoiImageSource(base, roi)
+    
+    def toggle_pelvis_detail(self):
+        self.trace("command", method="toggle_pelvis_detail")
+        if self.loaded_image is None:
+            return
+        
+        if self.overview_state is not None:
+            self.zoom_factor, scroll_x, scroll_y = self.overview_state
+            self.overview_state = None
+            self.apply_zoom(scroll_x, scroll_y)
+            self.status_text.set("Overview")
+            return
+        
+        rectangle = self.current_labels.get("rectangle")
+        if rectangle is None:
+            self.status_text.set("Draw the pelvis rectangle first to open the detail view")
+            return
+        
+        x1, y1, x2, y2 = roi_box(rectangle, self.loaded_image.width, self.loaded_image.height, 0.02)
+        width = max(self.canvas.winfo_width(), 1)
+        height = max(self.canvas.winfo_height(), 1)
+        zoom = min(width / float(max(x2 - x1, 1)), height / float(max(y2 - y1, 1)))
+        self.overview_state = (self.zoom_factor, self.canvas.canvasx(0), self.canvas.canvasy(0))
+        self.zoom_factor = min(max(zoom, self.zoom_min), self.zoom_max)
+        self.apply_zoom((x1 + x2) / 2 * self.zoom_factor - width / 2, (y1 + y2) / 2 * self.zoom_factor - height / 2)
+        self.status_text.set(f"Pelvis detail at {int(self.zoom_factor * 100)}% (D returns to the overview)")
+    
+    def schedule_render_view(self, event=None):
+        if not self.render_pending:
+            self.render_pending = True
+            self.root.after_idle(self.refresh_view)
+    
+    def refresh_view(self):
+        self.render_pending = False
+        if self.loaded_image is not None and not self.view_covers_visible():
+            self.render_view()
+    
+    def scroll_x(self, *args):
+        self.trace("scroll", method="scroll_x", args=list(args))
+        self.canvas.xview(*args)
+        self.schedule_render_view()
+    
+    def scroll_y(self, *args):
+        self.trace("scroll", method="scroll_y", args=list(args))
+        self.canvas.yview(*args)
+        self.schedule_render_view()
     
     def load_current_labels(self):
         if self.current_image_index < 0 or not self.image_files:
@@ -377,7 +1103,7 @@ class NorbergOlsenLabelingApp:
         file_name = os.path.basename(self.image_files[self.current_image_index])
         
         if file_name in self.labels:
-            self.current_labels = self.labels[file_name]
+            self.current_labels = copy.deepcopy(self.labels[file_name])
         else:
             self.current_labels = {}
     
@@ -387,24 +1113,108 @@ class NorbergOlsenLabelingApp:
             self.label_renderer.show_labels = self.show_labels
             self.label_renderer.show_label_text = self.show_label_text
             self.label_renderer.redraw_all(self.current_labels)
+            self.label_renderer.draw_suggestions({
+                key: circle for key, circle in self.circle_suggestions.items()
+                if key not in self.current_labels
+            })
+    
+    def request_circle_proposals(self):
+        self.circle_suggestions = {}
+        self.redraw_labels()
+        
+        if not self.suggest_circles.get() or self.current_image_index < 0 or not self.image_files:
+            return
+        
+        image_path = self.image_files[self.current_image_index]
+        roi = self.current_labels.get("rectangle")
+        
+        proposals = self.circle_proposals.get(image_path, roi)
+        if proposals is not None:
+            self.show_circle_suggestions(proposals)
+            return
+        
+        self.circle_proposals.request(image_path, roi)
+        if not self.polling_proposals:
+            self.polling_proposals = True
+            self.root.after(200, self.poll_circle_proposals)
+    
+    def poll_circle_proposals(self):
+        finished = self.circle_proposals.poll()
+        
+        if self.image_files and self.current_image_index >= 0:
+            image_path = os.path.abspath(self.image_files[self.current_image_index])
+            if image_path in finished:
+                proposals = self.circle_proposals.get(image_path, self.current_labels.get("rectangle"))
+                if proposals is not None:
+                    self.show_circle_suggestions(proposals)
+        
+        if self.circle_proposals.pending:
+            self.root.after(200, self.poll_circle_proposals)
+        else:
+            self.polling_proposals = False
+    
+    def show_circle_suggestions(self, proposals):
+        if not self.suggest_circles.get():
+            return
+        
+        self.circle_suggestions = {
+            key: circle for key, circle in proposals.items()
+            if key not in self.current_labels
+        }
+        self.redraw_labels()
+        
+        if self.circle_suggestions:
+            self.status_text.set("Femur circle suggestions ready. Press A to accept, or draw to override.")
+    
+    def accept_circle_suggestions(self):
+        self.trace("command", method="accept_circle_suggestions")
+        accepted = []
+        for key, circle in self.circle_suggestions.items():
+            if key not in self.current_labels:
+                self.current_labels[key] = {
+                    "center_x": circle["center_x"],
+                    "center_y": circle["center_y"],
+                    "radius": circle["radius"]
+                }
+                accepted.append(key)
+        
+        self.circle_suggestions = {}
+        self.redraw_labels()
+        
+        if accepted:
+            for key in accepted:
+                self.step_event("done", key)
+            self.status_text.set("Circle suggestions accepted. Right-click a circle to adjust it.")
+            self.save_current_labels()
+            self.step_completed()
     
     def draw_rectangle_mode(self):
+        self.trace("command", method="draw_rectangle_mode")
+        self.step_event("mode", "rectangle")
         self.drawing_mode = "rectangle"
         self.status_text.set("Click and drag to draw pelvis rectangle")
     
     def draw_left_keypoint_mode(self):
+        self.trace("command", method="draw_left_keypoint_mode")
+        self.step_event("mode", "left_keypoint")
         self.drawing_mode = "left_keypoint"
         self.status_text.set("Click to place left acetabulum point")
     
     def draw_right_keypoint_mode(self):
+        self.trace("command", method="draw_right_keypoint_mode")
+        self.step_event("mode", "right_keypoint")
         self.drawing_mode = "right_keypoint"
         self.status_text.set("Click to place right acetabulum point")
     
     def draw_left_circle_mode(self):
+        self.trace("command", method="draw_left_circle_mode")
+        self.step_event("mode", "left_circle")
         self.drawing_mode = "left_circle"
         self.status_text.set("Click center, then drag to set left femur head circle radius")
     
     def draw_right_circle_mode(self):
+        self.trace("command", method="draw_right_circle_mode")
+        self.step_event("mode", "right_circle")
         self.drawing_mode = "right_circle"
         self.status_text.set("Click center, then drag to set right femur head circle radius")
     
@@ -416,18 +1226,22 @@ class NorbergOlsenLabelingApp:
             self.drawing_manager.start_drawing(x, y, self.drawing_mode)
         
         elif self.drawing_mode == "left_keypoint":
-            self.current_labels["left_keypoint"] = {"x": x, "y": y}
+            self.current_labels["left_keypoint"] = self.snap_keypoint_label({"x": x, "y": y})
             self.redraw_labels()
             self.drawing_mode = None
             self.status_text.set("Left acetabulum point placed")
+            self.step_event("done", "left_keypoint")
             self.save_current_labels()
+            self.step_completed()
         
         elif self.drawing_mode == "right_keypoint":
-            self.current_labels["right_keypoint"] = {"x": x, "y": y}
+            self.current_labels["right_keypoint"] = self.snap_keypoint_label({"x": x, "y": y})
             self.redraw_labels()
             self.drawing_mode = None
             self.status_text.set("Right acetabulum point placed")
+            self.step_event("done", "right_keypoint")
             self.save_current_labels()
+            self.step_completed()
         
         elif self.drawing_mode in ["left_circle", "right_circle"]:
             if self.drawing_manager.start_x is None:
@@ -453,10 +1267,13 @@ class NorbergOlsenLabelingApp:
             self.redraw_labels()
             self.drawing_mode = None
             self.status_text.set("Pelvis rectangle drawn")
+            self.step_event("done", "rectangle")
             self.save_current_labels()
+            self.request_circle_proposals()
+            self.step_completed()
         
         elif self.drawing_mode in ["left_circle", "right_circle"] and self.drawing_manager.start_x is not None:
-            circle_data = self.drawing_manager.finalize_circle(x, y)
+            circle_data = self.snap_circle_label(self.drawing_manager.finalize_circle(x, y))
             
             if self.drawing_mode == "left_circle":
                 self.current_labels["left_circle"] = circle_data
@@ -466,12 +1283,15 @@ class NorbergOlsenLabelingApp:
                 self.status_text.set("Right femur head circle drawn")
             
             self.redraw_labels()
+            self.step_event("done", self.drawing_mode)
             self.drawing_mode = None
             self.save_current_labels()
+            self.step_completed()
     
     def on_right_click(self, event):
         x = self.canvas.canvasx(event.x)
         y = self.canvas.canvasy(event.y)
+        self.trace("right_click", method="on_right_click", x=x, y=y)
         
         items = self.canvas.find_overlapping(x-5, y-5, x+5, y+5)
         
@@ -492,16 +1312,15 @@ class NorbergOlsenLabelingApp:
                 elif "right_circle" in tags:
                     self.selected_tag = "right_circle"
                 
-                self.context_menu.post(event.x_root, event.y_root)
+                self.show_context_menu(event)
                 break
     
     def start_move_mode(self):
+        self.trace("command", method="start_move_mode")
         self.status_text.set(f"Move mode active for {self.selected_tag}. Click and drag to move.")
         self.moving = True
         
-        self.canvas.bind("<Button-1>", self.start_moving)
-        self.canvas.bind("<B1-Motion>", self.do_move)
-        self.canvas.bind("<ButtonRelease-1>", self.stop_moving)
+        self.bind_canvas_mouse(self.start_moving, self.do_move, self.stop_moving)
     
     def start_moving(self, event):
         self.last_x = self.canvas.canvasx(event.x)
@@ -555,24 +1374,26 @@ class NorbergOlsenLabelingApp:
         self.last_y = y
     
     def stop_moving(self, event):
+        moved_rectangle = self.selected_tag == "rectangle"
         self.moving = False
         self.selected_item = None
         self.selected_tag = None
         
-        self.canvas.bind("<Button-1>", self.on_canvas_click)
-        self.canvas.bind("<B1-Motion>", self.on_canvas_drag)
-        self.canvas.bind("<ButtonRelease-1>", self.on_canvas_release)
+        self.bind_canvas_mouse(self.on_canvas_click, self.on_canvas_drag, self.on_canvas_release)
         
         self.status_text.set("Move completed. Annotation moved.")
         self.save_current_labels()
+        if moved_rectangle:
+            self.request_circle_proposals()
     
     def start_edit_mode(self):
+        self.trace("command", method="start_edit_mode")
         if self.selected_tag == "rectangle":
             self.edit_rectangle()
         elif self.selected_tag in ["left_circle", "right_circle"]:
             self.edit_circle()
         else:
-            messagebox.showinfo("Edit Mode", "Edit mode only works for rectangles and circles.")
+            self.show_info("Edit Mode", "Edit mode only works for rectangles and circles.")
     
     def edit_rectangle(self):
         self.status_text.set("Edit rectangle: drag corners to resize")
@@ -581,9 +1402,7 @@ class NorbergOlsenLabelingApp:
         
         self.edit_manager.draw_rectangle_handles(self.current_labels["rectangle"])
         
-        self.canvas.bind("<Button-1>", self.start_resize)
-        self.canvas.bind("<B1-Motion>", self.do_resize)
-        self.canvas.bind("<ButtonRelease-1>", self.stop_resize)
+        self.bind_canvas_mouse(self.start_resize, self.do_resize, self.stop_resize)
     
     def edit_circle(self):
         self.status_text.set("Edit circle: drag edge to resize")
@@ -592,9 +1411,7 @@ class NorbergOlsenLabelingApp:
         
         self.edit_manager.draw_circle_handles(self.current_labels[self.selected_tag])
         
-        self.canvas.bind("<Button-1>", self.start_circle_resize)
-        self.canvas.bind("<B1-Motion>", self.do_circle_resize)
-        self.canvas.bind("<ButtonRelease-1>", self.stop_circle_resize)
+        self.bind_canvas_mouse(self.start_circle_resize, self.do_circle_resize, self.stop_circle_resize)
     
     def start_resize(self, event):
         x = self.canvas.canvasx(event.x)
@@ -630,12 +1447,11 @@ class NorbergOlsenLabelingApp:
             self.edit_manager.clear_handles()
             self.resize_mode = False
             
-            self.canvas.bind("<Button-1>", self.on_canvas_click)
-            self.canvas.bind("<B1-Motion>", self.on_canvas_drag)
-            self.canvas.bind("<ButtonRelease-1>", self.on_canvas_release)
+            self.bind_canvas_mouse(self.on_canvas_click, self.on_canvas_drag, self.on_canvas_release)
             
             self.status_text.set("Edit completed")
             self.save_current_labels()
+            self.request_circle_proposals()
     
     def start_circle_resize(self, event):
         x = self.canvas.canvasx(event.x)
@@ -669,14 +1485,160 @@ class NorbergOlsenLabelingApp:
             self.edit_manager.clear_handles()
             self.resize_mode = False
             
-            self.canvas.bind("<Button-1>", self.on_canvas_click)
-            self.canvas.bind("<B1-Motion>", self.on_canvas_drag)
-            self.canvas.bind("<ButtonRelease-1>", self.on_canvas_release)
+            if self.resize_type in self.current_labels:
+                self.current_labels[self.resize_type] = self.snap_circle_label(self.current_labels[self.resize_type])
+                self.redraw_labels()
+            
+            self.bind_canvas_mouse(self.on_canvas_click, self.on_canvas_drag, self.on_canvas_release)
             
             self.status_text.set("Edit completed")
             self.save_current_labels()
     
+    def build_viewing_cache(self):
+        if not self.image_files:
+            self.show_warning("No Folder", "Please open a folder with images first.")
+            return
+        
+        self.ingest_service.submit(self.image_files)
+        self.status_text.set(f"Building viewing cache for {len(self.image_files)} images in the background...")
+        if not self.polling_ingest:
+            self.polling_ingest = True
+            self.root.after(500, self.poll_ingest)
+    
+    def poll_ingest(self):
+        finished = self.ingest_service.poll()
+        done, total = self.ingest_service.progress()
+        if self.ingest_service.pending:
+            if finished:
+                self.status_text.set(f"Building viewing cache: {done}/{total} images")
+            self.root.after(500, self.poll_ingest)
+            return
+        
+        self.polling_ingest = False
+        ready = sum(1 for result in self.ingest_service.results.values() if result in ("cached", "fresh"))
+        failed = len(self.ingest_service.failures())
+        self.status_text.set(f"Viewing cache ready for {ready}/{total} images" +
+                             (f" ({failed} failed)" if failed else ""))
+    
+    def start_duplicate_index(self):
+        self.hash_service.cancel()
+        self.duplicate_index = DuplicateIndex(self.current_folder)
+        missing = self.duplicate_index.load(self.image_files)
+        if not missing:
+            self.duplicate_index.save()
+            return
+        
+        self.hash_service.submit(missing)
+        if not self.polling_hashes:
+            self.polling_hashes = True
+            self.root.after(500, self.poll_hashes)
+    
+    def poll_hashes(self):
+        for image_path, result in self.hash_service.poll():
+            self.duplicate_index.add_result(image_path, result)
+        if self.hash_service.pending:
+            self.root.after(500, self.poll_hashes)
+            return
+        
+        self.polling_hashes = False
+        self.duplicate_index.save()
+        duplicates = sum(len(members) for members in self.duplicate_index.groups())
+        if duplicates:
+            self.status_text.set(f"Duplicate index ready: {duplicates} images have near-duplicates in this folder")
+        if self.link_duplicate_labels():
+            self.redraw_labels()
+    
+    def current_file_name(self):
+        return os.path.basename(self.image_files[self.current_image_index])
+    
+    def duplicate_original(self, index):
+        if self.duplicate_index is None:
+            return None
+        return self.duplicate_index.original(os.path.basename(self.image_files[index]), self.labels)
+    
+    def show_duplicate_status(self):
+        if self.duplicate_index is None:
+            return
+        matches = self.duplicate_index.matches(self.current_file_name())
+        if matches:
+            names = ", ".join(name for _, name in matches[:3]) + (", ..." if len(matches) > 3 else "")
+            self.status_text.set(f"{self.status_text.get()} - Near-duplicate of {names}")
+    
+    def link_duplicate_labels(self):
+        if self.duplicate_mode.get() != "link" or self.current_labels or self.current_image_index < 0:
+            return False
+        
+        source = self.duplicate_original(self.current_image_index)
+        if source is None or source not in self.labels:
+            return False
+        file_name = self.current_file_name()
+        self.current_labels = self.duplicate_index.transfer_labels(source, file_name, self.labels[source])
+        self.save_current_labels()
+        self.status_text.set(f"Labels for {file_name} linked from its duplicate {source}")
+        return True
+    
+    def apply_duplicate_mode(self):
+        if self.link_duplicate_labels():
+            self.redraw_labels()
+    
+    def show_duplicates(self):
+        if self.duplicate_index is None:
+            self.show_warning("No Folder", "Please open a folder first.")
+            return
+        
+        groups = self.duplicate_index.groups()
+        indexing = f" (still hashing {len(self.hash_service.pending)} images)" if self.hash_service.pending else ""
+        if not groups:
+            self.show_info("Duplicate Images", "No near-duplicate images in this folder" + indexing + ".")
+            return
+        lines = [", ".join(members) for members in groups[:20]]
+        if len(groups) > 20:
+            lines.append(f"... and {len(groups) - 20} more groups")
+        self.show_info("Duplicate Images", f"{len(groups)} groups of near-duplicates{indexing}:\n\n" + "\n".join(lines))
+    
+    def neighbour_index(self, step):
+        index = self.current_image_index + step
+        while 0 <= index < len(self.image_files):
+            if self.duplicate_mode.get() != "skip" or self.duplicate_original(index) is None:
+                return index
+            index += step
+        return None
+    
+    def update_memory_status(self):
+        self.memory_text.set(memory_budget.describe())
+    
+    def set_memory_budget(self):
+        limit = self.ask_float("Memory Budget", "Memory for decoded images, views and caches (MB):",
+                               round(memory_budget.limit / MB))
+        if limit is None or limit <= 0:
+            return
+        memory_budget.set_limit(limit * MB)
+        self.status_text.set(f"{memory_budget.describe()} ({memory_budget.evictions} cache entries evicted so far)")
+    
+    def prewarm_gradients(self):
+        if not self.snap_to_edges.get() or self.loaded_image is None:
+            return
+        if self.gradient_cache.lookup(self.loaded_image) is not None:
+            return
+        
+        key = self.gradient_cache.key(self.loaded_image)
+        if key not in self.pending_gradients:
+            self.pending_gradients.add(key)
+            self.background.submit(("gradients", key), compute_gradients, self.loaded_image)
+            self.start_background_polling()
+    
+    def snap_circle_label(self, circle):
+        if not self.snap_to_edges.get() or self.loaded_image is None:
+            return circle
+        return snap_circle(circle, self.gradient_cache.get(self.loaded_image))
+    
+    def snap_keypoint_label(self, keypoint):
+        if not self.snap_to_edges.get() or self.loaded_image is None:
+            return keypoint
+        return snap_keypoint(keypoint, self.gradient_cache.get(self.loaded_image))
+    
     def delete_selected(self):
+        self.trace("command", method="delete_selected")
         if self.selected_tag and self.selected_tag in self.current_labels:
             del self.current_labels[self.selected_tag]
             self.redraw_labels()
@@ -686,6 +1648,7 @@ class NorbergOlsenLabelingApp:
             self.selected_tag = None
     
     def cancel_drawing(self):
+        self.trace("command", method="cancel_drawing")
         self.drawing_mode = None
         if self.drawing_manager:
             self.drawing_manager.clear_temp_items()
@@ -693,7 +1656,8 @@ class NorbergOlsenLabelingApp:
         self.status_text.set("Drawing cancelled")
     
     def clear_labels(self):
-        response = messagebox.askyesno("Clear Labels", 
+        self.trace("command", method="clear_labels")
+        response = self.ask_yes_no("Clear Labels", 
                                        "Are you sure you want to clear all labels for this image?")
         
         if response:
@@ -712,19 +1676,40 @@ class NorbergOlsenLabelingApp:
             self.labels[file_name] = self.current_labels
         elif file_name in self.labels:
             del self.labels[file_name]
+        self.angle_stats.update(file_name, self.current_labels)
+        self.dirty_labels.add(file_name)
+        self.label_index.update(file_name, self.current_labels)
+        self.update_pelvis_roi()
+    
+    def labels_file(self):
+        if self.annotator:
+            return shard_path(self.current_folder, self.annotator)
+        return labels_path(self.current_folder)
+    
+    def show_annotator_agreement(self):
+        if not self.current_folder:
+            self.show_warning("No Folder", "Please open a folder first.")
+            return
+        
+        _, report = merge_folder(self.current_folder)
+        if not report["annotators"]:
+            self.show_info("Annotator Agreement", "No per-annotator label files in this folder.")
+            return
+        self.show_info("Annotator Agreement", format_report(report, max_conflicts=10))
     
     def save_labels_handler(self):
-        if save_labels(self.current_folder, self.labels):
-            json_path = os.path.join(self.current_folder, "norberg_olsen_labels.json")
+        if self.write_labels():
+            json_path = self.labels_file()
             self.status_text.set(f"Labels saved to {json_path}")
-            messagebox.showinfo("Success", f"Labels saved successfully to:\n{json_path}")
-            save_session_info(self.current_folder, self.current_image_index)
+            if not self.pipeline_mode.get():
+                self.show_info("Success", f"Labels saved successfully to:\n{json_path}")
+            self.remember_session()
         else:
             self.status_text.set("Failed to save labels")
     
     def export_to_csv_handler(self):
         if not self.labels:
-            messagebox.showwarning("No Labels", "No labels to export.")
+            self.show_warning("No Labels", "No labels to export.")
             return
         
         csv_path = filedialog.asksaveasfilename(
@@ -737,36 +1722,136 @@ class NorbergOlsenLabelingApp:
             return
         
         if export_to_csv(csv_path, self.labels):
-            messagebox.showinfo("Success", f"Data exported successfully to:\n{csv_path}")
+            self.show_info("Success", f"Data exported successfully to:\n{csv_path}")
     
     def prev_image(self):
-        if self.current_image_index > 0:
-            self.current_image_index -= 1
+        self.trace("navigate", method="prev_image")
+        self.step_event("navigate")
+        if self.image_filter is not None:
+            self.go_to_match(-1)
+        elif self.neighbour_index(-1) is not None:
+            self.current_image_index = self.neighbour_index(-1)
             self.display_image()
-            save_session_info(self.current_folder, self.current_image_index)
+            self.remember_session()
+        elif self.project is not None:
+            self.go_to_folder(-1)
     
     def next_image(self):
-        if self.current_image_index < len(self.image_files) - 1:
-            self.current_image_index += 1
+        self.trace("navigate", method="next_image")
+        self.step_event("navigate")
+        if self.image_filter is not None:
+            self.go_to_match(1)
+        elif self.neighbour_index(1) is not None:
+            self.current_image_index = self.neighbour_index(1)
             self.display_image()
-            save_session_info(self.current_folder, self.current_image_index)
+            self.remember_session()
+        elif self.project is not None:
+            self.go_to_folder(1)
+    
+    def go_to_folder(self, step):
+        folder = self.project.neighbour_folder(self.current_folder, step)
+        if folder is None:
+            self.status_text.set("Reached the " + ("end" if step > 0 else "start") + " of the project")
+            return
+        
+        self.load_folder(folder.path, 0 if step > 0 else -1, keep_filter=True)
+        self.remember_session()
+    
+    def go_to_match(self, step):
+        index = self.label_index.next_match(self.image_filter, self.current_image_index, step)
+        if index is None and self.project is not None:
+            match = self.project.find_match(self.image_filter, self.current_folder, step)
+            if match is not None:
+                folder, index = match
+                self.load_folder(folder.path, index, keep_filter=True)
+                self.remember_session()
+                return
+        
+        if index is None:
+            direction = "after" if step > 0 else "before"
+            self.status_text.set(f"No images {direction} this one match the filter: {self.image_filter.describe()}")
+            return
+        
+        self.current_image_index = index
+        self.display_image()
+        self.remember_session()
+    
+    def set_filter(self, query):
+        if query is None:
+            self.image_filter = None
+            if self.image_files:
+                self.status_text.set(f"Filter cleared ({len(self.image_files)} images)")
+            return True
+        
+        matches = self.label_index.matches(query)
+        if len(matches) == 0:
+            self.status_text.set(f"No images match the filter: {query.describe()}")
+            return False
+        
+        self.image_filter = query
+        if not query.contains(self.label_index, self.current_image_index):
+            index = self.label_index.next_match(query, self.current_image_index, 1)
+            self.current_image_index = int(matches[0]) if index is None else index
+            self.remember_session()
+        self.display_image()
+        return True
+    
+    def clear_filter(self):
+        self.image_filter = None
+        self.filter_name.set("all")
+        self.active_filter_name = "all"
+    
+    def apply_filter_choice(self, choice=None):
+        if choice is None:
+            choice = self.filter_name.get()
+        self.trace("filter", method="apply_filter_choice", args=[choice])
+        
+        if choice == "all":
+            query = None
+        elif choice == "incomplete":
+            query = IncompleteQuery()
+        elif choice == "angle_below":
+            query = AngleBelowQuery(105)
+        elif choice == "angle_below_custom":
+            threshold = self.ask_float("Norberg Angle Filter", "Show images with a Norberg angle below (degrees):", 105)
+            query = AngleBelowQuery(threshold) if threshold is not None else False
+        else:
+            query = MissingQuery(choice)
+        
+        if query is not False and self.set_filter(query):
+            self.active_filter_name = choice
+        self.filter_name.set(self.active_filter_name)
     
     def zoom_in(self):
+        self.trace("zoom", method="zoom_in")
         if self.zoom_factor < self.zoom_max:
             self.zoom_factor = min(self.zoom_factor * 1.2, self.zoom_max)
-            self.zoom_text.set(f"Zoom: {int(self.zoom_factor * 100)}%")
-            self.display_image()
+            self.apply_zoom()
     
     def zoom_out(self):
+        self.trace("zoom", method="zoom_out")
         if self.zoom_factor > self.zoom_min:
             self.zoom_factor = max(self.zoom_factor / 1.2, self.zoom_min)
-            self.zoom_text.set(f"Zoom: {int(self.zoom_factor * 100)}%")
-            self.display_image()
+            self.apply_zoom()
     
     def reset_zoom(self):
+        self.trace("zoom", method="reset_zoom")
         self.zoom_factor = 1.0
-        self.zoom_text.set("Zoom: 100%")
-        self.display_image()
+        self.apply_zoom()
+    
+    def apply_zoom(self, scroll_x=None, scroll_y=None):
+        self.zoom_text.set(f"Zoom: {int(self.zoom_factor * 100)}%")
+        
+        if self.loaded_image is None:
+            return
+        
+        self.update_scrollregion()
+        if scroll_x is not None:
+            self.canvas.xview_moveto(max(scroll_x, 0) / (self.loaded_image.width * self.zoom_factor))
+            self.canvas.yview_moveto(max(scroll_y, 0) / (self.loaded_image.height * self.zoom_factor))
+        self.initialize_managers()
+        self.render_view()
+        self.redraw_labels()
     
     def zoom(self, event):
         if event.num == 4 or event.delta > 0:
@@ -774,6 +1859,151 @@ class NorbergOlsenLabelingApp:
         elif event.num == 5 or event.delta < 0:
             self.zoom_out()
     
+    def start_window_level(self, event):
+        self.wl_last_x = event.x
+        self.wl_last_y = event.y
+    
+    def do_window_level(self, event):
+        dx = event.x - self.wl_last_x
+        dy = event.y - self.wl_last_y
+        self.wl_last_x = event.x
+        self.wl_last_y = event.y
+        
+        self.window_level.adjust(dx, -dy)
+        self.schedule_window_level_update()
+    
+    def stop_window_level(self, event):
+        self.update_window_level()
+    
+    def increase_gamma(self):
+        self.window_level.set_gamma(self.window_level.gamma * 1.1)
+        self.update_window_level()
+    
+    def decrease_gamma(self):
+        self.window_level.set_gamma(self.window_level.gamma / 1.1)
+        self.update_window_level()
+    
+    def reset_window_level(self):
+        self.window_level.reset()
+        self.update_window_level()
+    
+    def schedule_window_level_update(self):
+        if not self.wl_update_pending:
+            self.wl_update_pending = True
+            self.root.after_idle(self.update_window_level)
+    
+    def update_window_level(self):
+        self.wl_update_pending = False
+        self.window_level_text.set(self.window_level.describe())
+        
+        if self.display_base is None or self.tk_image is None:
+            return
+        
+        self.tk_image.paste(self.loaded_image.render(self.display_base, self.window_level))
+        self.view_key = (self.view_key[0], self.window_level.key())
+        if self.comparison is not None:
+            self.comparison.render()
+    
+    def compare_images(self):
+        if self.loaded_image is None:
+            self.show_warning("No Image", "Please open an image first.")
+            return
+        
+        image_paths = filedialog.askopenfilenames(
+            title="Select Images to Compare",
+            initialdir=self.current_folder,
+            filetypes=[("Image files", "*.png *.jpg *.jpeg *.tif *.tiff *.bmp"), ("All files", "*.*")]
+        )
+        if not image_paths:
+            return
+        
+        image_paths = [self.loaded_image.path] + list(image_paths)[:3]
+        self.open_comparison([(path, self.labels_for_path(path), os.path.basename(path)) for path in image_paths])
+    
+    def labels_for_path(self, image_path):
+        file_name = os.path.basename(image_path)
+        if os.path.abspath(os.path.dirname(image_path)) == os.path.abspath(self.current_folder):
+            return self.labels.get(file_name)
+        return read_labels(os.path.dirname(image_path)).get(file_name)
+    
+    def compare_annotators(self):
+        if self.loaded_image is None:
+            self.show_warning("No Image", "Please open an image first.")
+            return
+        
+        file_name = self.current_file_name()
+        panes = [(self.loaded_image.path, self.labels.get(file_name), "Current labels")]
+        for annotator, path in list_shards(self.current_folder).items():
+            if annotator != self.annotator:
+                panes.append((self.loaded_image.path, read_shard(path).get(file_name), annotator))
+        if len(panes) < 2:
+            self.show_info("Compare Annotators", "No other annotator's labels for this folder.")
+            return
+        self.open_comparison(panes[:4])
+    
+    def open_comparison(self, panes):
+        self.close_comparison()
+        canvases = self.create_comparison_window([title for _, _, title in panes])
+        self.comparison = ComparisonView(
+            [ComparisonPane(canvas, backend, path, labels, title)
+             for (canvas, backend), (path, labels, title) in zip(canvases, panes)],
+            self.decode_cache, self.window_level, self.create_photo_image,
+            show_labels=self.show_labels, show_label_text=self.show_label_text)
+        try:
+            self.comparison.open()
+        except Exception as e:
+            self.close_comparison()
+            self.show_error("Error", f"Could not open the comparison: {str(e)}")
+    
+    def create_comparison_window(self, titles):
+        window = tk.Toplevel(self.root)
+        window.title("Compare - " + " | ".join(titles))
+        window.geometry(f"{min(1600, 600 * len(titles))}x800")
+        window.configure(bg=self.bg_color)
+        window.protocol("WM_DELETE_WINDOW", self.close_comparison)
+        self.comparison_window = window
+        
+        toolbar = ttk.Frame(window, padding=(5, 3))
+        toolbar.pack(side=tk.TOP, fill=tk.X)
+        for label, command in (("Zoom In", lambda: self.comparison.zoom(1.25)),
+                               ("Zoom Out", lambda: self.comparison.zoom(0.8)),
+                               ("Fit", lambda: self.comparison.fit()),
+                               ("Toggle Labels", lambda: self.comparison.toggle_labels())):
+            ttk.Button(toolbar, text=label, command=command).pack(side=tk.LEFT, padx=2)
+        
+        frame = ttk.Frame(window)
+        frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        frame.grid_rowconfigure(1, weight=1)
+        
+        canvases = []
+        for column, title in enumerate(titles):
+            frame.grid_columnconfigure(column, weight=1, uniform="panes")
+            ttk.Label(frame, text=title).grid(row=0, column=column)
+            canvas = tk.Canvas(frame, bg=self.canvas_bg, highlightthickness=1,
+                               highlightbackground=self.accent_color)
+            canvas.grid(row=1, column=column, sticky="nsew", padx=2)
+            canvas.bind("<Configure>", lambda e: self.comparison and self.comparison.render())
+            canvas.bind("<MouseWheel>", lambda e: self.comparison.zoom(1.25 if e.delta > 0 else 0.8))
+            canvas.bind("<Button-4>", lambda e: self.comparison.zoom(1.25))
+            canvas.bind("<Button-5>", lambda e: self.comparison.zoom(0.8))
+            canvases.append((canvas, TkCanvas(canvas)))
+        
+        h_scrollbar = ttk.Scrollbar(frame, orient=tk.HORIZONTAL, command=lambda *args: self.comparison.scroll("x", *args))
+        h_scrollbar.grid(row=2, column=0, columnspan=len(titles), sticky="ew")
+        v_scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=lambda *args: self.comparison.scroll("y", *args))
+        v_scrollbar.grid(row=1, column=len(titles), sticky="ns")
+        canvases[0][0].configure(xscrollcommand=h_scrollbar.set, yscrollcommand=v_scrollbar.set)
+        window.update_idletasks()
+        return canvases
+    
+    def close_comparison(self):
+        if self.comparison is not None:
+            self.comparison.close()
+            self.comparison = None
+        if self.comparison_window is not None:
+            self.comparison_window.destroy()
+            self.comparison_window = None
+    
     def toggle_labels(self):
         self.show_labels = not self.show_labels
         self.redraw_labels()
@@ -806,13 +2036,17 @@ Keyboard Shortcuts:
 - Ctrl+Z: Clear labels
 - Escape: Cancel drawing
 - Delete: Delete selected annotation
+- A: Accept suggested femur head circles
+- D: Switch between the pelvis detail view and the overview
+- P: Pipeline mode (auto-advance through steps and images without dialogs)
 
 Mouse Controls:
 - Right-click: Context menu (Move/Edit/Delete)
 - Mouse wheel: Zoom in/out
+- Ctrl+drag: Adjust window (horizontal) and level (vertical)
         """
         
-        messagebox.showinfo("Instructions", instructions)
+        self.show_info("Instructions", instructions)
     
     def show_about(self):
         about_text = """
@@ -826,29 +2060,193 @@ hip dysplasia assessment.
 Developed for veterinary orthopedic research.
         """
         
-        messagebox.showinfo("About", about_text)
+        self.show_info("About", about_text)
+    
+    def show_dataset_statistics(self):
+        if not self.labels:
+            self.show_warning("No Labels", "No labels in the current folder.")
+            return
+        
+        self.show_info("Dataset Statistics", format_statistics(self.angle_stats))
     
     def calculate_hip_angles(self):
+        self.trace("calculate", method="calculate_hip_angles")
         if "rectangle" not in self.current_labels:
-            messagebox.showwarning("Missing Data", "Please draw the pelvis rectangle first.")
+            self.show_warning("Missing Data", "Please draw the pelvis rectangle first.")
             return
         
         if "left_keypoint" not in self.current_labels:
-            messagebox.showwarning("Missing Data", "Please mark the left acetabulum point.")
+            self.show_warning("Missing Data", "Please mark the left acetabulum point.")
             return
         
         if "right_keypoint" not in self.current_labels:
-            messagebox.showwarning("Missing Data", "Please mark the right acetabulum point.")
+            self.show_warning("Missing Data", "Please mark the right acetabulum point.")
             return
         
         if "left_circle" not in self.current_labels:
-            messagebox.showwarning("Missing Data", "Please draw the left femur head circle.")
+            self.show_warning("Missing Data", "Please draw the left femur head circle.")
             return
         
         if "right_circle" not in self.current_labels:
-            messagebox.showwarning("Missing Data", "Please draw the right femur head circle.")
+            self.show_warning("Missing Data", "Please draw the right femur head circle.")
+            return
+        
+        left_norberg_angle, right_norberg_angle, left_femur_angle, right_femur_angle = self.update_hip_angles()
+        file_name = os.path.basename(self.image_files[self.current_image_index])
+        self.save_current_labels()
+        self.step_event("done", "calculate")
+        
+        if self.show_labels:
+            self.redraw_labels()
+        
+        if self.pipeline_mode.get():
+            self.status_text.set(self.describe_hip_angles(file_name))
+            self.remember_session()
+            return
+        
+        self.show_info("Hip Angle Measurements", 
+                          f"Image: {file_name}\n\n"
+                          f"LEFT MEASUREMENTS:\n"
+                          f"Norberg Angle: {left_norberg_angle:.1f}°\n"
+                          f"Joint Angle: {left_femur_angle:.1f}°\n\n"
+                          f"RIGHT MEASUREMENTS:\n"
+                          f"Norberg Angle: {right_norberg_angle:.1f}°\n"
+                          f"Joint Angle: {right_femur_angle:.1f}°\n\n"
+                          f"AVERAGE MEASUREMENTS:\n"
+                          f"Norberg Angle: {(left_norberg_angle + right_norberg_angle)/2:.1f}°\n"
+                          f"Joint Angle: {(left_femur_angle + right_femur_angle)/2:.1f}°")
+        
+        self.remember_session()
+    
+    def toggle_pipeline_mode(self):
+        self.trace("command", method="toggle_pipeline_mode")
+        self.pipeline_mode.set(not self.pipeline_mode.get())
+        self.apply_pipeline_mode()
+    
+    def apply_pipeline_mode(self):
+        if not self.pipeline_mode.get():
+            self.prefetcher.discard()
+            self.status_text.set("Pipeline mode off")
+            return
+        
+        self.status_text.set("Pipeline mode: each step follows the last; finished images are calculated, "
+                             "saved and advanced without dialogs")
+        if self.image_files and self.current_image_index >= 0:
+            self.enter_next_step()
+            self.prefetch_next_image()
+    
+    def enter_next_step(self):
+        step = next_step(self.current_labels)
+        if step is not None:
+            self.untraced(getattr(self, f"draw_{step}_mode"))
+    
+    def step_completed(self):
+        if not self.pipeline_mode.get():
+            return
+        if next_step(self.current_labels) is not None:
+            self.enter_next_step()
+        else:
+            # Let the finished drawing settle before the image changes under it
+            self.root.after_idle(self.finish_pipeline_image, self.current_folder, self.current_image_index)
+    
+    def finish_pipeline_image(self, folder, index):
+        if not self.pipeline_mode.get() or (self.current_folder, self.current_image_index) != (folder, index):
+            return
+        if next_step(self.current_labels) is not None:
             return
         
+        self.update_hip_angles()
+        file_name = self.current_file_name()
+        self.save_current_labels()
+        self.step_event("done", "calculate")
+        self.persist_labels()
+        
+        position = (self.current_folder, self.current_image_index)
+        self.untraced(self.next_image)
+        if (self.current_folder, self.current_image_index) == position:
+            self.status_text.set(self.describe_hip_angles(file_name) + " - no further image to label")
+    
+    def persist_labels(self):
+        self.sync_external_labels()
+        if self.label_conflicts:
+            self.status_text.set(f"{len(self.label_conflicts)} images changed elsewhere; save (Ctrl+S) to resolve")
+            return
+        if not self.dirty_labels:
+            return
+        
+        if (self.label_client is not None or self.use_label_service or
+                not can_write_in_background(self.current_folder, self.labels, self.annotator)):
+            if not self.write_labels():
+                self.status_text.set("Failed to save labels")
+            return
+        
+        names = frozenset(self.dirty_labels)
+        entries = {name: copy.deepcopy(self.labels.get(name)) for name in names}
+        if self.annotator:
+            snapshot = entries
+        else:
+            snapshot = dict(self.labels.items())
+            snapshot.update((name, entry) for name, entry in entries.items() if entry)
+        self.background.submit(("labels", self.current_folder, names), write_snapshot,
+                               self.current_folder, snapshot, self.annotator, names)
+        self.dirty_labels -= names
+        for name, entry in entries.items():
+            if entry:
+                self.disk_labels[name] = entry
+            else:
+                self.disk_labels.pop(name, None)
+        self.start_background_polling()
+    
+    def prefetch_next_image(self):
+        if self.image_filter is not None:
+            index = self.label_index.next_match(self.image_filter, self.current_image_index, 1)
+        else:
+            index = self.neighbour_index(1)
+        if index is not None:
+            self.prefetcher.prefetch(self.image_files[index])
+            self.start_background_polling()
+    
+    def take_prefetched(self, image_path):
+        # Waiting for a decode already under way beats starting a second one
+        while self.prefetcher.waiting_for(image_path):
+            self.handle_background_results(self.background.poll(block=True))
+        return self.prefetcher.take(image_path)
+    
+    def start_background_polling(self):
+        if not self.polling_background:
+            self.polling_background = True
+            self.root.after(POLL_INTERVAL_MS, self.poll_background)
+    
+    def poll_background(self):
+        self.handle_background_results(self.background.poll())
+        if self.background.pending:
+            self.root.after(POLL_INTERVAL_MS, self.poll_background)
+        else:
+            self.polling_background = False
+    
+    def finish_background_work(self):
+        while self.background.pending:
+            self.handle_background_results(self.background.poll(block=True))
+    
+    def handle_background_results(self, results):
+        for key, result, error in results:
+            if key[0] == "prefetch":
+                self.prefetcher.finish(key[1], result)
+            elif key[0] == "gradients":
+                self.pending_gradients.discard(key[1])
+                if error is None:
+                    self.gradient_cache.store(key[1], result)
+            elif error is not None:
+                if key[1] == self.current_folder:
+                    self.dirty_labels |= key[2]
+                self.status_text.set(f"Could not save labels: {str(error)}")
+            elif key[1] == self.current_folder:
+                self.label_watcher.acknowledge()
+                if self.project is not None:
+                    self.project.update_folder(self.current_folder, self.image_files, self.label_index)
+                    self.save_project()
+    
+    def update_hip_angles(self):
         left_keypoint = self.current_labels["left_keypoint"]
         right_keypoint = self.current_labels["right_keypoint"]
         left_femur = self.current_labels["left_circle"]
@@ -880,29 +2278,52 @@ Developed for veterinary orthopedic research.
         self.current_labels["right_angle"] = right_norberg_angle
         self.current_labels["left_femur_angle"] = left_femur_angle
         self.current_labels["right_femur_angle"] = right_femur_angle
-        
-        file_name = os.path.basename(self.image_files[self.current_image_index])
-        self.labels[file_name] = self.current_labels
-        
-        if self.show_labels:
-            self.redraw_labels()
-        
-        messagebox.showinfo("Hip Angle Measurements", 
-                          f"Image: {file_name}\n\n"
-                          f"LEFT MEASUREMENTS:\n"
-                          f"Norberg Angle: {left_norberg_angle:.1f}°\n"
-                          f"Joint Angle: {left_femur_angle:.1f}°\n\n"
-                          f"RIGHT MEASUREMENTS:\n"
-                          f"Norberg Angle: {right_norberg_angle:.1f}°\n"
-                          f"Joint Angle: {right_femur_angle:.1f}°\n\n"
-                          f"AVERAGE MEASUREMENTS:\n"
-                          f"Norberg Angle: {(left_norberg_angle + right_norberg_angle)/2:.1f}°\n"
-                          f"Joint Angle: {(left_femur_angle + right_femur_angle)/2:.1f}°")
-        
-        save_session_info(self.current_folder, self.current_image_index)
+        return left_norberg_angle, right_norberg_angle, left_femur_angle, right_femur_angle
+    
+    def describe_hip_angles(self, file_name):
+        labels = self.current_labels
+        return (f"{file_name}: Norberg angle L {labels['left_angle']:.1f}° / R {labels['right_angle']:.1f}°, "
+                f"joint angle L {labels['left_femur_angle']:.1f}° / R {labels['right_femur_angle']:.1f}°")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Norberg-Olsen Labeling Tool")
+    parser.add_argument("--record", metavar="TRACE", help="Record the session as an event trace (JSON lines)")
+    parser.add_argument("--annotator", default=os.environ.get("NORBERG_OLSEN_ANNOTATOR"),
+                        help="Save labels to a per-annotator file (norberg_olsen_labels.<name>.jsonl)")
+    parser.add_argument("--throughput-log", metavar="PATH", default=None,
+                        help="Append per-step timing events to this log "
+                             "(default: ~/.norberg_olsen_throughput/<annotator>.log)")
+    parser.add_argument("--no-throughput-log", action="store_true", help="Do not record throughput timing events")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Start in pipeline mode: auto-advance through steps and images without dialogs")
+    parser.add_argument("--label-service", action="store_true",
+                        help="Share the folder's labels with other instances through a local label service")
+    parser.add_argument("--memory-budget", type=float, metavar="MB",
+                        default=float(os.environ.get("NORBERG_OLSEN_MEMORY_MB", DEFAULT_LIMIT_MB)),
+                        help="Memory cap for decoded images, views and caches")
+    args = parser.parse_args()
+    if args.label_service and args.annotator:
+        parser.error("--label-service and --annotator cannot be combined")
+    memory_budget.set_limit(args.memory_budget * MB)
+    
     root = tk.Tk()
-    app = NorbergOlsenLabelingApp(root)
+    app = NorbergOlsenLabelingApp(root, args.annotator, args.label_service)
+    if not args.no_throughput_log:
+        app.start_throughput_log(args.throughput_log or default_log_path(args.annotator))
+    if args.pipeline:
+        app.pipeline_mode.set(True)
+        app.apply_pipeline_mode()
+    if args.record:
+        app.start_recording(args.record)
     root.mainloop()
+    app.stop_recording()
+    app.stop_throughput_log()
+    if app.project is not None:
+        app.project.save()
+    app.circle_proposals.shutdown()
+    app.ingest_service.shutdown()
+    app.hash_service.shutdown()
+    app.finish_background_work()
+    app.background.close()
+    app.close_label_service()
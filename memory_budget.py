@@ -0,0 +1,130 @@
+import mmap
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+MB = 1024 * 1024
+DEFAULT_LIMIT_MB = 1536
+
+PRIORITY_PREFETCH = 0
+PRIORITY_CACHE = 1
+PRIORITY_RECENT = 2
+PRIORITY_PINNED = 3
+
+BYTES_PER_BAND = {"I;16": 2, "I;16L": 2, "I;16B": 2, "I;16N": 2, "I": 4, "F": 4}
+
+
+def resident_bytes(array):
+    if array is None:
+        return 0
+    base = array
+    while isinstance(base, np.ndarray) and base.base is not None:
+        base = base.base
+    if isinstance(base, mmap.mmap):
+        # Mapped file pages belong to the OS page cache and can be dropped at any time
+        return 0
+    return int(array.nbytes)
+
+
+def image_bytes(image):
+    if image is None:
+        return 0
+    if isinstance(image, np.ndarray):
+        return resident_bytes(image)
+    return image.width * image.height * len(image.getbands()) * BYTES_PER_BAND.get(image.mode, 1)
+
+
+def photo_bytes(width, height):
+    # Tk keeps photo images as 32-bit RGBA blocks regardless of the source mode
+    return width * height * 4
+
+
+def format_bytes(size):
+    if size >= 1024 * MB:
+        return f"{size / (1024 * MB):.1f} GB"
+    return f"{size / MB:.0f} MB"
+
+
+class BudgetEntry:
+    def __init__(self, key, size, category, priority, release):
+        self.key = key
+        self.size = size
+        self.category = category
+        self.priority = priority
+        self.release = release
+
+
+class MemoryBudget:
+    def __init__(self, limit=DEFAULT_LIMIT_MB * MB):
+        self.limit = limit
+        self.entries = OrderedDict()
+        self.total = 0
+        self.evictions = 0
+        self.on_change = None
+        self.lock = threading.RLock()
+    
+    def set_limit(self, limit):
+        with self.lock:
+            self.limit = int(limit)
+            self.enforce()
+        self.changed()
+    
+    def register(self, key, size, category, priority=PRIORITY_CACHE, release=None):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total -= old.size
+            self.entries[key] = BudgetEntry(key, int(size), category, priority, release)
+            self.total += int(size)
+            self.enforce()
+        self.changed()
+    
+    def touch(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+    
+    def unregister(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return
+            self.total -= entry.size
+        self.changed()
+    
+    def enforce(self):
+        if self.total <= self.limit:
+            return
+        
+        # Lowest priority first, least recently used first within a priority
+        candidates = sorted((entry for entry in self.entries.values() if entry.priority < PRIORITY_PINNED),
+                            key=lambda entry: entry.priority)
+        for entry in candidates:
+            if self.total <= self.limit:
+                break
+            # An earlier release callback may already have unregistered this entry
+            if self.entries.get(entry.key) is not entry:
+                continue
+            del self.entries[entry.key]
+            self.total -= entry.size
+            self.evictions += 1
+            if entry.release is not None:
+                entry.release()
+    
+    def usage_by_category(self):
+        usage = {}
+        with self.lock:
+            for entry in self.entries.values():
+                usage[entry.category] = usage.get(entry.category, 0) + entry.size
+        return usage
+    
+    def describe(self):
+        return f"Memory: {format_bytes(self.total)} / {format_bytes(self.limit)}"
+    
+    def changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+
+memory_budget = MemoryBudget()
@@ -0,0 +1,244 @@
+import os
+import json
+import math
+import hashlib
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import ImageDraw, ImageFont
+
+from canvas_backend import CanvasBackend
+from drawing import LabelRenderer
+from display_adjustments import WindowLevel
+from file_manager import read_labels, load_images_from_folder
+from image_loader import load_image
+
+MANIFEST_NAME = "qc_manifest.json"
+
+
+class ImageCanvas(CanvasBackend):
+    def __init__(self, image):
+        self.image = image
+        self.draw = ImageDraw.Draw(image)
+        self.fonts = {}
+    
+    def get_font(self, font):
+        if font is None:
+            font = ("Segoe UI", 9)
+        if font in self.fonts:
+            return self.fonts[font]
+        
+        size = max(1, int(round(font[1] * 4 / 3)))
+        bold = "bold" in font[2:]
+        try:
+            loaded = ImageFont.truetype("DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf", size)
+        except OSError:
+            loaded = ImageFont.load_default(size=size)
+        self.fonts[font] = loaded
+        return loaded
+    
+    def dashed_line(self, x1, y1, x2, y2, fill, width, dash):
+        length = math.hypot(x2 - x1, y2 - y1)
+        if length == 0:
+            return
+        
+        ux, uy = (x2 - x1) / length, (y2 - y1) / length
+        position = 0.0
+        index = 0
+        while position < length:
+            segment = dash[index % len(dash)]
+            end = min(position + segment, length)
+            if index % 2 == 0:
+                self.draw.line([(x1 + ux * position, y1 + uy * position),
+                                (x1 + ux * end, y1 + uy * end)], fill=fill, width=width)
+            position = end
+            index += 1
+    
+    def dashed_oval(self, x1, y1, x2, y2, outline, width, dash):
+        radius = max((x2 - x1) / 2, (y2 - y1) / 2)
+        circumference = 2 * math.pi * radius
+        if circumference == 0:
+            return
+        
+        position = 0.0
+        index = 0
+        while position < circumference:
+            segment = dash[index % len(dash)]
+            end = min(position + segment, circumference)
+            if index % 2 == 0:
+                self.draw.arc([x1, y1, x2, y2], position / circumference * 360,
+                              end / circumference * 360, fill=outline, width=width)
+            position = end
+            index += 1
+    
+    def create_rectangle(self, x1, y1, x2, y2, outline=None, fill=None, width=1, dash=None, tags=()):
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        if dash:
+            for a, b, c, d in ((x1, y1, x2, y1), (x2, y1, x2, y2), (x2, y2, x1, y2), (x1, y2, x1, y1)):
+                self.dashed_line(a, b, c, d, outline, width, dash)
+            return None
+        self.draw.rectangle([x1, y1, x2, y2], outline=outline, fill=fill, width=width)
+        return None
+    
+    def create_oval(self, x1, y1, x2, y2, outline=None, fill=None, width=1, dash=None, tags=()):
+        if dash:
+            self.dashed_oval(x1, y1, x2, y2, outline, width, dash)
+            return None
+        self.draw.ellipse([x1, y1, x2, y2], outline=outline, fill=fill, width=width)
+        return None
+    
+    def create_line(self, x1, y1, x2, y2, fill=None, width=1, dash=None, tags=()):
+        if dash:
+            self.dashed_line(x1, y1, x2, y2, fill, width, dash)
+            return None
+        self.draw.line([(x1, y1), (x2, y2)], fill=fill, width=width)
+        return None
+    
+    def create_text(self, x, y, text="", fill=None, font=None, tags=()):
+        self.draw.text((x, y), text, fill=fill, font=self.get_font(font), anchor="mm")
+        return None
+    
+    def delete(self, *tags):
+        pass
+
+
+def render_overlay(image_path, labels, scale=1.0, show_label_text=True):
+    loaded_image = load_image(image_path)
+    try:
+        image = loaded_image.render(loaded_image.source.read_full(scale), WindowLevel())
+        image = image.convert("RGB")
+    finally:
+        loaded_image.source.close()
+    
+    renderer = LabelRenderer(ImageCanvas(image), scale, True, show_label_text)
+    renderer.redraw_all(labels)
+    return image
+
+
+def label_digest(labels):
+    return hashlib.sha1(json.dumps(labels, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def source_signature(image_path):
+    stat = os.stat(image_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def render_task(task):
+    image_path, labels, out_path, scale, show_label_text, quality = task
+    image = render_overlay(image_path, labels, scale, show_label_text)
+    if out_path.lower().endswith((".jpg", ".jpeg")):
+        image.save(out_path, quality=quality)
+    else:
+        image.save(out_path)
+    return os.path.basename(image_path)
+
+
+def load_manifest(out_dir):
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+
+def save_manifest(out_dir, manifest):
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, manifest_path)
+
+
+def output_name(file_name, image_format, stem_counts):
+    stem = os.path.splitext(file_name)[0]
+    # x.png and x.tif would otherwise render to the same overlay
+    if stem_counts[stem.lower()] > 1:
+        stem = file_name
+    return f"{stem}.{image_format}"
+
+
+def render_folder(folder_path, out_dir, scale=0.25, image_format="png", workers=None,
+                  include_unlabelled=False, show_label_text=True, quality=90):
+    os.makedirs(out_dir, exist_ok=True)
+    labels = read_labels(folder_path)
+    manifest = load_manifest(out_dir)
+    
+    tasks = []
+    entries = {}
+    skipped = 0
+    image_paths = load_images_from_folder(folder_path)
+    stem_counts = Counter(os.path.splitext(os.path.basename(path))[0].lower() for path in image_paths)
+    for image_path in image_paths:
+        file_name = os.path.basename(image_path)
+        image_labels = labels.get(file_name, {})
+        if not image_labels and not include_unlabelled:
+            continue
+        
+        out_name = output_name(file_name, image_format, stem_counts)
+        out_path = os.path.join(out_dir, out_name)
+        entry = {
+            "source": source_signature(image_path),
+            "labels": label_digest(image_labels),
+            "scale": scale,
+            "text": show_label_text,
+            "output": out_name
+        }
+        
+        if manifest.get(file_name) == entry and os.path.exists(out_path):
+            skipped += 1
+            continue
+        
+        entries[file_name] = entry
+        tasks.append((image_path, image_labels, out_path, scale, show_label_text, quality))
+    
+    rendered = 0
+    failed = []
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [(task, executor.submit(render_task, task)) for task in tasks]
+            for task, future in futures:
+                file_name = os.path.basename(task[0])
+                try:
+                    future.result()
+                except Exception as e:
+                    failed.append((file_name, str(e)))
+                    manifest.pop(file_name, None)
+                    continue
+                manifest[file_name] = entries[file_name]
+                rendered += 1
+                if rendered % 100 == 0:
+                    save_manifest(out_dir, manifest)
+    
+    save_manifest(out_dir, manifest)
+    return rendered, skipped, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render annotation overlays for QC review.")
+    parser.add_argument("folder", help="Folder containing images and norberg_olsen_labels.json")
+    parser.add_argument("--out", required=True, help="Output folder for rendered overlays")
+    parser.add_argument("--scale", type=float, default=0.25, help="Downscale factor (default: 0.25)")
+    parser.add_argument("--format", choices=["png", "jpg"], default="png", help="Output format")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--all", action="store_true", help="Also render images without labels")
+    parser.add_argument("--no-text", action="store_true", help="Do not draw label text")
+    args = parser.parse_args()
+    
+    rendered, skipped, failed = render_folder(
+        args.folder, args.out, scale=args.scale, image_format=args.format,
+        workers=args.workers, include_unlabelled=args.all, show_label_text=not args.no_text
+    )
+    
+    print(f"Rendered {rendered} overlays, skipped {skipped} unchanged.")
+    for file_name, error in failed:
+        print(f"Failed: {file_name}: {error}")
+
+
+if __name__ == "__main__":
+    main()
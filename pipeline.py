@@ -0,0 +1,131 @@
+import queue
+import threading
+
+from file_manager import labels_path, write_folder_labels
+from image_loader import load_image
+from image_source import PILImageSource
+from label_binary import BINARY_EXTENSION
+from label_store import LazyLabels
+from memory_budget import memory_budget, PRIORITY_PREFETCH
+
+PIPELINE_STEPS = ("rectangle", "left_keypoint", "right_keypoint", "left_circle", "right_circle")
+POLL_INTERVAL_MS = 100
+
+
+def next_step(labels):
+    for step in PIPELINE_STEPS:
+        if step not in labels:
+            return step
+    return None
+
+
+class BackgroundWorker:
+    def __init__(self, name):
+        self.name = name
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = None
+        self.pending = 0
+    
+    def submit(self, key, function, *args):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+            self.thread.start()
+        self.pending += 1
+        self.jobs.put((key, function, args))
+    
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            key, function, args = job
+            try:
+                self.results.put((key, function(*args), None))
+            except Exception as e:
+                self.results.put((key, None, e))
+    
+    def poll(self, block=False):
+        finished = []
+        while self.pending:
+            try:
+                finished.append(self.results.get(block=block and not finished))
+            except queue.Empty:
+                break
+            self.pending -= 1
+        return finished
+    
+    def close(self):
+        if self.thread is not None:
+            self.jobs.put(None)
+            self.thread.join()
+            self.thread = None
+
+
+def prefetch_image(image_path):
+    loaded_image = load_image(image_path)
+    if isinstance(loaded_image.source, PILImageSource):
+        # Pay for the decode here rather than in the first render on the UI thread
+        loaded_image.source.image.load()
+    return loaded_image
+
+
+class ImagePrefetcher:
+    def __init__(self, worker, budget=memory_budget):
+        self.worker = worker
+        self.budget = budget
+        self.path = None
+        self.loaded_image = None
+        self.requested = set()
+    
+    def prefetch(self, image_path):
+        if image_path == self.path or image_path in self.requested:
+            return
+        self.discard()
+        self.requested.add(image_path)
+        self.worker.submit(("prefetch", image_path), prefetch_image, image_path)
+    
+    def finish(self, image_path, loaded_image):
+        self.requested.discard(image_path)
+        if loaded_image is None:
+            return
+        if self.requested:
+            # Superseded by a later request before it finished
+            loaded_image.source.close()
+            return
+        self.discard()
+        self.path = image_path
+        self.loaded_image = loaded_image
+        self.budget.register("prefetched_image", loaded_image.memory_bytes(), "prefetch", PRIORITY_PREFETCH,
+                             release=self.discard)
+    
+    def waiting_for(self, image_path):
+        return image_path in self.requested
+    
+    def take(self, image_path):
+        if image_path != self.path:
+            return None
+        loaded_image = self.loaded_image
+        self.budget.unregister("prefetched_image")
+        self.path = None
+        self.loaded_image = None
+        return loaded_image
+    
+    def discard(self):
+        if self.loaded_image is not None:
+            self.budget.unregister("prefetched_image")
+            self.loaded_image.source.close()
+        self.path = None
+        self.loaded_image = None
+
+
+def can_write_in_background(folder_path, labels, annotator):
+    # Lazy and binary stores read through open file handles the UI thread also uses
+    if annotator:
+        return True
+    return not isinstance(labels, LazyLabels) and not labels_path(folder_path).endswith(BINARY_EXTENSION)
+
+
+def write_snapshot(folder_path, labels, annotator, changed):
+    write_folder_labels(folder_path, labels, annotator, changed)
+    return changed
@@ -0,0 +1,216 @@
+import os
+import json
+import math
+
+import numpy as np
+
+from file_manager import labels_path, list_shards, read_labels, load_images_from_folder
+from label_index import LabelIndex, ALL_FIELDS
+
+PROJECT_VERSION = 1
+PROJECT_EXTENSION = ".nproj"
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def labels_signature(folder_path):
+    try:
+        shards = list_shards(folder_path)
+    except OSError:
+        shards = {}
+    # Saves append to the annotator shards, which leaves the folder and the base labels file untouched
+    return [file_signature(labels_path(folder_path))] + [
+        [annotator, file_signature(path)] for annotator, path in shards.items()
+    ]
+
+
+def to_optional(values):
+    return [None if math.isnan(value) else value for value in values.tolist()]
+
+
+def from_optional(values):
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+class ProjectFolder:
+    def __init__(self, path, images=None, masks=None, left=None, right=None,
+                 listing_signature=None, labels_signature=None):
+        self.path = path
+        self.images = images or []
+        self.masks = masks or [0] * len(self.images)
+        self.left = left or [None] * len(self.images)
+        self.right = right or [None] * len(self.images)
+        self.listing_signature = listing_signature
+        self.labels_signature = labels_signature
+        self.cached_index = None
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["path"], data.get("images"), data.get("masks"), data.get("left"),
+                   data.get("right"), data.get("listing"), data.get("labels"))
+    
+    def to_dict(self):
+        return {
+            "path": self.path,
+            "images": self.images,
+            "masks": self.masks,
+            "left": self.left,
+            "right": self.right,
+            "listing": self.listing_signature,
+            "labels": self.labels_signature
+        }
+    
+    def __len__(self):
+        return len(self.images)
+    
+    def is_stale(self):
+        return (file_signature(self.path) != self.listing_signature or
+                labels_signature(self.path) != self.labels_signature)
+    
+    def scan(self, annotator=None):
+        image_files = load_images_from_folder(self.path)
+        try:
+            labels = read_labels(self.path, annotator)
+        except (OSError, ValueError):
+            labels = {}
+        index = LabelIndex()
+        index.rebuild(image_files, labels)
+        self.update(image_files, index)
+    
+    def update(self, image_files, index):
+        left, right = index.angle_columns()
+        self.images = [os.path.basename(path) for path in image_files]
+        self.masks = index.masks.tolist()
+        self.left = to_optional(left)
+        self.right = to_optional(right)
+        self.listing_signature = file_signature(self.path)
+        self.labels_signature = labels_signature(self.path)
+        self.cached_index = None
+    
+    def index(self):
+        if self.cached_index is None:
+            self.cached_index = LabelIndex()
+            self.cached_index.load_arrays(self.images, self.masks,
+                                          from_optional(self.left), from_optional(self.right))
+        return self.cached_index
+    
+    def complete_count(self):
+        return sum(1 for mask in self.masks if mask == ALL_FIELDS)
+
+
+class Project:
+    def __init__(self, path, annotator=None):
+        self.path = path
+        self.annotator = annotator
+        self.folders = []
+        self.positions = {}
+        self.last_folder = None
+        self.last_image_index = 0
+    
+    @classmethod
+    def load(cls, path, annotator=None):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        
+        project = cls(path, annotator)
+        for folder_data in data.get("folders", []):
+            project.append(ProjectFolder.from_dict(folder_data))
+        project.last_folder = data.get("last_folder")
+        project.last_image_index = data.get("last_image_index", 0)
+        return project
+    
+    def save(self):
+        data = {
+            "version": PROJECT_VERSION,
+            "folders": [folder.to_dict() for folder in self.folders],
+            "last_folder": self.last_folder,
+            "last_image_index": self.last_image_index
+        }
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
+    
+    def key(self, folder_path):
+        return os.path.normcase(os.path.abspath(folder_path))
+    
+    def append(self, folder):
+        self.positions[self.key(folder.path)] = len(self.folders)
+        self.folders.append(folder)
+    
+    def folder_position(self, folder_path):
+        if not folder_path:
+            return None
+        return self.positions.get(self.key(folder_path))
+    
+    def add_folder(self, folder_path):
+        if self.folder_position(folder_path) is not None:
+            return False
+        folder = ProjectFolder(os.path.abspath(folder_path))
+        folder.scan(self.annotator)
+        if not folder.images:
+            return False
+        self.append(folder)
+        return True
+    
+    def add_tree(self, root_path):
+        added = 0
+        for dir_path, dir_names, _ in os.walk(root_path):
+            dir_names.sort()
+            if self.add_folder(dir_path):
+                added += 1
+        return added
+    
+    def refresh_stale(self):
+        refreshed = 0
+        for folder in self.folders:
+            if folder.is_stale():
+                folder.scan(self.annotator)
+                refreshed += 1
+        return refreshed
+    
+    def update_folder(self, folder_path, image_files, index):
+        position = self.folder_position(folder_path)
+        if position is None:
+            return
+        self.folders[position].update(image_files, index)
+    
+    def image_count(self):
+        return sum(len(folder) for folder in self.folders)
+    
+    def first_folder(self):
+        for folder in self.folders:
+            if len(folder):
+                return folder
+        return None
+    
+    def neighbour_folder(self, folder_path, step):
+        position = self.folder_position(folder_path)
+        if position is None:
+            return None
+        position += step
+        while 0 <= position < len(self.folders):
+            if len(self.folders[position]):
+                return self.folders[position]
+            position += step
+        return None
+    
+    def find_match(self, query, folder_path, step):
+        position = self.folder_position(folder_path)
+        if position is None:
+            return None
+        position += step
+        while 0 <= position < len(self.folders):
+            folder = self.folders[position]
+            start = -1 if step > 0 else len(folder)
+            match = folder.index().next_match(query, start, step)
+            if match is not None:
+                return folder, match
+            position += step
+        return None
@@ -0,0 +1,172 @@
+import os
+import json
+import struct
+import hashlib
+
+import numpy as np
+from PIL import Image
+
+from image_source import ImageSource, MemmapImageSource, RAW_LAYOUTS, clamp_box, region_size
+
+PYRAMID_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".norberg_olsen_cache", "pyramids")
+PYRAMID_EXTENSION = ".npyr"
+MAGIC = b"NPYR"
+FORMAT_VERSION = 1
+PREFIX = struct.Struct("<4sIQ")
+DATA_ALIGNMENT = 4096
+TILE_SIZE = 512
+MIN_LEVEL_SIZE = 512
+CACHEABLE_MODES = ("L", "I;16", "RGB", "RGBA")
+
+
+def cache_path(image_path):
+    key = hashlib.sha1(os.path.abspath(image_path).encode("utf-8")).hexdigest()
+    return os.path.join(PYRAMID_CACHE_DIR, key[:2], key + PYRAMID_EXTENSION)
+
+
+def source_signature(image_path):
+    stat = os.stat(image_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def data_start(header_size):
+    return -(-(PREFIX.size + header_size) // DATA_ALIGNMENT) * DATA_ALIGNMENT
+
+
+def downsample(array):
+    height, width = array.shape[:2]
+    if height % 2 or width % 2:
+        padding = [(0, height % 2), (0, width % 2)] + [(0, 0)] * (array.ndim - 2)
+        array = np.pad(array, padding, mode="edge")
+    total = (array[0::2, 0::2].astype(np.uint32) + array[1::2, 0::2] +
+             array[0::2, 1::2] + array[1::2, 1::2])
+    return ((total + 2) // 4).astype(array.dtype)
+
+
+def build_levels(array, min_level_size=MIN_LEVEL_SIZE):
+    levels = [array]
+    while max(levels[-1].shape[:2]) > min_level_size:
+        levels.append(downsample(levels[-1]))
+    return levels
+
+
+def tile_boxes(width, height, tile_size=TILE_SIZE):
+    for y in range(0, height, tile_size):
+        for x in range(0, width, tile_size):
+            yield (x, y, min(x + tile_size, width), min(y + tile_size, height))
+
+
+def write_pyramid(out_path, image_path, signature, mode, levels, tone_map=None, tile_size=TILE_SIZE):
+    header = {
+        "source": os.path.abspath(image_path),
+        "signature": signature,
+        "mode": mode,
+        "width": levels[0].shape[1],
+        "height": levels[0].shape[0],
+        "tone_map": list(tone_map) if tone_map is not None else None,
+        "levels": []
+    }
+    offset = 0
+    for level in levels:
+        height, width = level.shape[:2]
+        pixel_bytes = level.itemsize * (level.shape[2] if level.ndim == 3 else 1)
+        tiles = []
+        for box in tile_boxes(width, height, tile_size):
+            tiles.append(list(box) + [offset])
+            offset += (box[2] - box[0]) * (box[3] - box[1]) * pixel_bytes
+        header["levels"].append({"width": width, "height": height, "tiles": tiles})
+    
+    raw_header = json.dumps(header).encode("utf-8")
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    temp_path = out_path + f".{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, FORMAT_VERSION, len(raw_header)))
+        f.write(raw_header)
+        f.write(b"\0" * (data_start(len(raw_header)) - PREFIX.size - len(raw_header)))
+        for level in levels:
+            height, width = level.shape[:2]
+            for x1, y1, x2, y2 in tile_boxes(width, height, tile_size):
+                f.write(np.ascontiguousarray(level[y1:y2, x1:x2]).tobytes())
+    os.replace(temp_path, out_path)
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        magic, version, header_size = PREFIX.unpack(f.read(PREFIX.size))
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} pyramid cache file")
+        return json.loads(f.read(header_size)), data_start(header_size)
+
+
+class PyramidImageSource(ImageSource):
+    def __init__(self, path, header, start):
+        super().__init__(header["width"], header["height"], header["mode"])
+        self.path = path
+        self.tone_map = tuple(header["tone_map"]) if header["tone_map"] else None
+        
+        dtype, channels, mode = RAW_LAYOUTS[header["mode"]]
+        itemsize = np.dtype(dtype).itemsize
+        self.levels = []
+        for level in header["levels"]:
+            tiles = [{
+                "box": (x1, y1, x2, y2),
+                "offset": start + offset,
+                "dtype": dtype,
+                "channels": channels,
+                "mode": mode,
+                "stride": (x2 - x1) * channels * itemsize,
+                "orientation": 1,
+                "reverse_channels": False,
+            } for x1, y1, x2, y2, offset in level["tiles"]]
+            self.levels.append(MemmapImageSource(path, level["width"], level["height"], tiles))
+    
+    def level_for(self, scale):
+        chosen = 0
+        for i, level in enumerate(self.levels):
+            if level.width >= self.width * scale:
+                chosen = i
+        return chosen
+    
+    def read_region(self, box, scale):
+        level = self.levels[self.level_for(scale)]
+        if level is self.levels[0]:
+            return level.read_region(box, scale)
+        
+        box = clamp_box(box, self.width, self.height)
+        fx = level.width / float(self.width)
+        fy = level.height / float(self.height)
+        x1, y1, x2, y2 = box
+        region = level.read_region((x1 * fx, y1 * fy, x2 * fx, y2 * fy), scale / fx)
+        
+        size = region_size(box, scale)
+        if region.size != size:
+            region = region.resize(size, Image.Resampling.BILINEAR)
+        return region
+    
+    def as_array(self):
+        return self.levels[0].as_array()
+    
+    def close(self):
+        for level in self.levels:
+            level.close()
+
+
+def is_cached(image_path):
+    try:
+        header, _ = read_header(cache_path(image_path))
+        return header["signature"] == source_signature(image_path)
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def open_cached_pyramid(image_path):
+    path = cache_path(image_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        header, start = read_header(path)
+        if header["signature"] != source_signature(image_path):
+            return None
+        return PyramidImageSource(path, header, start)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
@@ -0,0 +1,136 @@
+import os
+import math
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from image_source import ImageSource, REDUCIBLE_MODES, clamp_box, region_size
+from memory_budget import memory_budget, resident_bytes, PRIORITY_CACHE
+from pyramid_cache import build_levels
+
+ROI_PADDING = 0.1
+ROI_MIN_LEVEL_SIZE = 256
+MAX_ROI_ENTRIES = 16
+
+
+def roi_box(rectangle, width, height, padding=ROI_PADDING):
+    x1, x2 = sorted((rectangle["x1"], rectangle["x2"]))
+    y1, y2 = sorted((rectangle["y1"], rectangle["y2"]))
+    pad_x = (x2 - x1) * padding
+    pad_y = (y2 - y1) * padding
+    return clamp_box((x1 - pad_x, y1 - pad_y, x2 + pad_x, y2 + pad_y), width, height)
+
+
+def contains(outer, inner):
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+class PelvisRoi:
+    def __init__(self, key, box, levels):
+        self.key = key
+        self.box = box
+        self.levels = levels
+    
+    def nbytes(self):
+        return sum(resident_bytes(level) for level in self.levels or ())
+    
+    def release(self):
+        self.levels = None
+    
+    def level_for(self, scale):
+        full_width = self.box[2] - self.box[0]
+        chosen = 0
+        for i, level in enumerate(self.levels):
+            if level.shape[1] >= full_width * scale:
+                chosen = i
+        return self.levels[chosen]
+    
+    def read_region(self, box, scale):
+        level = self.level_for(scale)
+        rx1, ry1, rx2, ry2 = self.box
+        fx = level.shape[1] / float(rx2 - rx1)
+        fy = level.shape[0] / float(ry2 - ry1)
+        x1, y1, x2, y2 = box
+        lx1 = int(math.floor((x1 - rx1) * fx))
+        ly1 = int(math.floor((y1 - ry1) * fy))
+        lx2 = max(min(int(math.ceil((x2 - rx1) * fx)), level.shape[1]), lx1 + 1)
+        ly2 = max(min(int(math.ceil((y2 - ry1) * fy)), level.shape[0]), ly1 + 1)
+        region = Image.fromarray(level[ly1:ly2, lx1:lx2])
+        
+        size = region_size(box, scale)
+        if region.size == size:
+            return region
+        if size[0] > region.width:
+            # Magnified detail views resample only the few ROI pixels on screen; bilinear is plenty there
+            return region.resize(size, Image.Resampling.BILINEAR)
+        if region.mode in REDUCIBLE_MODES:
+            return region.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        return region.resize(size, Image.Resampling.LANCZOS)
+
+
+class RoiImageSource(ImageSource):
+    def __init__(self, base, roi):
+        super().__init__(base.width, base.height, base.mode, base.image)
+        self.base = base
+        self.roi = roi
+    
+    def read_region(self, box, scale):
+        box = clamp_box(box, self.width, self.height)
+        if self.roi.levels is not None and contains(self.roi.box, box):
+            memory_budget.touch(self.roi.key)
+            return self.roi.read_region(box, scale)
+        return self.base.read_region(box, scale)
+    
+    def fit_region(self, box, visible):
+        if self.roi.levels is None or not contains(self.roi.box, visible):
+            return box
+        rx1, ry1, rx2, ry2 = self.roi.box
+        return (max(box[0], rx1), max(box[1], ry1), min(box[2], rx2), min(box[3], ry2))
+    
+    def as_array(self):
+        return self.base.as_array()
+    
+    def close(self):
+        self.base.close()
+
+
+class RoiCache:
+    def __init__(self, max_entries=MAX_ROI_ENTRIES, budget=memory_budget):
+        self.max_entries = max_entries
+        self.budget = budget
+        self.entries = OrderedDict()
+    
+    def key(self, image_path, box):
+        try:
+            mtime = os.stat(image_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        return ("roi", os.path.abspath(image_path), mtime, box)
+    
+    def build(self, image_path, source, rectangle):
+        box = roi_box(rectangle, source.width, source.height)
+        if box[2] - box[0] < 2 or box[3] - box[1] < 2:
+            return None
+        
+        key = self.key(image_path, box)
+        roi = self.entries.get(key)
+        if roi is not None:
+            self.entries.move_to_end(key)
+            self.budget.touch(key)
+            return roi
+        
+        crop = np.ascontiguousarray(np.asarray(source.read_region(box, 1.0)))
+        roi = PelvisRoi(key, box, build_levels(crop, ROI_MIN_LEVEL_SIZE))
+        self.entries[key] = roi
+        while len(self.entries) > self.max_entries:
+            old_key, old = self.entries.popitem(last=False)
+            self.budget.unregister(old_key)
+            old.release()
+        self.budget.register(key, roi.nbytes(), "roi", PRIORITY_CACHE, release=lambda: self.discard(key))
+        return roi
+    
+    def discard(self, key):
+        roi = self.entries.pop(key, None)
+        if roi is not None:
+            roi.release()
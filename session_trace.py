@@ -0,0 +1,185 @@
+import json
+import time
+import argparse
+
+
+class SessionRecorder:
+    def __init__(self, trace_path):
+        self.trace_path = trace_path
+        self.file = open(trace_path, 'a', buffering=1)
+        self.start = time.perf_counter()
+    
+    def write_header(self, folder, image_index, zoom_factor, pipeline=False):
+        self.record("session", folder=folder, image_index=image_index, zoom=zoom_factor,
+                    pipeline=pipeline, started=time.time())
+    
+    def record(self, event_type, **data):
+        entry = {"t": round(time.perf_counter() - self.start, 4), "type": event_type}
+        entry.update(data)
+        self.file.write(json.dumps(entry) + "\n")
+    
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class SyntheticEvent:
+    def __init__(self, x=0, y=0, num=0, delta=0):
+        self.x = x
+        self.y = y
+        self.x_root = x
+        self.y_root = y
+        self.num = num
+        self.delta = delta
+
+
+def load_trace(trace_path):
+    events = []
+    with open(trace_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                events.append(json.loads(line))
+    return events
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class SessionPlayer:
+    def __init__(self, app, folder_override=None):
+        self.app = app
+        self.folder_override = folder_override
+        self.latencies = {}
+        self.slowest = []
+    
+    def canvas_event(self, entry):
+        canvas = self.app.canvas
+        return SyntheticEvent(entry["x"] - canvas.canvasx(0), entry["y"] - canvas.canvasy(0))
+    
+    def dispatch(self, entry):
+        event_type = entry["type"]
+        app = self.app
+        
+        if event_type == "session":
+            folder = self.folder_override or entry.get("folder")
+            if entry.get("zoom"):
+                app.zoom_factor = entry["zoom"]
+            app.pipeline_mode.set(bool(entry.get("pipeline")))
+            if folder:
+                app.load_folder(folder, entry.get("image_index", 0))
+        elif event_type == "open_folder":
+            app.load_folder(self.folder_override or entry["folder"])
+        elif event_type in ("click", "drag", "release"):
+            app.handle_mouse(event_type, self.canvas_event(entry))
+        elif event_type == "right_click":
+            app.on_right_click(self.canvas_event(entry))
+        else:
+            getattr(app, entry["method"])(*entry.get("args", []))
+    
+    def replay(self, events, keep_slowest=10):
+        for entry in events:
+            start = time.perf_counter()
+            self.dispatch(entry)
+            self.app.flush()
+            elapsed = time.perf_counter() - start
+            
+            self.latencies.setdefault(entry["type"], []).append(elapsed)
+            self.slowest.append((elapsed, entry))
+            if len(self.slowest) > keep_slowest * 4:
+                self.slowest.sort(key=lambda item: item[0], reverse=True)
+                del self.slowest[keep_slowest:]
+        
+        self.slowest.sort(key=lambda item: item[0], reverse=True)
+        del self.slowest[keep_slowest:]
+        return self.report()
+    
+    def report(self):
+        summary = {}
+        for event_type, values in self.latencies.items():
+            summary[event_type] = {
+                "count": len(values),
+                "mean_ms": sum(values) * 1000 / len(values),
+                "p50_ms": percentile(values, 0.5) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+                "max_ms": max(values) * 1000
+            }
+        return {
+            "latency": summary,
+            "slowest": [
+                {"ms": elapsed * 1000, "type": entry["type"], "t": entry.get("t"),
+                 "image_index": entry.get("image_index"), "method": entry.get("method")}
+                for elapsed, entry in self.slowest
+            ]
+        }
+
+
+def format_report(report):
+    lines = [f"{'event':>12} {'count':>7} {'mean':>9} {'p50':>9} {'p95':>9} {'max':>9}"]
+    for event_type, stats in sorted(report["latency"].items()):
+        lines.append(f"{event_type:>12} {stats['count']:>7} {stats['mean_ms']:>7.2f}ms "
+                     f"{stats['p50_ms']:>7.2f}ms {stats['p95_ms']:>7.2f}ms {stats['max_ms']:>7.2f}ms")
+    
+    if report["slowest"]:
+        lines.append("")
+        lines.append("Slowest events:")
+        for item in report["slowest"]:
+            lines.append(f"  {item['ms']:8.2f}ms  {item['type']:<12} image #{item['image_index']}  "
+                         f"t={item['t']}  {item['method'] or ''}")
+    return "\n".join(lines)
+
+
+def create_app(headless, suggest_circles):
+    if headless:
+        from headless import HeadlessLabelingApp
+        app = HeadlessLabelingApp()
+    else:
+        import tkinter as tk
+        from main import NorbergOlsenLabelingApp
+        
+        class ReplayApp(NorbergOlsenLabelingApp):
+            def check_last_session(self):
+                pass
+            
+            def remember_session(self):
+                pass
+            
+            def flush(self):
+                self.root.update()
+        
+        root = tk.Tk()
+        app = ReplayApp(root)
+        root.update()
+    
+    app.suggest_circles.set(suggest_circles)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded annotation session and report latency.")
+    parser.add_argument("trace", help="Trace file recorded with 'python main.py --record TRACE'")
+    parser.add_argument("--folder", help="Replay against this folder instead of the recorded one")
+    parser.add_argument("--gui", action="store_true", help="Replay in a visible Tk window")
+    parser.add_argument("--suggest-circles", action="store_true", help="Keep femur circle suggestions enabled")
+    parser.add_argument("--json", metavar="PATH", help="Also write the report as JSON")
+    args = parser.parse_args()
+    
+    app = create_app(not args.gui, args.suggest_circles)
+    try:
+        report = SessionPlayer(app, args.folder).replay(load_trace(args.trace))
+    finally:
+        app.circle_proposals.shutdown()
+        app.hash_service.shutdown()
+    
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
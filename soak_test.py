@@ -0,0 +1,262 @@
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+
+import numpy as np
+from PIL import Image
+
+from memory_budget import memory_budget, MB
+from session_trace import SyntheticEvent, create_app
+
+METRICS = ("rss_mb", "canvas_items", "images", "python_objects", "budget_mb")
+DEFAULT_LIMITS = {
+    "rss_mb": 16.0,
+    "canvas_items": 1.0,
+    "images": 1.0,
+    "python_objects": 5000.0,
+    "budget_mb": 1.0
+}
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current RSS, but it still only grows when the process keeps allocating
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def canvas_item_count(canvas):
+    if hasattr(canvas, "live_count"):
+        return canvas.live_count()
+    return len(canvas.find_all())
+
+
+def image_count(app):
+    try:
+        return len(app.root.tk.call("image", "names"))
+    except Exception:
+        # No Tk image command in the headless interpreter; count live PIL images instead
+        return sum(1 for obj in gc.get_objects() if isinstance(obj, Image.Image))
+
+
+def type_counts():
+    return Counter(type(obj).__qualname__ for obj in gc.get_objects())
+
+
+class ResourceSampler:
+    def __init__(self, app):
+        self.app = app
+        self.samples = []
+    
+    def sample(self, cycle):
+        gc.collect()
+        rss = rss_bytes()
+        values = {
+            "cycle": cycle,
+            "time": time.perf_counter(),
+            "rss_mb": rss / MB if rss is not None else None,
+            "canvas_items": canvas_item_count(self.app.canvas),
+            "images": image_count(self.app),
+            "python_objects": len(gc.get_objects()),
+            "budget_mb": memory_budget.total / MB
+        }
+        self.samples.append(values)
+        return values
+
+
+def growth_per_1000(samples, metric):
+    points = [(sample["cycle"], sample[metric]) for sample in samples if sample[metric] is not None]
+    if len(points) < 3:
+        return None
+    cycles, values = zip(*points)
+    if max(cycles) == min(cycles):
+        return None
+    slope = np.polyfit(np.array(cycles, dtype=np.float64), np.array(values, dtype=np.float64), 1)[0]
+    return float(slope * 1000)
+
+
+def canvas_point(app, fx, fy):
+    return (fx * app.loaded_image.width * app.zoom_factor,
+            fy * app.loaded_image.height * app.zoom_factor)
+
+
+def mouse(app, kind, point):
+    canvas = app.canvas
+    app.handle_mouse(kind, SyntheticEvent(point[0] - canvas.canvasx(0), point[1] - canvas.canvasy(0)))
+
+
+def drag(app, start, end, steps=5):
+    mouse(app, "click", start)
+    for i in range(1, steps + 1):
+        mouse(app, "drag", (start[0] + (end[0] - start[0]) * i / steps,
+                            start[1] + (end[1] - start[1]) * i / steps))
+    mouse(app, "release", end)
+
+
+class SoakDriver:
+    def __init__(self, app):
+        self.app = app
+        self.direction = 1
+    
+    def navigate(self):
+        app = self.app
+        at_end = app.current_image_index >= len(app.image_files) - 1
+        at_start = app.current_image_index <= 0
+        if (self.direction > 0 and at_end) or (self.direction < 0 and at_start):
+            self.direction = -self.direction
+        if self.direction > 0:
+            app.next_image()
+        else:
+            app.prev_image()
+    
+    def zoom_and_scroll(self, cycle):
+        app = self.app
+        app.zoom_in()
+        app.zoom_in()
+        app.scroll_x("moveto", (cycle % 7) / 10.0)
+        app.scroll_y("scroll", 3, "units")
+        app.flush()
+        app.zoom_out()
+        app.zoom_out()
+    
+    def edit(self, cycle):
+        app = self.app
+        jitter = (cycle % 5) * 0.01
+        app.draw_rectangle_mode()
+        drag(app, canvas_point(app, 0.2 + jitter, 0.2), canvas_point(app, 0.8, 0.7 + jitter))
+        app.draw_left_circle_mode()
+        drag(app, canvas_point(app, 0.35, 0.5), canvas_point(app, 0.42 + jitter, 0.5))
+        app.draw_left_keypoint_mode()
+        mouse(app, "click", canvas_point(app, 0.3, 0.4 + jitter))
+        
+        keypoint = canvas_point(app, 0.3, 0.4 + jitter)
+        canvas = app.canvas
+        app.on_right_click(SyntheticEvent(keypoint[0] - canvas.canvasx(0), keypoint[1] - canvas.canvasy(0)))
+        if app.selected_tag is not None:
+            app.start_move_mode()
+            drag(app, keypoint, (keypoint[0] + 4, keypoint[1] + 3))
+    
+    def cycle(self, cycle):
+        self.navigate()
+        self.zoom_and_scroll(cycle)
+        self.edit(cycle)
+        self.app.flush()
+        # The headless app keeps every dialog message; drop them so the harness itself does not grow
+        if hasattr(self.app, "messages"):
+            del self.app.messages[:]
+
+
+def run_soak(app, cycles, sample_every=50, warmup=None, progress=None):
+    driver = SoakDriver(app)
+    sampler = ResourceSampler(app)
+    warmup = warmup if warmup is not None else max(sample_every * 2, min(cycles // 5, 2 * len(app.image_files)))
+    
+    baseline_types = None
+    for cycle in range(1, cycles + 1):
+        driver.cycle(cycle)
+        if cycle == warmup:
+            gc.collect()
+            baseline_types = type_counts()
+        if cycle % sample_every == 0 or cycle == cycles:
+            values = sampler.sample(cycle)
+            if progress is not None:
+                progress(values)
+    
+    steady = [sample for sample in sampler.samples if sample["cycle"] >= warmup]
+    report = {
+        "cycles": cycles,
+        "warmup": warmup,
+        "images": len(app.image_files),
+        "samples": sampler.samples,
+        "growth_per_1000": {metric: growth_per_1000(steady, metric) for metric in METRICS},
+        "growing_types": []
+    }
+    if baseline_types is not None:
+        growth = type_counts()
+        growth.subtract(baseline_types)
+        report["growing_types"] = [(name, count) for name, count in growth.most_common(10) if count > 0]
+    return report
+
+
+def check_growth(report, limits):
+    failures = []
+    for metric, limit in limits.items():
+        growth = report["growth_per_1000"].get(metric)
+        if growth is not None and limit is not None and growth > limit:
+            failures.append(f"{metric} grows by {growth:.2f} per 1000 cycles (limit {limit:g})")
+    return failures
+
+
+def format_sample(sample):
+    rss = f"{sample['rss_mb']:8.1f} MB" if sample["rss_mb"] is not None else "       n/a"
+    return (f"cycle {sample['cycle']:>6}  rss {rss}  canvas items {sample['canvas_items']:>5}  "
+            f"images {sample['images']:>4}  objects {sample['python_objects']:>8}  "
+            f"budget {sample['budget_mb']:7.1f} MB")
+
+
+def format_report(report, failures):
+    lines = [f"{report['cycles']} cycles over {report['images']} images (warm-up {report['warmup']} cycles)",
+             "Growth per 1000 cycles after warm-up:"]
+    for metric, growth in report["growth_per_1000"].items():
+        lines.append(f"  {metric:>15}: " + ("n/a" if growth is None else f"{growth:+.2f}"))
+    if report["growing_types"]:
+        lines.append("Object types that grew after warm-up:")
+        for name, count in report["growing_types"]:
+            lines.append(f"  {name:>30}: +{count}")
+    lines.append("")
+    lines.extend(failures or ["No unbounded growth detected."])
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive thousands of navigate/zoom/edit cycles and fail on "
+                                                 "unbounded memory, canvas item or object growth.")
+    parser.add_argument("folder", help="Folder of images to cycle through (labels are edited in memory only)")
+    parser.add_argument("--cycles", type=int, default=2000, help="Number of navigate/zoom/edit cycles")
+    parser.add_argument("--sample-every", type=int, default=50, help="Cycles between resource samples")
+    parser.add_argument("--warmup", type=int, default=None,
+                        help="Cycles to ignore before measuring growth (default: two passes over the folder)")
+    parser.add_argument("--gui", action="store_true", help="Run in a visible Tk window (counts real Tk images)")
+    parser.add_argument("--json", metavar="PATH", help="Also write samples and growth as JSON")
+    for metric, limit in DEFAULT_LIMITS.items():
+        parser.add_argument(f"--max-{metric.replace('_', '-')}-growth", type=float, default=limit,
+                            help=f"Allowed {metric} growth per 1000 cycles (default {limit:g})")
+    args = parser.parse_args()
+    
+    app = create_app(not args.gui, False)
+    try:
+        app.load_folder(args.folder)
+        if not app.image_files:
+            print("No images in the folder.")
+            sys.exit(2)
+        report = run_soak(app, args.cycles, args.sample_every, args.warmup,
+                          progress=lambda sample: print(format_sample(sample), flush=True))
+    finally:
+        app.circle_proposals.shutdown()
+        app.hash_service.shutdown()
+    
+    limits = {metric: getattr(args, f"max_{metric}_growth") for metric in DEFAULT_LIMITS}
+    failures = check_growth(report, limits)
+    print()
+    print(format_report(report, failures))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=4)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
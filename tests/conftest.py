@@ -0,0 +1,52 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_images(folder, count, size=(400, 300), prefix="img", extension="png"):
+    rng = np.random.default_rng(0)
+    names = []
+    for i in range(count):
+        name = f"{prefix}{i}.{extension}"
+        pixels = (rng.random((size[1], size[0])) * 255).astype(np.uint8)
+        Image.fromarray(pixels).save(os.path.join(folder, name))
+        names.append(name)
+    return names
+
+
+@pytest.fixture(autouse=True)
+def cache_dirs(tmp_path, monkeypatch):
+    # Keep per-user caches out of the developer's home directory
+    import duplicate_index
+    import label_store
+    import pyramid_cache
+    import throughput_log
+    
+    cache_dir = tmp_path / "user_cache"
+    monkeypatch.setattr(duplicate_index, "HASH_CACHE_DIR", str(cache_dir / "image_hashes"))
+    monkeypatch.setattr(label_store, "INDEX_CACHE_DIR", str(cache_dir / "label_offsets"))
+    monkeypatch.setattr(pyramid_cache, "PYRAMID_CACHE_DIR", str(cache_dir / "pyramids"))
+    monkeypatch.setattr(throughput_log, "THROUGHPUT_DIR", str(cache_dir / "throughput"))
+    return cache_dir
+
+
+@pytest.fixture
+def headless_app():
+    from headless import HeadlessLabelingApp
+    
+    apps = []
+    
+    def create(**options):
+        app = HeadlessLabelingApp(**options)
+        app.suggest_circles.set(False)
+        apps.append(app)
+        return app
+    
+    yield create
+    for app in apps:
+        app.close()
@@ -0,0 +1,30 @@
+import pytest
+
+from canvas_backend import CanvasBackend, HeadlessCanvas
+from drawing import LabelRenderer
+
+LABELS = {"rectangle": {"x1": 10, "y1": 10, "x2": 100, "y2": 80}, "left_keypoint": {"x": 30, "y": 40}}
+
+
+def test_backend_must_implement_drawing_primitives():
+    class Incomplete(CanvasBackend):
+        def create_rectangle(self, x1, y1, x2, y2, **options):
+            return 1
+    
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_redraw_replaces_annotation_items():
+    canvas = HeadlessCanvas(400, 300)
+    renderer = LabelRenderer(canvas, 1.0, True, True)
+    
+    renderer.redraw_all(LABELS)
+    first = len(canvas.find_withtag("annotation"))
+    renderer.redraw_all(LABELS)
+    
+    assert first > 0
+    assert len(canvas.find_withtag("annotation")) == first
+    renderer.show_labels = False
+    renderer.redraw_all(LABELS)
+    assert canvas.find_withtag("annotation") == ()
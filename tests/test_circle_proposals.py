@@ -0,0 +1,28 @@
+from conftest import write_images
+from soak_test import canvas_point, drag
+
+
+def test_rectangle_requests_proposals_inside_it(tmp_path, headless_app, monkeypatch):
+    write_images(str(tmp_path), 1)
+    app = headless_app()
+    app.suggest_circles.set(True)
+    requested = []
+    monkeypatch.setattr(app.circle_proposals, "request", lambda image_path, roi=None: requested.append(roi))
+    app.load_folder(str(tmp_path))
+    app.flush()
+    assert requested == [None]
+    
+    image_path = app.image_files[app.current_image_index]
+    circle = {"center_x": 120.0, "center_y": 150.0, "radius": 30.0}
+    app.draw_rectangle_mode()
+    start, end = canvas_point(app, 0.2, 0.2), canvas_point(app, 0.8, 0.7)
+    drag(app, start, end)
+    roi = app.current_labels["rectangle"]
+    assert requested[-1] == roi
+    
+    app.circle_proposals.cache[app.circle_proposals.key(image_path, roi)] = {"left_circle": circle}
+    
+    app.selected_tag = "rectangle"
+    app.edit_rectangle()
+    app.stop_resize(None)
+    assert app.circle_suggestions == {"left_circle": circle}
@@ -0,0 +1,99 @@
+import os
+
+from PIL import Image
+
+from comparison import DecodeCache, ViewCache
+from conftest import write_images
+from file_manager import append_shard, shard_path
+from memory_budget import MB, MemoryBudget
+
+LABELS = {"rectangle": {"x1": 10, "y1": 10, "x2": 100, "y2": 100}, "left_keypoint": {"x": 30, "y": 40}}
+OTHER_LABELS = {"rectangle": {"x1": 20, "y1": 20, "x2": 120, "y2": 110}}
+
+
+class FakeSource:
+    def __init__(self):
+        self.closed = False
+    
+    def close(self):
+        self.closed = True
+
+
+class FakeImage:
+    def __init__(self, path):
+        self.path = path
+        self.source = FakeSource()
+    
+    def memory_bytes(self):
+        return MB
+
+
+def test_decode_cache_shares_and_releases_by_reference_count(tmp_path):
+    budget = MemoryBudget()
+    cache = DecodeCache(budget)
+    path = str(tmp_path / "a.png")
+    
+    first = cache.acquire(path, FakeImage)
+    second = cache.acquire(os.path.join(str(tmp_path), ".", "a.png"), FakeImage)
+    assert first is second
+    assert budget.total == MB
+    
+    cache.release(path)
+    assert not first.source.closed
+    cache.release(path)
+    assert first.source.closed
+    assert budget.total == 0
+
+
+def test_view_cache_keeps_the_most_recent_views(tmp_path):
+    budget = MemoryBudget()
+    cache = ViewCache(max_entries=2, budget=budget)
+    image = Image.new("L", (10, 10))
+    cache.put("a", image, "photo a")
+    cache.put("b", image, "photo b")
+    cache.get("a")
+    cache.put("c", image, "photo c")
+    
+    assert list(cache.entries) == ["a", "c"]
+    assert len(budget.entries) == 2
+    cache.clear()
+    assert budget.total == 0
+
+
+def test_annotator_comparison_shares_the_main_view_decode(tmp_path, headless_app):
+    folder = str(tmp_path)
+    names = write_images(folder, 2)
+    append_shard(shard_path(folder, "bob"), {names[0]: OTHER_LABELS}, "bob")
+    app = headless_app()
+    app.load_folder(folder)
+    app.labels[names[0]] = LABELS
+    
+    app.compare_annotators()
+    
+    view = app.comparison
+    assert app.messages == []
+    assert [pane.title for pane in view.panes] == ["Current labels", "bob"]
+    assert len(app.decode_cache.entries) == 1
+    assert all(pane.loaded_image is app.loaded_image for pane in view.panes)
+    assert view.view_hits > 0
+    assert [pane.labels for pane in view.panes] == [LABELS, OTHER_LABELS]
+    
+    view.zoom(4.0)
+    view.scroll("x", "moveto", 0.3)
+    view.scroll("y", "scroll", 2, "units")
+    positions = {(pane.canvas.canvasx(0), pane.canvas.canvasy(0)) for pane in view.panes}
+    assert len(positions) == 1 and positions != {(0, 0)}
+    
+    app.close_comparison()
+    assert len(app.decode_cache.entries) == 1
+
+
+def test_comparing_without_other_annotators_reports_it(tmp_path, headless_app):
+    write_images(str(tmp_path), 1)
+    app = headless_app()
+    app.load_folder(str(tmp_path))
+    
+    app.compare_annotators()
+    
+    assert app.comparison is None
+    assert [kind for kind, _, _ in app.messages] == ["info"]
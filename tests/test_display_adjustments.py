@@ -0,0 +1,30 @@
+import numpy as np
+from PIL import Image
+
+from display_adjustments import WindowLevel
+
+
+def test_default_window_level_leaves_the_image_untouched():
+    image = Image.fromarray(np.arange(256, dtype=np.uint8).reshape(16, 16))
+    
+    assert WindowLevel().apply(image) is image
+
+
+def test_narrow_window_clips_and_stretches():
+    window_level = WindowLevel()
+    window_level.adjust(-156, 0)
+    image = Image.fromarray(np.array([[0, 78, 128, 178, 255]], dtype=np.uint8))
+    
+    result = np.asarray(window_level.apply(image))
+    
+    assert result.tolist() == [[0, 0, 128, 255, 255]]
+
+
+def test_adjustments_stay_in_range_and_rgba_keeps_alpha():
+    window_level = WindowLevel()
+    window_level.adjust(10000, -10000)
+    window_level.set_gamma(0.0)
+    assert (window_level.window, window_level.level, window_level.gamma) == (512.0, 0.0, 0.1)
+    
+    image = Image.new("RGBA", (2, 2), (100, 100, 100, 77))
+    assert window_level.apply(image).getpixel((0, 0))[3] == 77
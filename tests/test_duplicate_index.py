@@ -0,0 +1,35 @@
+import os
+
+from PIL import Image
+
+from conftest import write_images
+from duplicate_index import index_folder
+
+
+def test_index_groups_duplicates_and_returns_failures(tmp_path, capsys):
+    folder = str(tmp_path)
+    names = write_images(folder, 2, size=(256, 192))
+    with Image.open(os.path.join(folder, names[0])) as image:
+        image.resize((128, 96)).save(os.path.join(folder, "copy.jpg"), quality=90)
+    with open(os.path.join(folder, "broken.png"), 'wb') as f:
+        f.write(b"not an image")
+    
+    index, hashed, failed = index_folder(folder, workers=1)
+    
+    assert hashed == 3
+    assert [file_name for file_name, _ in failed] == ["broken.png"]
+    assert capsys.readouterr().out == ""
+    assert [sorted(members) for members in index.groups()] == [sorted(["copy.jpg", names[0]])]
+    
+    index, hashed, failed = index_folder(folder, workers=1)
+    assert hashed == 0
+
+
+def test_hash_cache_stays_in_the_cache_directory(tmp_path, cache_dirs):
+    folder = str(tmp_path / "images")
+    os.makedirs(folder)
+    write_images(folder, 2)
+    
+    index_folder(folder, workers=1)
+    
+    assert len(os.listdir(cache_dirs / "image_hashes")) == 1
@@ -0,0 +1,33 @@
+import threading
+
+import main
+from conftest import write_images
+from memory_budget import memory_budget
+
+
+def test_gradients_are_prewarmed_on_the_background_worker(tmp_path, headless_app, monkeypatch):
+    write_images(str(tmp_path), 1)
+    threads = []
+    compute_gradients = main.compute_gradients
+    
+    def compute(loaded_image):
+        threads.append(threading.current_thread().name)
+        return compute_gradients(loaded_image)
+    
+    app = headless_app()
+    app.load_folder(str(tmp_path))
+    monkeypatch.setattr(main, "compute_gradients", compute)
+    app.snap_to_edges.set(True)
+    app.prewarm_gradients()
+    app.prewarm_gradients()
+    key = app.gradient_cache.key(app.loaded_image)
+    assert app.gradient_cache.entries == {}
+    
+    app.finish_background_work()
+    assert threads == ["pipeline"]
+    assert key in app.gradient_cache.entries
+    assert ("gradients", key) in memory_budget.entries
+    
+    app.prewarm_gradients()
+    assert app.background.pending == 0
+    assert app.gradient_cache.get(app.loaded_image) is app.gradient_cache.entries[key]
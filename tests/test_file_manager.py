@@ -0,0 +1,42 @@
+import json
+import os
+
+from file_manager import LABELS_FILE_NAME, read_labels, read_shard, shard_path, write_folder_labels
+
+RECTANGLE = {"rectangle": {"x1": 1, "y1": 2, "x2": 30, "y2": 40}}
+
+
+def write_base(folder, labels):
+    with open(os.path.join(folder, LABELS_FILE_NAME), 'w') as f:
+        json.dump(labels, f, indent=4)
+
+
+def test_shard_edits_override_base_labels(tmp_path):
+    folder = str(tmp_path)
+    write_base(folder, {"a.png": RECTANGLE})
+    edited = {"rectangle": {"x1": 5, "y1": 5, "x2": 50, "y2": 50}}
+    
+    write_folder_labels(folder, {"a.png": edited, "b.png": RECTANGLE}, "alice", {"a.png", "b.png"})
+    
+    assert read_labels(folder, "alice") == {"a.png": edited, "b.png": RECTANGLE}
+    assert read_labels(folder, "bob") == {"a.png": RECTANGLE}
+
+
+def test_cleared_image_stays_cleared_over_base_labels(tmp_path):
+    folder = str(tmp_path)
+    write_base(folder, {"a.png": RECTANGLE, "b.png": RECTANGLE})
+    
+    write_folder_labels(folder, {}, "alice", {"a.png"})
+    
+    assert read_shard(shard_path(folder, "alice")) == {"a.png": None}
+    assert read_labels(folder, "alice") == {"b.png": RECTANGLE}
+
+
+def test_labels_saved_after_clearing_come_back(tmp_path):
+    folder = str(tmp_path)
+    write_base(folder, {"a.png": RECTANGLE})
+    
+    write_folder_labels(folder, {}, "alice", {"a.png"})
+    write_folder_labels(folder, {"a.png": RECTANGLE}, "alice", {"a.png"})
+    
+    assert read_labels(folder, "alice") == {"a.png": RECTANGLE}
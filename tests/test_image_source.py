@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_source import ImageSource, PILImageSource, clamp_box
+
+
+def test_source_must_implement_region_reads():
+    class Incomplete(ImageSource):
+        def as_array(self):
+            return None
+    
+    with pytest.raises(TypeError):
+        Incomplete(10, 10, "L")
+
+
+def test_pil_source_reads_clamped_scaled_regions():
+    pixels = np.arange(200 * 100, dtype=np.uint32).reshape(100, 200).astype(np.uint8)
+    source = PILImageSource(Image.fromarray(pixels))
+    
+    assert np.array_equal(np.asarray(source.read_region((10, 20, 50, 60), 1.0)), pixels[20:60, 10:50])
+    assert source.read_region((-10, -10, 300, 300), 0.5).size == (100, 50)
+    assert clamp_box((-1.5, 2.2, 250, 99.1), 200, 100) == (0, 2, 200, 100)
@@ -0,0 +1,42 @@
+import json
+
+import numpy as np
+
+from label_binary import convert, open_binary_labels, read_label_file, write_binary_labels
+
+LABELS = {
+    "a.png": {"rectangle": {"x1": 1, "y1": 2, "x2": 300, "y2": 200},
+              "left_keypoint": {"x": 10.5, "y": 20.25}, "right_keypoint": {"x": 200, "y": 21},
+              "left_circle": {"center_x": 50, "center_y": 60, "radius": 12.5}, "left_angle": 102.5},
+    "b.png": {"rectangle": {"x1": 5, "y1": 6, "x2": 70, "y2": 80}},
+    "c.png": {"rectangle": {"x1": 5, "y1": 6, "x2": 70, "y2": 80}, "note": "not a fixed-width field"},
+}
+
+
+def test_json_round_trips_through_the_binary_format(tmp_path):
+    json_path = str(tmp_path / "labels.json")
+    binary_path = str(tmp_path / "labels.nolb")
+    with open(json_path, 'w') as f:
+        json.dump(LABELS, f)
+    
+    assert convert(json_path, binary_path) == 3
+    
+    labels = read_label_file(binary_path)
+    assert dict(labels.items()) == LABELS
+    names, columns = labels.label_columns()
+    assert names == ["a.png", "b.png", "c.png"]
+    assert columns["left_angle"][0] == 102.5 and np.isnan(columns["left_angle"][1])
+
+
+def test_rewrites_keep_untouched_records_and_apply_edits(tmp_path):
+    path = str(tmp_path / "labels.nolb")
+    write_binary_labels(path, LABELS)
+    labels = open_binary_labels(path)
+    
+    labels["b.png"] = {"rectangle": {"x1": 9, "y1": 9, "x2": 90, "y2": 90}}
+    del labels["a.png"]
+    write_binary_labels(path, labels)
+    
+    expected = {"b.png": {"rectangle": {"x1": 9, "y1": 9, "x2": 90, "y2": 90}}, "c.png": LABELS["c.png"]}
+    assert dict(labels.items()) == expected
+    assert dict(open_binary_labels(path).items()) == expected
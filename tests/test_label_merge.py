@@ -0,0 +1,50 @@
+import json
+import os
+
+from file_manager import LABELS_FILE_NAME, append_shard, shard_path
+from label_merge import merge_folder
+
+
+def rectangle(offset):
+    return {"rectangle": {"x1": offset, "y1": offset, "x2": offset + 100, "y2": offset + 80}}
+
+
+def write_base(folder, labels):
+    with open(os.path.join(folder, LABELS_FILE_NAME), 'w') as f:
+        json.dump(labels, f)
+
+
+def record(folder, annotator, image, labels, time):
+    with open(shard_path(folder, annotator), 'a') as f:
+        f.write(json.dumps({"image": image, "labels": labels, "time": time, "annotator": annotator}) + "\n")
+
+
+def test_newest_annotation_wins(tmp_path):
+    folder = str(tmp_path)
+    write_base(folder, {"a.png": rectangle(0), "b.png": rectangle(0)})
+    record(folder, "alice", "a.png", rectangle(10), 1.0)
+    record(folder, "bob", "a.png", rectangle(12), 2.0)
+    
+    merged, report = merge_folder(folder)
+    
+    assert merged == {"a.png": rectangle(12), "b.png": rectangle(0)}
+    assert report["multiply_annotated"] == 1
+    assert report["agreement"]["alice/bob"]["images"] == 1
+
+
+def test_newest_clear_removes_the_image_and_leaves_the_agreement(tmp_path):
+    folder = str(tmp_path)
+    write_base(folder, {"a.png": rectangle(0), "b.png": rectangle(0), "c.png": rectangle(0)})
+    append_shard(shard_path(folder, "alice"), {"a.png": None})
+    record(folder, "alice", "b.png", rectangle(10), 1.0)
+    record(folder, "bob", "b.png", rectangle(12), 2.0)
+    record(folder, "bob", "b.png", None, 3.0)
+    record(folder, "alice", "c.png", None, 1.0)
+    record(folder, "bob", "c.png", rectangle(20), 2.0)
+    
+    merged, report = merge_folder(folder)
+    
+    assert merged == {"c.png": rectangle(20)}
+    assert report["images"] == 2
+    assert report["multiply_annotated"] == 0
+    assert report["agreement"] == {}
@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import label_service
+from conftest import write_images
+from file_manager import LABELS_FILE_NAME, append_shard, read_labels
+from label_service import LabelService, LabelServiceClient, LabelServiceError, journal_path
+
+RECTANGLE = {"rectangle": {"x1": 1, "y1": 2, "x2": 30, "y2": 40}}
+
+
+class RunningService:
+    def __init__(self, folder, socket_file, **options):
+        self.service = LabelService(folder, path=socket_file, **options)
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        deadline = time.monotonic() + 5
+        while not os.path.exists(socket_file) and self.thread.is_alive():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    
+    def run(self):
+        try:
+            self.service.serve_forever()
+        except LabelServiceError as e:
+            self.error = e
+    
+    def connect(self):
+        return LabelServiceClient(self.service.path)
+    
+    def stop(self):
+        if self.thread.is_alive():
+            client = self.connect()
+            client.shutdown()
+            client.close()
+        self.thread.join(5)
+
+
+@pytest.fixture
+def services():
+    running = []
+    
+    def start(folder, socket_file, **options):
+        service = RunningService(folder, socket_file, **options)
+        running.append(service)
+        return service
+    
+    yield start
+    for service in running:
+        service.stop()
+
+
+def test_acknowledged_writes_are_recovered_from_the_journal(tmp_path, services):
+    folder = str(tmp_path)
+    append_shard(journal_path(folder), {"a.png": RECTANGLE, "b.png": RECTANGLE})
+    append_shard(journal_path(folder), {"b.png": None})
+    
+    service = services(folder, str(tmp_path / "service.sock"))
+    client = service.connect()
+    assert client.get() == {"a.png": RECTANGLE}
+    client.close()
+    
+    assert read_labels(folder) == {"a.png": RECTANGLE}
+    assert os.path.getsize(journal_path(folder)) == 0
+
+
+def test_writes_are_committed_and_pushed_to_other_clients(tmp_path, services):
+    folder = str(tmp_path)
+    service = services(folder, str(tmp_path / "service.sock"))
+    writer = service.connect()
+    reader = service.connect()
+    reader.subscribe()
+    
+    writer.put({"a.png": RECTANGLE})
+    writer.put({"b.png": RECTANGLE})
+    
+    deadline = time.monotonic() + 5
+    changed = {}
+    while len(changed) < 2 and time.monotonic() < deadline:
+        for event in reader.poll():
+            changed.update(event["entries"])
+        time.sleep(0.01)
+    assert changed == {"a.png": RECTANGLE, "b.png": RECTANGLE}
+    assert writer.poll() == []
+    assert reader.get(["a.png", "c.png"]) == {"a.png": RECTANGLE, "c.png": None}
+    
+    writer.checkpoint()
+    assert read_labels(folder) == {"a.png": RECTANGLE, "b.png": RECTANGLE}
+    writer.close()
+    reader.close()
+
+
+def test_second_service_leaves_the_running_one_alone(tmp_path, services):
+    folder = str(tmp_path)
+    first = services(folder, str(tmp_path / "first.sock"), checkpoint_entries=1000)
+    client = first.connect()
+    client.put({"a.png": RECTANGLE})
+    journal_size = os.path.getsize(journal_path(folder))
+    assert journal_size > 0
+    
+    # A second host has its own socket directory but shares the folder
+    second = services(folder, str(tmp_path / "second.sock"))
+    second.thread.join(5)
+    
+    assert isinstance(second.error, LabelServiceError)
+    assert os.path.getsize(journal_path(folder)) == journal_size
+    assert not os.path.exists(os.path.join(folder, LABELS_FILE_NAME))
+    assert client.get(["a.png"]) == {"a.png": RECTANGLE}
+    client.close()
+    
+    first.stop()
+    with open(os.path.join(folder, LABELS_FILE_NAME)) as f:
+        assert json.load(f) == {"a.png": RECTANGLE}
+
+
+def test_failed_journal_append_is_not_applied(tmp_path, services, monkeypatch):
+    folder = str(tmp_path)
+    service = services(folder, str(tmp_path / "service.sock"))
+    client = service.connect()
+    
+    def fail(path, entries, annotator=None):
+        raise OSError("disk full")
+    
+    monkeypatch.setattr(label_service, "append_shard", fail)
+    with pytest.raises(LabelServiceError):
+        client.put({"a.png": RECTANGLE})
+    monkeypatch.undo()
+    
+    assert client.get(["a.png"]) == {"a.png": None}
+    client.checkpoint()
+    assert read_labels(folder) == {}
+    client.close()
+
+
+def test_app_keeps_edits_unsaved_while_a_lost_service_still_runs(tmp_path, services, headless_app):
+    folder = str(tmp_path)
+    names = write_images(folder, 1)
+    service = services(folder, str(tmp_path / "service.sock"))
+    app = headless_app()
+    app.load_folder(folder)
+    # As after lose_label_service: no client, but the app was started with --label-service
+    app.use_label_service = True
+    app.labels[names[0]] = RECTANGLE
+    app.dirty_labels.add(names[0])
+    
+    assert not app.write_labels()
+    assert [kind for kind, _, _ in app.messages] == ["error"]
+    assert app.dirty_labels == {names[0]}
+    assert not os.path.exists(os.path.join(folder, LABELS_FILE_NAME))
+    
+    service.stop()
+    assert app.write_labels()
+    assert read_labels(folder) == {names[0]: RECTANGLE}
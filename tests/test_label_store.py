@@ -0,0 +1,46 @@
+import json
+
+from label_store import LazyLabels, index_label_file, write_lazy_labels
+
+
+def entry(offset):
+    return {"rectangle": {"x1": offset, "y1": offset + 1, "x2": offset + 50, "y2": offset + 40},
+            "left_keypoint": {"x": offset + 5.5, "y": offset + 6}, "left_angle": 101.25}
+
+
+def write_json(path, labels):
+    with open(path, 'w') as f:
+        json.dump(labels, f, indent=4)
+
+
+def test_lazy_labels_read_like_the_parsed_file(tmp_path):
+    path = str(tmp_path / "labels.json")
+    expected = {f"img{i}.png": entry(i) for i in range(20)}
+    expected['quote "and" slash \\ name.png'] = entry(99)
+    write_json(path, expected)
+    
+    labels = LazyLabels(index_label_file(path))
+    
+    assert len(labels) == len(expected)
+    assert list(labels) == list(expected)
+    assert dict(labels.items()) == expected
+    assert labels['quote "and" slash \\ name.png'] == entry(99)
+    assert "missing.png" not in labels
+
+
+def test_edits_are_written_back_and_the_index_follows(tmp_path):
+    path = str(tmp_path / "labels.json")
+    write_json(path, {f"img{i}.png": entry(i) for i in range(5)})
+    labels = LazyLabels(index_label_file(path))
+    
+    labels["img1.png"] = entry(500)
+    del labels["img2.png"]
+    labels["new.png"] = entry(7)
+    assert labels.pop("img3.png") == entry(3)
+    write_lazy_labels(path, labels)
+    
+    expected = {"img0.png": entry(0), "img1.png": entry(500), "img4.png": entry(4), "new.png": entry(7)}
+    with open(path) as f:
+        assert json.load(f) == expected
+    assert dict(labels.items()) == expected
+    assert dict(LazyLabels(index_label_file(path)).items()) == expected
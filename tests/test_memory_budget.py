@@ -0,0 +1,72 @@
+import numpy as np
+from PIL import Image
+
+from memory_budget import (MB, MemoryBudget, PRIORITY_CACHE, PRIORITY_PINNED, PRIORITY_PREFETCH, PRIORITY_RECENT,
+                           image_bytes)
+
+
+def test_eviction_takes_lowest_priority_then_least_recent():
+    budget = MemoryBudget(limit=10 * MB)
+    released = []
+    for key, priority in (("old_cache", PRIORITY_CACHE), ("prefetch", PRIORITY_PREFETCH),
+                          ("new_cache", PRIORITY_CACHE), ("recent", PRIORITY_RECENT)):
+        budget.register(key, 3 * MB, "test", priority, release=lambda key=key: released.append(key))
+    
+    budget.register("pinned", 4 * MB, "test", PRIORITY_PINNED)
+    
+    assert released == ["prefetch", "old_cache"]
+    assert budget.total == 10 * MB
+    assert budget.evictions == 2
+
+
+def test_touch_protects_an_entry_and_pinned_entries_are_never_evicted():
+    budget = MemoryBudget(limit=6 * MB)
+    released = []
+    budget.register("a", 3 * MB, "test", release=lambda: released.append("a"))
+    budget.register("b", 3 * MB, "test", release=lambda: released.append("b"))
+    budget.touch("a")
+    
+    budget.register("c", 3 * MB, "test")
+    budget.register("pinned", 20 * MB, "test", PRIORITY_PINNED)
+    
+    assert released == ["b", "a"]
+    assert list(budget.entries) == ["pinned"]
+    assert budget.usage_by_category() == {"test": 20 * MB}
+
+
+def test_release_may_unregister_its_own_entry_and_limits_apply_later():
+    budget = MemoryBudget(limit=100 * MB)
+    budget.register("a", 3 * MB, "test", release=lambda: budget.unregister("a"))
+    budget.register("b", 3 * MB, "test")
+    
+    budget.set_limit(4 * MB)
+    
+    assert list(budget.entries) == ["b"]
+    assert budget.total == 3 * MB
+
+
+def test_release_may_unregister_another_candidate():
+    budget = MemoryBudget(limit=100 * MB)
+    released = []
+    
+    def release_view():
+        released.append("view")
+        budget.unregister("tiles")
+    
+    budget.register("view", 3 * MB, "test", PRIORITY_PREFETCH, release=release_view)
+    budget.register("tiles", 3 * MB, "test", release=lambda: released.append("tiles"))
+    budget.register("recent", 3 * MB, "test", PRIORITY_RECENT, release=lambda: released.append("recent"))
+    
+    budget.set_limit(2 * MB)
+    
+    assert released == ["view", "recent"]
+    assert list(budget.entries) == []
+    assert budget.total == 0
+    assert budget.evictions == 2
+
+
+def test_image_sizes_account_for_bands_and_bit_depth():
+    assert image_bytes(Image.new("L", (10, 20))) == 200
+    assert image_bytes(Image.new("RGB", (10, 20))) == 600
+    assert image_bytes(Image.new("I;16", (10, 20))) == 400
+    assert image_bytes(np.zeros((10, 20), dtype=np.uint16)) == 400
@@ -0,0 +1,30 @@
+import json
+import os
+
+from conftest import write_images
+from file_manager import LABELS_FILE_NAME
+from offscreen_renderer import MANIFEST_NAME, render_folder
+
+LABELS = {"rectangle": {"x1": 10, "y1": 10, "x2": 100, "y2": 80}}
+
+
+def test_images_sharing_a_stem_get_separate_overlays(tmp_path):
+    folder = str(tmp_path / "images")
+    out_dir = str(tmp_path / "qc")
+    os.makedirs(folder)
+    names = (write_images(folder, 1, extension="png") + write_images(folder, 1, extension="tif") +
+             write_images(folder, 1, prefix="other"))
+    with open(os.path.join(folder, LABELS_FILE_NAME), 'w') as f:
+        json.dump({name: LABELS for name in names}, f)
+    
+    rendered, skipped, failed = render_folder(folder, out_dir, workers=1)
+    
+    assert (rendered, skipped, failed) == (3, 0, [])
+    with open(os.path.join(out_dir, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    assert {name: entry["output"] for name, entry in manifest.items()} == {
+        "img0.png": "img0.png.png", "img0.tif": "img0.tif.png", "other0.png": "other0.png"}
+    for entry in manifest.values():
+        assert os.path.exists(os.path.join(out_dir, entry["output"]))
+    
+    assert render_folder(folder, out_dir, workers=1) == (0, 3, [])
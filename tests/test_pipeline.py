@@ -0,0 +1,65 @@
+import json
+import os
+import shutil
+
+from conftest import write_images
+from file_manager import read_labels
+from session_trace import SessionPlayer, load_trace
+from soak_test import canvas_point, drag, mouse
+
+
+def label_image(app):
+    drag(app, canvas_point(app, 0.2, 0.2), canvas_point(app, 0.8, 0.7))
+    mouse(app, "click", canvas_point(app, 0.3, 0.4))
+    mouse(app, "click", canvas_point(app, 0.7, 0.4))
+    drag(app, canvas_point(app, 0.35, 0.5), canvas_point(app, 0.42, 0.5))
+    drag(app, canvas_point(app, 0.65, 0.5), canvas_point(app, 0.72, 0.5))
+    app.flush()
+
+
+def test_pipeline_advances_through_steps_and_saves(tmp_path, headless_app):
+    names = write_images(str(tmp_path), 3)
+    app = headless_app()
+    app.load_folder(str(tmp_path))
+    app.toggle_pipeline_mode()
+    assert app.drawing_mode == "rectangle"
+    
+    label_image(app)
+    app.finish_background_work()
+    
+    assert app.current_image_index == 1
+    assert app.drawing_mode == "rectangle"
+    assert app.messages == []
+    saved = read_labels(str(tmp_path))
+    assert list(saved) == [names[0]]
+    assert "left_angle" in saved[names[0]]
+
+
+def test_pipeline_session_replays_to_the_same_state(tmp_path, headless_app):
+    recorded = str(tmp_path / "recorded")
+    replayed = str(tmp_path / "replayed")
+    os.makedirs(recorded)
+    names = write_images(recorded, 4)
+    shutil.copytree(recorded, replayed)
+    trace_path = str(tmp_path / "session.jsonl")
+    
+    app = headless_app()
+    app.load_folder(recorded)
+    app.toggle_pipeline_mode()
+    app.start_recording(trace_path)
+    label_image(app)
+    label_image(app)
+    app.stop_recording()
+    app.finish_background_work()
+    assert app.current_image_index == 2
+    
+    events = load_trace(trace_path)
+    assert not [event for event in events if event.get("method") in ("next_image", "draw_rectangle_mode")]
+    
+    player_app = headless_app()
+    SessionPlayer(player_app, replayed).replay(events)
+    player_app.finish_background_work()
+    
+    assert player_app.current_image_index == 2
+    assert sorted(read_labels(replayed)) == names[:2]
+    assert json.dumps(read_labels(replayed), sort_keys=True) == json.dumps(read_labels(recorded), sort_keys=True)
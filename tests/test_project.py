@@ -0,0 +1,33 @@
+from conftest import write_images
+from file_manager import append_shard, shard_path
+from project import Project
+
+
+def full_labels():
+    return {
+        "rectangle": {"x1": 40.0, "y1": 40.0, "x2": 360.0, "y2": 260.0},
+        "left_keypoint": {"x": 120.0, "y": 120.0},
+        "right_keypoint": {"x": 280.0, "y": 120.0},
+        "left_circle": {"center_x": 140.0, "center_y": 150.0, "radius": 25.0},
+        "right_circle": {"center_x": 260.0, "center_y": 150.0, "radius": 25.0},
+        "left_angle": 100.0,
+        "right_angle": 100.0
+    }
+
+
+def test_shard_saves_make_a_folder_stale(tmp_path):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    names = write_images(str(folder), 2)
+    append_shard(shard_path(str(folder), "alice"), {names[1]: None}, "alice")
+    project = Project(str(tmp_path / "study.nproj"), "alice")
+    project.add_folder(str(folder))
+    project.save()
+    assert project.refresh_stale() == 0
+    
+    append_shard(shard_path(str(folder), "alice"), {names[0]: full_labels()}, "alice")
+    project = Project.load(str(tmp_path / "study.nproj"), "alice")
+    assert project.folders[0].is_stale()
+    assert project.refresh_stale() == 1
+    assert project.folders[0].complete_count() == 1
+    assert project.refresh_stale() == 0
@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from image_loader import load_image
+from ingest import ingest_image
+from pyramid_cache import PyramidImageSource, is_cached, open_cached_pyramid
+
+
+def write_image(path, dtype=np.uint8, size=(1500, 1100)):
+    rng = np.random.default_rng(1)
+    pixels = (rng.random((size[1], size[0])) * np.iinfo(dtype).max).astype(dtype)
+    Image.fromarray(pixels).save(path)
+    return pixels
+
+
+def test_cached_pyramid_reads_the_same_pixels(tmp_path):
+    path = str(tmp_path / "big.png")
+    pixels = write_image(path)
+    
+    assert ingest_image(path) == "cached"
+    assert ingest_image(path) == "fresh"
+    source = open_cached_pyramid(path)
+    try:
+        assert source.size == (1500, 1100)
+        region = np.asarray(source.read_region((700, 300, 1300, 1000), 1.0))
+        assert np.array_equal(region, pixels[300:1000, 700:1300])
+        assert source.read_region((0, 0, 1500, 1100), 0.25).size == (375, 275)
+    finally:
+        source.close()
+    
+    loaded_image = load_image(path)
+    try:
+        assert isinstance(loaded_image.source, PyramidImageSource)
+    finally:
+        loaded_image.source.close()
+
+
+def test_changed_source_invalidates_the_cache(tmp_path):
+    path = str(tmp_path / "deep.png")
+    write_image(path, np.uint16, (600, 400))
+    ingest_image(path)
+    assert is_cached(path)
+    
+    write_image(path, np.uint16, (640, 400))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    
+    assert not is_cached(path)
+    assert open_cached_pyramid(path) is None
@@ -0,0 +1,49 @@
+from throughput_log import aggregate, openmetrics
+
+NOW = 1_700_000_000.0
+
+
+def write_log(path, events):
+    with open(path, 'w') as f:
+        f.write(f"{NOW - 7200:.3f}\ts1\tstart\talice\n")
+        for offset, event, value in events:
+            f.write(f"{NOW + offset:.3f}\ts1\t{event}\t{value}\n")
+
+
+def label_image(start, name):
+    return [(start, "open", name), (start + 20, "done", "rectangle"), (start + 30, "done", "calculate"),
+            (start + 35, "navigate", "")]
+
+
+def counters(text):
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+            for line in text.splitlines() if line.startswith("norberg_olsen_") and "_total{" in line}
+
+
+def test_step_times_exclude_idle_gaps(tmp_path):
+    path = str(tmp_path / "alice.log")
+    write_log(path, label_image(0, "a.png") + [(1000, "open", "b.png"), (1010, "done", "calculate")])
+    
+    stats = aggregate([path], idle_gap=300)["alice"]
+    
+    assert stats.images_completed == 2
+    assert stats.active_seconds == 45
+    assert stats.steps["rectangle"] == [20]
+    assert stats.steps["calculate"] == [10, 10]
+    assert stats.steps["load"] == [0, 0]
+
+
+def test_counters_stay_cumulative_with_a_reporting_window(tmp_path):
+    path = str(tmp_path / "alice.log")
+    write_log(path, label_image(-3600, "a.png") + label_image(0, "b.png"))
+    
+    everything = aggregate([path])
+    windowed = aggregate([path], since=NOW - 60)
+    
+    assert windowed["alice"].window_completed == 1
+    assert windowed["alice"].images_per_hour() == 3600 / 35
+    assert windowed["alice"].steps["rectangle"] == [20]
+    text = openmetrics(windowed)
+    assert text.endswith("# EOF\n")
+    assert counters(text) == counters(openmetrics(everything))
+    assert counters(text)['norberg_olsen_images_completed_total{annotator="alice"}'] == 2
@@ -0,0 +1,77 @@
+import json
+import os
+import tarfile
+
+import numpy as np
+from PIL import Image
+
+from conftest import write_images
+from file_manager import LABELS_FILE_NAME
+from training_export import INDEX_NAME, export_folder
+
+
+def write_labels(folder, labels):
+    with open(os.path.join(folder, LABELS_FILE_NAME), 'w') as f:
+        json.dump(labels, f)
+
+
+def rectangle(x1, y1, x2, y2):
+    return {"rectangle": {"x1": x1, "y1": y1, "x2": x2, "y2": y2}}
+
+
+def shard_metadata(out_dir):
+    samples = []
+    for name in sorted(os.listdir(out_dir)):
+        if name.endswith(".tar"):
+            with tarfile.open(os.path.join(out_dir, name)) as archive:
+                for info in archive:
+                    if info.name.endswith(".json"):
+                        samples.append(json.loads(archive.extractfile(info).read()))
+    return samples
+
+
+def test_reexport_leaves_no_stale_samples_in_shards(tmp_path):
+    folder = str(tmp_path / "images")
+    out_dir = str(tmp_path / "export")
+    os.makedirs(folder)
+    names = write_images(folder, 2)
+    write_labels(folder, {names[0]: rectangle(10, 10, 100, 80), names[1]: rectangle(20, 20, 120, 90)})
+    assert export_folder(folder, out_dir, workers=1) == (2, 0, [])
+    
+    write_labels(folder, {names[0]: rectangle(10, 10, 100, 80), names[1]: rectangle(30, 30, 150, 120)})
+    assert export_folder(folder, out_dir, workers=1) == (1, 1, [])
+    
+    samples = shard_metadata(out_dir)
+    assert sorted(sample["image"] for sample in samples) == names
+    changed = [sample for sample in samples if sample["image"] == names[1]][0]
+    assert changed["crop_box"] == [30, 30, 150, 120]
+    with open(os.path.join(out_dir, INDEX_NAME)) as f:
+        assert sorted(json.load(f)["samples"]) == names
+
+
+def test_removed_labels_are_dropped_from_shards(tmp_path):
+    folder = str(tmp_path / "images")
+    out_dir = str(tmp_path / "export")
+    os.makedirs(folder)
+    names = write_images(folder, 3)
+    write_labels(folder, {name: rectangle(10, 10, 100, 80) for name in names})
+    export_folder(folder, out_dir, workers=1)
+    
+    write_labels(folder, {names[0]: rectangle(10, 10, 100, 80)})
+    export_folder(folder, out_dir, workers=1)
+    
+    assert [sample["image"] for sample in shard_metadata(out_dir)] == [names[0]]
+
+
+def test_jpg_export_tone_maps_16_bit_images(tmp_path):
+    folder = str(tmp_path / "images")
+    out_dir = str(tmp_path / "export")
+    os.makedirs(folder)
+    pixels = (np.random.default_rng(0).random((300, 400)) * 65535).astype(np.uint16)
+    Image.fromarray(pixels).save(os.path.join(folder, "deep.png"))
+    write_labels(folder, {"deep.png": rectangle(10, 10, 100, 80)})
+    
+    written, skipped, failed = export_folder(folder, out_dir, image_format="jpg", workers=1)
+    
+    assert (written, failed) == (1, [])
+    assert shard_metadata(out_dir)[0]["mode"] == "L"
@@ -0,0 +1,259 @@
+import os
+import re
+import glob
+import time
+import getpass
+import argparse
+from collections import defaultdict
+
+import numpy as np
+
+THROUGHPUT_DIR = os.path.join(os.path.expanduser("~"), ".norberg_olsen_throughput")
+LOG_SUFFIX = ".log"
+FLUSH_LINES = 256
+FLUSH_INTERVAL_MS = 5000
+IDLE_GAP = 300.0
+QUANTILES = (0.5, 0.9)
+STEPS = ("load", "rectangle", "left_keypoint", "right_keypoint", "left_circle", "right_circle", "calculate",
+         "navigate")
+METRIC_PREFIX = "norberg_olsen"
+
+
+def annotator_name(annotator=None):
+    name = annotator
+    if not name:
+        try:
+            name = getpass.getuser()
+        except Exception:
+            name = "unknown"
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+
+def default_log_path(annotator=None):
+    return os.path.join(THROUGHPUT_DIR, annotator_name(annotator) + LOG_SUFFIX)
+
+
+class ThroughputLog:
+    def __init__(self, path, annotator=None):
+        self.path = path
+        self.annotator = annotator_name(annotator)
+        self.session = f"{os.getpid():x}{int(time.time()) & 0xffff:04x}"
+        self.lines = []
+        self.last_folder = None
+        self.record("start", self.annotator)
+    
+    def record(self, event, value=""):
+        # Only a string append on the UI thread; the file is written in batches
+        self.lines.append(f"{time.time():.3f}\t{self.session}\t{event}\t{value}\n")
+        if len(self.lines) >= FLUSH_LINES:
+            self.flush()
+    
+    def open_image(self, folder, file_name):
+        if folder != self.last_folder:
+            self.last_folder = folder
+            self.record("folder", folder)
+        self.record("open", file_name)
+    
+    def flush(self):
+        if not self.lines:
+            return
+        data = "".join(self.lines).encode("utf-8")
+        self.lines = []
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # One O_APPEND write per batch keeps lines whole when two instances share the log
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+    
+    def close(self):
+        self.record("close")
+        self.flush()
+
+
+def read_log(path):
+    sessions = defaultdict(list)
+    annotators = {}
+    with open(path, 'r', encoding="utf-8", errors="replace") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) != 4:
+                continue
+            try:
+                timestamp = float(parts[0])
+            except ValueError:
+                continue
+            session, event, value = parts[1], parts[2], parts[3]
+            if event == "start":
+                annotators[session] = value
+            sessions[session].append((timestamp, event, value))
+    
+    default = os.path.basename(path)[:-len(LOG_SUFFIX)] if path.endswith(LOG_SUFFIX) else path
+    return [(annotators.get(session, default), events) for session, events in sessions.items()]
+
+
+class AnnotatorStats:
+    def __init__(self):
+        # Totals cover the whole log so they only ever grow; rates and quantiles cover the window
+        self.active_seconds = 0.0
+        self.images_opened = 0
+        self.images_completed = 0
+        self.step_totals = defaultdict(lambda: [0.0, 0])
+        self.window_seconds = 0.0
+        self.window_completed = 0
+        self.steps = defaultdict(list)
+    
+    def add_step(self, step, duration, in_window):
+        total = self.step_totals[step]
+        total[0] += duration
+        total[1] += 1
+        if in_window:
+            self.steps[step].append(duration)
+    
+    def images_per_hour(self):
+        if self.window_seconds <= 0:
+            return 0.0
+        return self.window_completed * 3600.0 / self.window_seconds
+
+
+def aggregate(paths, since=None, idle_gap=IDLE_GAP):
+    stats = defaultdict(AnnotatorStats)
+    for path in paths:
+        for annotator, events in read_log(path):
+            events.sort(key=lambda event: event[0])
+            annotator_stats = stats[annotator]
+            elapsed = 0.0
+            previous = None
+            completed = set()
+            image = None
+            for timestamp, event, value in events:
+                in_window = since is None or timestamp >= since
+                if previous is not None:
+                    # Long gaps are breaks, not work on the current step
+                    interval = timestamp - previous
+                    if 0 <= interval <= idle_gap:
+                        elapsed += interval
+                        annotator_stats.active_seconds += interval
+                        if in_window:
+                            annotator_stats.window_seconds += interval
+                previous = timestamp
+                
+                if event == "open":
+                    step = "load"
+                    image = value
+                    annotator_stats.images_opened += 1
+                elif event == "done":
+                    step = value
+                    if value == "calculate" and image is not None and image not in completed:
+                        completed.add(image)
+                        annotator_stats.images_completed += 1
+                        annotator_stats.window_completed += in_window
+                elif event in ("navigate", "close"):
+                    step = "navigate"
+                else:
+                    continue
+                annotator_stats.add_step(step, elapsed, in_window)
+                elapsed = 0.0
+    return stats
+
+
+def escape_label(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def openmetrics(stats):
+    lines = []
+    
+    def family(name, kind, help_text, unit=None):
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+        if unit:
+            lines.append(f"# UNIT {METRIC_PREFIX}_{name} {unit}")
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+    
+    def sample(name, labels, value):
+        label_text = ",".join(f'{key}="{escape_label(str(label))}"' for key, label in labels)
+        lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {format_number(value)}")
+    
+    annotators = sorted(stats)
+    family("images_completed", "counter", "Images whose hip angles were calculated")
+    for annotator in annotators:
+        sample("images_completed_total", [("annotator", annotator)], stats[annotator].images_completed)
+    family("images_opened", "counter", "Image visits, including revisits")
+    for annotator in annotators:
+        sample("images_opened_total", [("annotator", annotator)], stats[annotator].images_opened)
+    family("active_seconds", "counter", "Time spent labeling, excluding idle gaps", "seconds")
+    for annotator in annotators:
+        sample("active_seconds_total", [("annotator", annotator)], round(stats[annotator].active_seconds, 3))
+    family("images_per_hour", "gauge", "Completed images per active hour in the reporting window")
+    for annotator in annotators:
+        sample("images_per_hour", [("annotator", annotator)], round(stats[annotator].images_per_hour(), 3))
+    
+    family("step_seconds", "summary", "Time spent per labeling step; quantiles cover the reporting window",
+           "seconds")
+    for annotator in annotators:
+        step_totals = stats[annotator].step_totals
+        steps = stats[annotator].steps
+        for step in sorted(step_totals, key=lambda step: (STEPS.index(step) if step in STEPS else len(STEPS), step)):
+            labels = [("annotator", annotator), ("step", step)]
+            if steps.get(step):
+                durations = np.array(steps[step], dtype=np.float64)
+                for quantile in QUANTILES:
+                    sample("step_seconds", labels + [("quantile", quantile)],
+                           round(float(np.quantile(durations, quantile)), 3))
+            sample("step_seconds_sum", labels, round(step_totals[step][0], 3))
+            sample("step_seconds_count", labels, step_totals[step][1])
+    
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(out_path, text):
+    # Scrapers may read the file at any moment, so never leave it half-written
+    temp_path = out_path + ".tmp"
+    with open(temp_path, 'w') as f:
+        f.write(text)
+    os.replace(temp_path, out_path)
+
+
+def format_summary(stats):
+    lines = []
+    for annotator in sorted(stats):
+        annotator_stats = stats[annotator]
+        lines.append(f"{annotator}: {annotator_stats.window_completed} images completed in "
+                     f"{annotator_stats.window_seconds / 3600.0:.2f} active hours "
+                     f"({annotator_stats.images_per_hour():.1f} images/hour)")
+        for step in STEPS:
+            durations = annotator_stats.steps.get(step)
+            if durations:
+                lines.append(f"  {step:>15}: median {np.median(durations):6.1f} s over {len(durations)}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate the labeling tool's throughput logs into images/hour "
+                                                 "per annotator and time per step, written as OpenMetrics text.")
+    parser.add_argument("logs", nargs="*", help=f"Throughput logs (default: every log in {THROUGHPUT_DIR})")
+    parser.add_argument("--out", required=True, help="OpenMetrics text file to write, e.g. for a textfile scraper")
+    parser.add_argument("--since-hours", type=float, default=None,
+                        help="Report rates and step quantiles over the last N hours (counters stay cumulative)")
+    parser.add_argument("--idle-gap", type=float, default=IDLE_GAP,
+                        help="Gaps between events longer than this many seconds count as breaks")
+    args = parser.parse_args()
+    
+    paths = args.logs or sorted(glob.glob(os.path.join(THROUGHPUT_DIR, "*" + LOG_SUFFIX)))
+    since = time.time() - args.since_hours * 3600.0 if args.since_hours else None
+    stats = aggregate(paths, since, args.idle_gap)
+    write_metrics(args.out, openmetrics(stats))
+    print(format_summary(stats) or "No throughput events found.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+import io
+import os
+import json
+import time
+import tarfile
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from PIL import Image
+
+from display_adjustments import WindowLevel
+from file_manager import read_labels, load_images_from_folder
+from image_loader import load_image
+from image_source import clamp_box
+from offscreen_renderer import label_digest, source_signature
+
+INDEX_NAME = "export_index.json"
+SHARD_PREFIX = "shard-"
+SHARD_SUFFIX = ".tar"
+DEFAULT_SHARD_SIZE = 1000
+X_KEYS = ("x1", "x2", "x", "center_x")
+Y_KEYS = ("y1", "y2", "y", "center_y")
+
+
+def parse_size(value):
+    if value is None:
+        return None
+    parts = value.lower().split("x")
+    if len(parts) == 1:
+        parts = parts * 2
+    width, height = int(parts[0]), int(parts[1])
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"Invalid size: {value}")
+    return (width, height)
+
+
+def crop_box(rectangle, width, height, padding=0.0):
+    x1, x2 = sorted((rectangle["x1"], rectangle["x2"]))
+    y1, y2 = sorted((rectangle["y1"], rectangle["y2"]))
+    pad_x = (x2 - x1) * padding
+    pad_y = (y2 - y1) * padding
+    return clamp_box((x1 - pad_x, y1 - pad_y, x2 + pad_x, y2 + pad_y), width, height)
+
+
+def transform_labels(labels, box, sx, sy):
+    transformed = {}
+    for field, item in labels.items():
+        if not isinstance(item, dict):
+            transformed[field] = item
+            continue
+        
+        geometry = {}
+        for key, value in item.items():
+            if key in X_KEYS:
+                geometry[key] = (value - box[0]) * sx
+            elif key in Y_KEYS:
+                geometry[key] = (value - box[1]) * sy
+            elif key == "radius":
+                geometry[key] = value * (sx + sy) / 2
+            else:
+                geometry[key] = value
+        transformed[field] = geometry
+    return transformed
+
+
+def sample_key(file_name):
+    # Archive readers group a sample's members by the name up to the first dot
+    return file_name.replace(".", "_")
+
+
+def export_sample(task):
+    image_path, labels, size, padding, image_format, tone_map = task
+    loaded_image = load_image(image_path)
+    try:
+        box = crop_box(labels["rectangle"], loaded_image.width, loaded_image.height, padding)
+        crop_width, crop_height = box[2] - box[0], box[3] - box[1]
+        if crop_width <= 0 or crop_height <= 0:
+            raise ValueError("pelvis rectangle lies outside the image")
+        
+        scale = 1.0 if size is None else min(1.0, max(size[0] / float(crop_width), size[1] / float(crop_height)))
+        crop = loaded_image.source.read_region(box, scale)
+        # JPEG has no 16-bit mode, so jpg crops of high bit depth images are always tone-mapped
+        if tone_map or (image_format == "jpg" and loaded_image.high_bit_depth):
+            crop = loaded_image.render(crop, WindowLevel())
+    finally:
+        loaded_image.source.close()
+    
+    out_size = size or (crop_width, crop_height)
+    if crop.size != out_size:
+        crop = crop.resize(out_size, Image.Resampling.BILINEAR)
+    sx = out_size[0] / float(crop_width)
+    sy = out_size[1] / float(crop_height)
+    
+    buffer = io.BytesIO()
+    crop.save(buffer, format="JPEG" if image_format == "jpg" else "PNG")
+    file_name = os.path.basename(image_path)
+    metadata = {
+        "image": file_name,
+        "crop_box": list(box),
+        "scale": [sx, sy],
+        "size": list(out_size),
+        "mode": crop.mode,
+        "labels": transform_labels(labels, box, sx, sy)
+    }
+    return {
+        sample_key(file_name) + "." + image_format: buffer.getvalue(),
+        sample_key(file_name) + ".json": json.dumps(metadata).encode("utf-8")
+    }
+
+
+def shard_name(number):
+    return f"{SHARD_PREFIX}{number:05d}{SHARD_SUFFIX}"
+
+
+def load_index(out_dir):
+    index_path = os.path.join(out_dir, INDEX_NAME)
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {"samples": {}, "shards": {}}
+
+
+def save_index(out_dir, index):
+    index_path = os.path.join(out_dir, INDEX_NAME)
+    temp_path = index_path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(temp_path, index_path)
+
+
+class ShardWriter:
+    def __init__(self, out_dir, shard_size=DEFAULT_SHARD_SIZE):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        numbers = [int(name[len(SHARD_PREFIX):-len(SHARD_SUFFIX)]) for name in os.listdir(out_dir)
+                   if name.startswith(SHARD_PREFIX) and name.endswith(SHARD_SUFFIX)]
+        self.next_number = max(numbers) + 1 if numbers else 0
+        self.archive = None
+        self.temp_path = None
+        self.entries = {}
+    
+    def write(self, file_name, entry, members):
+        if self.archive is None:
+            self.temp_path = os.path.join(self.out_dir, shard_name(self.next_number) + ".partial")
+            self.archive = tarfile.open(self.temp_path, "w")
+        
+        now = time.time()
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = now
+            self.archive.addfile(info, io.BytesIO(data))
+        self.entries[file_name] = dict(entry, shard=shard_name(self.next_number))
+        
+        if len(self.entries) >= self.shard_size:
+            return self.finish()
+        return {}
+    
+    def finish(self):
+        if self.archive is None:
+            return {}
+        
+        self.archive.close()
+        os.replace(self.temp_path, os.path.join(self.out_dir, shard_name(self.next_number)))
+        finished = self.entries
+        self.archive = None
+        self.entries = {}
+        self.next_number += 1
+        return finished
+    
+    def abort(self):
+        if self.archive is not None:
+            self.archive.close()
+            os.remove(self.temp_path)
+            self.archive = None
+            self.entries = {}
+
+
+def add_shards(index, finished):
+    for shard, count in Counter(entry["shard"] for entry in finished.values()).items():
+        index["shards"][shard] = count
+    index["samples"].update(finished)
+
+
+def remove_unused_shards(out_dir, index):
+    used = {entry["shard"] for entry in index["samples"].values()}
+    for shard in list(index["shards"]):
+        if shard not in used:
+            del index["shards"][shard]
+    
+    removed = 0
+    for name in os.listdir(out_dir):
+        # Leftover partial shards come from interrupted runs; their samples were never indexed
+        if name.startswith(SHARD_PREFIX) and (name.endswith(".partial") or
+                                              (name.endswith(SHARD_SUFFIX) and name not in used)):
+            os.remove(os.path.join(out_dir, name))
+            removed += 1
+    return removed
+
+
+def read_shard_samples(path, keys):
+    current = None
+    members = {}
+    with tarfile.open(path, "r") as archive:
+        for info in archive:
+            key = info.name.split(".", 1)[0]
+            if key != current and members:
+                yield current, members
+                members = {}
+            current = key
+            if key in keys:
+                members[info.name] = archive.extractfile(info).read()
+    if members:
+        yield current, members
+
+
+def compact_shards(out_dir, index, writer):
+    samples = index["samples"]
+    live = Counter(entry["shard"] for entry in samples.values())
+    compacted = 0
+    for shard, count in sorted(index["shards"].items()):
+        # Re-exported and removed samples leave stale copies behind; rewrite every shard holding one
+        if live[shard] == 0 or live[shard] >= count:
+            continue
+        
+        keys = {sample_key(file_name): file_name for file_name, entry in samples.items() if entry["shard"] == shard}
+        for key, members in read_shard_samples(os.path.join(out_dir, shard), keys):
+            finished = writer.write(keys[key], samples[keys[key]], members)
+            if finished:
+                add_shards(index, finished)
+                save_index(out_dir, index)
+        compacted += 1
+    add_shards(index, writer.finish())
+    return compacted
+
+
+def export_folder(folder_path, out_dir, size=None, padding=0.0, image_format="png", tone_map=False,
+                  workers=None, shard_size=DEFAULT_SHARD_SIZE):
+    os.makedirs(out_dir, exist_ok=True)
+    labels = read_labels(folder_path)
+    index = load_index(out_dir)
+    config = {"size": list(size) if size else None, "padding": padding, "format": image_format, "tone_map": tone_map}
+    samples = index["samples"] if index.get("config") == config else {}
+    index.update(config=config, samples=samples, shards=index.get("shards", {}) if samples else {})
+    remove_unused_shards(out_dir, index)
+    
+    tasks = []
+    entries = {}
+    exported = set()
+    skipped = 0
+    for image_path in load_images_from_folder(folder_path):
+        file_name = os.path.basename(image_path)
+        image_labels = labels.get(file_name) or {}
+        if "rectangle" not in image_labels:
+            continue
+        
+        exported.add(file_name)
+        entry = {"source": source_signature(image_path), "labels": label_digest(image_labels)}
+        old = samples.get(file_name)
+        if old is not None and old["source"] == entry["source"] and old["labels"] == entry["labels"]:
+            skipped += 1
+            continue
+        entries[file_name] = entry
+        tasks.append((image_path, image_labels, size, padding, image_format, tone_map))
+    
+    for file_name in list(samples):
+        if file_name not in exported:
+            del samples[file_name]
+    
+    written = 0
+    failed = []
+    writer = ShardWriter(out_dir, shard_size)
+    try:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            # Bound the samples in flight so memory stays flat however large the folder is
+            max_in_flight = 4 * (workers or os.cpu_count() or 1)
+            pending = {}
+            queue = iter(tasks)
+            while True:
+                for task in queue:
+                    pending[executor.submit(export_sample, task)] = os.path.basename(task[0])
+                    if len(pending) >= max_in_flight:
+                        break
+                if not pending:
+                    break
+                
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_name = pending.pop(future)
+                    try:
+                        members = future.result()
+                    except Exception as e:
+                        failed.append((file_name, str(e)))
+                        samples.pop(file_name, None)
+                        continue
+                    finished = writer.write(file_name, entries[file_name], members)
+                    written += 1
+                    if finished:
+                        add_shards(index, finished)
+                        save_index(out_dir, index)
+        finally:
+            executor.shutdown(cancel_futures=True)
+        add_shards(index, writer.finish())
+        compact_shards(out_dir, index, writer)
+        remove_unused_shards(out_dir, index)
+    finally:
+        writer.abort()
+        save_index(out_dir, index)
+    return written, skipped, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export pelvis crops and their labels in crop coordinates as "
+                                                 "sharded tar archives with an index, for model training.")
+    parser.add_argument("folder", help="Folder containing images and their labels")
+    parser.add_argument("--out", required=True, help="Output folder for shards and the export index")
+    parser.add_argument("--size", type=parse_size, default=None,
+                        help="Resize every crop to this size, e.g. 512 or 512x384 (default: keep crop size)")
+    parser.add_argument("--padding", type=float, default=0.0,
+                        help="Grow the pelvis rectangle by this fraction of its size on each side")
+    parser.add_argument("--format", choices=["png", "jpg"], default="png",
+                        help="Crop image format (png keeps 16-bit pixels, jpg tone-maps them)")
+    parser.add_argument("--tone-map", action="store_true", help="Store 8-bit tone-mapped crops of 16-bit images")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, help="Samples per shard")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    args = parser.parse_args()
+    
+    written, skipped, failed = export_folder(
+        args.folder, args.out, size=args.size, padding=args.padding, image_format=args.format,
+        tone_map=args.tone_map, workers=args.workers, shard_size=args.shard_size
+    )
+    
+    print(f"Exported {written} samples, skipped {skipped} unchanged.")
+    for file_name, error in failed:
+        print(f"Failed: {file_name}: {error}")
+
+
+if __name__ == "__main__":
+    main()